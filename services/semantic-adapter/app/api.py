@@ -1,179 +1,686 @@
-from typing import Dict, Any, Optional, List
-import hashlib
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from typing import Callable, Dict, Any, Optional, List, Set, Tuple
+import os
+import json
+import tempfile
+import uuid
+import asyncio
+import itertools
+import anyio
+from struct import error as struct_error
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from starlette.concurrency import run_in_threadpool
 
+from app import metrics
 from app.chunker import Chunker
-from app.embedder import GeminiEmbedder
+from app.embedder import GeminiEmbedder, FakeEmbedder
+from app.scheduler import EmbeddingScheduler
+from app.embedding_cache import CachedEmbedder, QueryCachedEmbedder
+from app.coalescer import QueryEmbeddingCoalescer
+from app.lru_cache import LRUCache
+from app.result_cache import SearchResultCache
 from app.vector_repo import VectorRepository
+from app.async_vector_repo import AsyncVectorRepository, call_repo
+from app.models import (
+    CanonicalDocument, SearchRequest, SearchResult, SearchResponse, BatchSearchRequest, BatchSearchResponse,
+    DiversityOptions
+)
+from app.pipeline import IngestPipeline, build_chunk_rows, chunk_ids, document_manifest
+from app.jobs import JobWorkerPool, ProgressFn
+from app.deletion import BatchedDeleter
+from app.hybrid import is_keyword_query, is_confident_match, reciprocal_rank_fusion
+from app.diversify import diversify
+from app.readiness import ReadinessProbe
+from app.transfer import DTYPES, IMPORT_MODES, TenantArchive, export_tenant, import_archive
 
-router = APIRouter()
+# MetricsRoute: endpoint y requests en curso para /metrics
+router = APIRouter(route_class=metrics.MetricsRoute)
 
-# Instancias Globales (Lazy loading podría ser mejor, pero esto es directo)
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", "100"))
+SEARCH_DEFAULT_MODE = os.getenv("SEARCH_DEFAULT_MODE", "vector")
+if SEARCH_DEFAULT_MODE not in ("vector", "hybrid", "lexical"):
+    raise ValueError("SEARCH_DEFAULT_MODE must be one of vector, hybrid, lexical")
+# Ingesta en segundo plano (semantic_jobs) por defecto y reintentos por trabajo
+INGEST_BACKGROUND_DEFAULT = os.getenv("INGEST_BACKGROUND_DEFAULT", "false").lower() == "true"
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+# Baja de clientes en segundo plano (lotes acotados + VACUUM) por defecto
+DELETE_BACKGROUND_DEFAULT = os.getenv("DELETE_BACKGROUND_DEFAULT", "true").lower() == "true"
+# Candidatos por ranking antes de la fusión híbrida (multiplicador de top_k)
+HYBRID_CANDIDATES_FACTOR = int(os.getenv("HYBRID_CANDIDATES_FACTOR", "4"))
+# Aplica DiversityOptions() por defecto cuando el request no trae "diversity"
+SEARCH_DIVERSITY_DEFAULT = os.getenv("SEARCH_DIVERSITY_DEFAULT", "false").lower() == "true"
+
+# Instancias globales: construirlas no toca la red (el cliente de Gemini y el pool se
+# crean en el warm-up del lifespan, ver app/readiness.py)
 chunker = Chunker()
-# Ojo: Requiere GOOGLE_API_KEY en env
+# Ojo: Requiere GOOGLE_API_KEY en env (EMBEDDER=fake usa vectores deterministas locales, sin red)
 try:
-    embedder = GeminiEmbedder()
+    embedder = FakeEmbedder() if os.getenv("EMBEDDER", "gemini").lower() == "fake" else GeminiEmbedder()
 except ValueError as e:
     embedder = None
     print(f"Warning: Embedder not initialized: {e}")
+# Proveedor sin envoltorios: warm-up del cliente y probe de readiness
+embedding_provider = embedder
+
+# Métricas por llamada real al proveedor (lote, latencia, 429), antes de scheduler y caches
+if embedder:
+    embedder = metrics.InstrumentedEmbedder(embedder)
+
+# Scheduler: cuotas del proveedor (RPM/TPM) compartidas por ingesta y búsqueda, con prioridad para queries
+embedding_scheduler: Optional[EmbeddingScheduler] = None
+if embedder and os.getenv("EMBED_SCHEDULER_ENABLED", "true").lower() == "true":
+    embedder = embedding_scheduler = EmbeddingScheduler(embedder)
+
+# Micro-batching: queries concurrentes se envían al proveedor en una sola llamada
+query_coalescer: Optional[QueryEmbeddingCoalescer] = None
+if embedder and os.getenv("EMBED_QUERY_COALESCE_ENABLED", "true").lower() == "true":
+    embedder = query_coalescer = QueryEmbeddingCoalescer(
+        embedder,
+        window_ms=float(os.getenv("EMBED_QUERY_COALESCE_WINDOW_MS", "5")),
+        max_batch=int(os.getenv("EMBED_QUERY_COALESCE_MAX_BATCH", "100")),
+    )
+
+# El pool de conexiones se abre en el lifespan (main.py)
+# DB_DRIVER=asyncpg: repositorio asyncio usado directamente desde los handlers (sin threadpool)
+DB_DRIVER = os.getenv("DB_DRIVER", "psycopg2").lower()
+if DB_DRIVER not in ("psycopg2", "asyncpg"):
+    raise ValueError("DB_DRIVER must be one of psycopg2, asyncpg")
+repo = AsyncVectorRepository() if DB_DRIVER == "asyncpg" else VectorRepository()
+
+# Cache persistente de embeddings: solo los chunks nunca vistos se envían al proveedor
+embedding_cache: Optional[CachedEmbedder] = None
+if embedder and os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true":
+    embedder = embedding_cache = CachedEmbedder(embedder, repo)
+
+# Cache de embeddings de queries (LRU + TTL en proceso, opcionalmente compartido vía Postgres)
+query_cache: Optional[QueryCachedEmbedder] = None
+if embedder and os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true":
+    embedder = query_cache = QueryCachedEmbedder(
+        embedder,
+        LRUCache(
+            max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "5000")),
+            ttl_seconds=float(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600")),
+        ),
+        repo=repo if os.getenv("QUERY_CACHE_SHARED", "false").lower() == "true" else None,
+    )
 
-repo = VectorRepository()
-
-class CanonicalMetadata(BaseModel):
-    client_id: str
-    category: Optional[str] = None
-    url: Optional[str] = None
-    source_timestamp: Optional[str] = None
-    ingested_at: Optional[str] = None
-    # Permite campos extra
-    class Config:
-        extra = "allow"
-
-class CanonicalDocument(BaseModel):
-    content_id: str
-    source: str
-    title: Optional[str] = None
-    body_content: str
-    metadata: CanonicalMetadata
-    hash: str
-
-class SearchRequest(BaseModel):
-    query_text: str
-    client_id: str
-    top_k: int = 5
-
-class SearchResult(BaseModel):
-    content_id: str
-    title: Optional[str]
-    body_content: str
-    metadata: Dict[str, Any]
-    score: float
-
-class SearchResponse(BaseModel):
-    results: List[SearchResult]
-    query_text: str
-    client_id: str
+# Cache de rankings de /search por tenant (invalidado por ingesta y borrados del tenant)
+result_cache: Optional[SearchResultCache] = None
+if os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true":
+    result_cache = SearchResultCache(
+        LRUCache(
+            max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000")),
+            ttl_seconds=float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300")),
+        )
+    )
+
+def _invalidate_results(client_id: str) -> None:
+    if result_cache:
+        result_cache.invalidate(client_id)
 
 @router.get("/health")
 async def health_check():
     """
     Health check endpoint to verify service status.
     """
-    db_status = "unknown"
-    try:
-        # Simple verficación de conexión si fuera necesario
-        # with repo._get_connection() as conn: ...
-        db_status = "connected"
-    except Exception:
-        db_status = "disconnected"
-        
+    readiness_state = await readiness.check()
+    checks = readiness_state["checks"]
+    db_status = {"ok": "connected", "starting": "starting"}.get(checks["db"]["status"], "disconnected")
+
+    return {
+        "status": "ok" if readiness_state["ready"] else "degraded",
+        "service": "semantic-adapter",
+        "embedder": {"ok": "ready", "degraded": "ready"}.get(checks["embedder"]["status"], checks["embedder"]["status"]),
+        "db": db_status,
+        "db_pool": repo.pool_stats(),
+        "job_workers": job_workers.stats()
+    }
+
+@router.get("/db/pool")
+async def db_pool_stats():
+    """
+    Estadísticas del pool de conexiones a Postgres.
+    """
+    return repo.pool_stats()
+
+@router.get("/embedder/stats")
+async def embedder_stats():
+    """
+    Estado del embedder, del scheduler de cuotas y del agrupador de queries concurrentes.
+    """
     return {
-        "status": "ok", 
-        "service": "semantic-adapter", 
-        "embedder": "ready" if embedder else "not_configured",
-        "db": db_status
+        "model": embedder.model if embedder else None,
+        "scheduler": embedding_scheduler.stats() if embedding_scheduler else {"enabled": False},
+        "query_coalescer": query_coalescer.stats() if query_coalescer else {"enabled": False},
     }
 
+@router.get("/cache/embeddings")
+async def embedding_cache_stats():
+    """
+    Hit rate de los caches de embeddings (proceso actual) y entradas persistidas por modelo.
+    """
+    result: Dict[str, Any] = {
+        "documents": {"enabled": embedding_cache is not None},
+        "queries": {"enabled": query_cache is not None},
+    }
+    if embedding_cache:
+        result["documents"]["stats"] = embedding_cache.stats()
+    if query_cache:
+        result["queries"]["stats"] = query_cache.stats()
+    if embedding_cache or (query_cache and query_cache.repo):
+        try:
+            result["entries"] = await call_repo(repo.embedding_cache_summary)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to read embedding cache: {str(e)}")
+    return result
+
+@router.delete("/cache/embeddings")
+async def evict_embedding_cache(
+    older_than_days: Optional[int] = None,
+    model: Optional[str] = None,
+    stale_models: bool = False
+):
+    """
+    Evicción del cache de embeddings por antigüedad (sin uso en N días), por modelo,
+    o de todos los modelos distintos al actual (stale_models=true).
+    """
+    keep_model = embedder.model if stale_models and embedder else None
+    if older_than_days is None and model is None and keep_model is None:
+        raise HTTPException(status_code=400, detail="Provide older_than_days, model or stale_models=true")
+    try:
+        count = await call_repo(repo.evict_cached_embeddings, older_than_days, model, keep_model)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to evict embedding cache: {str(e)}")
+    return {"status": "success", "records_deleted": count}
+
+@router.delete("/cache/queries")
+async def clear_query_cache():
+    """
+    Vacía el cache local (L1) de embeddings de queries.
+    """
+    if not query_cache:
+        return {"status": "disabled", "entries_cleared": 0}
+    return {"status": "success", "entries_cleared": query_cache.cache.clear()}
+
+@router.get("/cache/results")
+async def result_cache_stats():
+    """
+    Hit rate y tamaño del cache de resultados de búsqueda.
+    """
+    if not result_cache:
+        return {"enabled": False}
+    return {"enabled": True, "stats": result_cache.stats()}
+
+@router.delete("/cache/results")
+async def clear_result_cache(client_id: Optional[str] = None):
+    """
+    Invalida los resultados cacheados de un cliente (client_id) o vacía el cache completo.
+    """
+    if not result_cache:
+        return {"status": "disabled", "entries_cleared": 0}
+    if client_id:
+        return {"status": "success", "client_id": client_id, "generation": result_cache.invalidate(client_id)}
+    return {"status": "success", "entries_cleared": result_cache.clear()}
+
 @router.post("/ingest")
-async def ingest_document(doc: CanonicalDocument):
+async def ingest_document(doc: CanonicalDocument, force: bool = False, background: bool = INGEST_BACKGROUND_DEFAULT):
     """
     Recibe un documento canónico, lo fragmenta, genera embeddings
     y persiste los vectores en la base de datos.
+    Si el hash del documento no cambió desde la última ingesta, no se re-procesa (salvo force=true).
+
+    Con background=true el documento se encola en semantic_jobs y se responde 202
+    con el id del trabajo (ver GET /jobs/{job_id}); los workers reintentan con backoff.
+    """
+    if not embedder:
+        raise HTTPException(status_code=503, detail="Embedder service not configured (missing API Key)")
+
+    if background:
+        try:
+            job_id = await call_repo(
+                repo.enqueue_job,
+                "ingest",
+                {"document": doc.dict(), "force": force},
+                doc.metadata.client_id,
+                JOB_MAX_ATTEMPTS,
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Job enqueue failed: {str(e)}")
+        return JSONResponse(status_code=202, content={
+            "status": "queued",
+            "job_id": job_id,
+            "document_id": doc.content_id,
+            "status_url": f"/api/v1/jobs/{job_id}"
+        })
+
+    return await _ingest(doc, force)
+
+async def _ingest(doc: CanonicalDocument, force: bool, progress: Optional[ProgressFn] = None) -> Dict[str, Any]:
+    """
+    Ingesta de un documento (inline o desde un worker de semantic_jobs).
     """
     if not embedder:
         raise HTTPException(status_code=503, detail="Embedder service not configured (missing API Key)")
 
-    # 1. Chunking
-    chunks = chunker.split_text(doc.body_content)
+    # 0. Gatekeeper: el manifiesto guarda el último hash ingerido por documento
+    key = (doc.metadata.client_id, doc.content_id)
+    metrics.set_tenant(doc.metadata.client_id)
+    known: Dict[Tuple[str, str], str] = {}
+    if not force:
+        try:
+            known = await call_repo(repo.get_document_hashes, [key])
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database lookup failed: {str(e)}")
+        if known.get(key) == doc.hash:
+            return {
+                "status": "unchanged",
+                "document_id": doc.content_id,
+                "chunks_processed": 0,
+                "db_records_upserted": 0
+            }
+
+    # 1. Chunking (fuera del event loop para documentos grandes)
+    with metrics.stage("chunking"):
+        chunks = await chunker.asplit_text(doc.body_content)
     if not chunks:
         return {"status": "ignored", "reason": "empty_content"}
 
+    # Ids por contenido (CHUNKER_MODE=cdc): los chunks ya almacenados no se vuelven a embeber
+    hashes = chunk_ids(doc, chunks, chunker.content_defined)
+    stored: Set[str] = set()
+    if chunker.content_defined and key in known:
+        try:
+            stored = (await call_repo(repo.get_chunk_hashes, [key])).get(key, set())
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database lookup failed: {str(e)}")
+    todo = [i for i, chunk_hash in enumerate(hashes) if chunk_hash not in stored]
+
     # 2. Embedding (Async)
+    if progress:
+        await progress({"stage": "embedding", "chunks": len(chunks), "to_embed": len(todo)})
     try:
-        vectors = await embedder.embed_documents(chunks)
+        with metrics.stage("embedding"):
+            embedded = await embedder.embed_documents([chunks[i] for i in todo]) if todo else []
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Embedding failed: {str(e)}")
 
-    if len(vectors) != len(chunks):
+    if len(embedded) != len(todo):
         raise HTTPException(status_code=500, detail="Mismatch between chunks and vectors generated")
+    vectors: List[Optional[List[float]]] = [None] * len(chunks)
+    for i, vector in zip(todo, embedded):
+        vectors[i] = vector
 
     # 3. Persistence (Sync -> Threadpool)
-    # Al ser una operación IO-bound síncrona (psycopg2), no queremos bloquear el loop principal.
-    upserted_count = 0
-    
-    for i, (chunk_text, vector) in enumerate(zip(chunks, vectors)):
-        # Generar hash determinista para el chunk: sha256(doc_hash + index)
-        # Esto asegura idempotencia: el mismo documento fragmentado igual tendrá los mismos IDs.
-        chunk_hash_input = f"{doc.hash}_{i}"
-        chunk_hash = hashlib.sha256(chunk_hash_input.encode()).hexdigest()
-
-        chunk_data = {
-            "content_id": doc.content_id, 
-            "client_id": doc.metadata.client_id,
-            "source": doc.source,
-            "title": doc.title, # Opcional: f"{doc.title} (Part {i+1})"
-            "body_content": chunk_text,
-            "metadata": doc.metadata.dict(),
-            "hash": chunk_hash
-        }
+    # El set de chunks del documento se reemplaza en una sola transacción:
+    # upsert de los chunks nuevos + borrado de los que sobran (ej: el documento se acortó).
+    if progress:
+        await progress({"stage": "persisting", "chunks": len(chunks)})
+    rows = build_chunk_rows(doc, chunks, vectors, hashes)
 
-        # Ejecutar upsert en threadpool para no bloquear
-        await run_in_threadpool(repo.upsert_document, chunk_data, vector)
-        upserted_count += 1
+    try:
+        with metrics.stage("db_write"):
+            results = await call_repo(repo.replace_documents, [(document_manifest(doc), rows)])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database upsert failed: {str(e)}")
+    result = results[0]
+    metrics.rows_upserted(result["upserted"])
+    _invalidate_results(doc.metadata.client_id)
 
     return {
         "status": "success",
         "document_id": doc.content_id,
         "chunks_processed": len(chunks),
-        "db_records_upserted": upserted_count
+        "chunks_embedded": len(todo),
+        "db_records_upserted": result["upserted"],
+        "db_records_inserted": result["inserted"],
+        "db_records_updated": result["upserted"] - result["inserted"],
+        "db_records_unchanged": result.get("kept", 0) - result.get("refreshed", 0),
+        "db_records_refreshed": result.get("refreshed", 0),
+        "db_records_deleted": result["deleted"]
     }
 
+async def _run_ingest_job(payload: Dict[str, Any], progress: ProgressFn) -> Dict[str, Any]:
+    return await _ingest(CanonicalDocument(**payload["document"]), payload.get("force", False), progress)
+
+async def _run_delete_job(payload: Dict[str, Any], progress: ProgressFn) -> Dict[str, Any]:
+    result = await deleter.run(payload, progress)
+    _invalidate_results(payload["client_id"])
+    return result
+
+async def _run_index_rebuild_job(payload: Dict[str, Any], progress: ProgressFn) -> Dict[str, Any]:
+    await progress({"stage": "building_index"})
+    return await call_repo(repo.rebuild_vector_index)
+
+# Borrado por lotes (trabajos 'delete'): DELETE_BATCH_SIZE, DELETE_BATCH_PAUSE_MS, DELETE_VACUUM
+deleter = BatchedDeleter(repo)
+
+# Workers de la cola durable (se inician en el lifespan, main.py)
+job_workers = JobWorkerPool(
+    repo, {"ingest": _run_ingest_job, "index_rebuild": _run_index_rebuild_job, "delete": _run_delete_job}
+)
+
+# Warm-up concurrente (pool + esquema, cliente del embedder) y /readyz; los workers arrancan con la base lista
+readiness = ReadinessProbe(repo, embedding_provider, on_db_ready=[job_workers.start])
+
+# Contadores de los componentes en /metrics (semantic_component_stat)
+metrics.component_stats.register("db_pool", repo.pool_stats)
+metrics.component_stats.register("job_workers", job_workers.stats)
+for _name, _component in (
+    ("embedding_scheduler", embedding_scheduler), ("query_coalescer", query_coalescer),
+    ("embedding_cache", embedding_cache), ("query_cache", query_cache), ("result_cache", result_cache),
+):
+    if _component is not None:
+        metrics.component_stats.register(_name, _component.stats)
+
+async def _enqueue_index_rebuild() -> Dict[str, Any]:
+    job_id = await call_repo(repo.enqueue_job, "index_rebuild", {}, None, JOB_MAX_ATTEMPTS)
+    return {"job_id": job_id, "status_url": f"/api/v1/jobs/{job_id}"}
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Estado de un trabajo en segundo plano: queued | running | succeeded | failed,
+    intentos, progreso, resultado y último error.
+    """
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        job = await call_repo(repo.get_job, job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database lookup failed: {str(e)}")
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/ingest/batch")
+async def ingest_batch(request: Request, force: bool = False, bulk_load: bool = False):
+    """
+    Ingesta masiva: recibe NDJSON (un CanonicalDocument por línea) y responde
+    NDJSON con el estado de cada documento a medida que termina, más un resumen final.
+    Los documentos cuyo hash no cambió se reportan como "unchanged" sin re-procesarse;
+    si un documento se repite en el lote, gana la última línea y las anteriores se
+    reportan como "superseded".
+
+    Con bulk_load=true (cargas iniciales grandes) el índice HNSW se elimina antes de
+    escribir y se reconstruye al final en segundo plano (job index_rebuild, ver el
+    resumen); mientras tanto la búsqueda vectorial es exacta pero más lenta.
+    """
+    if not embedder:
+        raise HTTPException(status_code=503, detail="Embedder service not configured (missing API Key)")
+    if bulk_load:
+        try:
+            await call_repo(repo.begin_bulk_load)
+        except Exception as e:
+            raise HTTPException(status_code=409, detail=f"Could not enter bulk load mode: {str(e)}")
+
+    # El cuerpo se vuelca a un archivo temporal (en disco si supera 8 MB):
+    # la memoria no depende del tamaño del lote.
+    spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    async for part in request.stream():
+        await run_in_threadpool(spool.write, part)
+    spool.seek(0)
+
+    pipeline = IngestPipeline(chunker, embedder, repo, force=force, on_write=_invalidate_results)
+
+    async def stream_status():
+        try:
+            async for status in pipeline.run(spool):
+                if bulk_load and "summary" in status:
+                    try:
+                        status["summary"]["index_rebuild"] = await _enqueue_index_rebuild()
+                    except Exception as e:
+                        status["summary"]["index_rebuild"] = {"error": f"Job enqueue failed: {str(e)}"}
+                with metrics.stage("serialization"):
+                    line = json.dumps(status, ensure_ascii=False) + "\n"
+                yield line
+        finally:
+            spool.close()
+
+    return StreamingResponse(stream_status(), media_type="application/x-ndjson")
+
 @router.post("/search", response_model=SearchResponse)
 async def search_documents(req: SearchRequest):
     """
     Realiza una búsqueda semántica basada en el texto de consulta.
+
+    Modos: vector (coseno), lexical (full-text) o hybrid (fusión RRF). En hybrid,
+    las queries tipo identificador (códigos, emails, nombres cortos) se resuelven
+    primero por full-text y, si el primer resultado es un match exacto, se
+    responde sin generar embedding.
+
+    Con "diversity" se traen top_k * fetch_factor candidatos y se aplica MMR,
+    límite de pasajes por documento, corte por score y unión de chunks contiguos
+    (ver app/diversify.py): menos pasajes y menos redundantes para el prompt.
+    """
+    metrics.set_tenant(req.client_id)
+    mode = req.mode or SEARCH_DEFAULT_MODE
+    filters = req.filters.dict(exclude_none=True) if req.filters else None
+    diversity = req.diversity or (DiversityOptions() if SEARCH_DIVERSITY_DEFAULT else None)
+    fetch_k = req.top_k * diversity.fetch_factor if diversity else req.top_k
+    candidates = max(req.top_k * HYBRID_CANDIDATES_FACTOR, fetch_k)
+
+    # 0. Cache de resultados: ranking (hashes + scores) por tenant; las filas se leen por hash
+    cache_key = None
+    if result_cache:
+        cache_key = result_cache.key(req.client_id, req.query_text, mode, req.top_k, fetch_k, filters, req.ef_search)
+        generation = result_cache.generation(req.client_id)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            cached_mode, ranked = cached
+            rows = await _cached_rows(req.client_id, ranked, diversity is not None)
+            if rows is not None:
+                return _search_response(req, rows, diversity, cached_mode, cached=True)
+            result_cache.discard(cache_key)
+
+    def respond(rows: List[Dict[str, Any]], served_mode: str) -> SearchResponse:
+        if cache_key is not None:
+            result_cache.set(cache_key, generation, served_mode, rows)
+        return _search_response(req, rows, diversity, served_mode)
+
+    # 1. Fast path léxico (sin embedding)
+    lexical_results = None
+    if mode == "lexical" or (mode == "hybrid" and is_keyword_query(req.query_text)):
+        try:
+            with metrics.stage("db_search"):
+                lexical_results = await call_repo(
+                    repo.search_lexical, req.client_id, req.query_text, candidates, filters
+                )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database search failed: {str(e)}")
+        if mode == "lexical" or is_confident_match(req.query_text, lexical_results):
+            return respond(lexical_results[:fetch_k], "lexical")
+
+    if not embedder:
+        raise HTTPException(status_code=503, detail="Embedder service not configured")
+
+    # 2. Generar embedding para la query
+    try:
+        with metrics.stage("embedding"):
+            query_vector = await embedder.embed_query(req.query_text)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Embedding generation failed: {str(e)}")
+
+    # 3. Búsqueda en DB (en threadpool ya que search_similar es síncrona)
+    try:
+        with metrics.stage("db_search"):
+            if mode != "hybrid":
+                db_results = await call_repo(
+                    repo.search_similar, req.client_id, query_vector, fetch_k, filters,
+                    ef_search=req.ef_search, with_embeddings=diversity is not None,
+                )
+            else:
+                vector_task = call_repo(
+                    repo.search_similar, req.client_id, query_vector, candidates, filters,
+                    ef_search=req.ef_search, with_embeddings=diversity is not None,
+                )
+                if lexical_results is None:
+                    vector_results, lexical_results = await asyncio.gather(
+                        vector_task,
+                        call_repo(repo.search_lexical, req.client_id, req.query_text, candidates, filters),
+                    )
+                else:
+                    vector_results = await vector_task
+                db_results = reciprocal_rank_fusion([vector_results, lexical_results], fetch_k)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database search failed: {str(e)}")
+
+    # 4. Formatear resultados
+    return respond(db_results, mode)
+
+async def _cached_rows(
+    client_id: str, ranked: List[Tuple[str, float]], with_embeddings: bool
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Reconstruye un ranking cacheado con las filas actuales; None si algún chunk ya no existe.
+    """
+    try:
+        with metrics.stage("db_search"):
+            found = await call_repo(repo.get_chunks_by_hash, client_id, [h for h, _ in ranked], with_embeddings)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database search failed: {str(e)}")
+    by_hash = {row["hash"]: row for row in found}
+    if len(by_hash) < len(ranked):
+        return None
+    return [{**by_hash[chunk_hash], "similarity": score} for chunk_hash, score in ranked]
+
+def _search_response(
+    req: SearchRequest, rows: List[Dict[str, Any]], diversity: Optional[DiversityOptions], mode: str,
+    cached: bool = False,
+) -> SearchResponse:
+    with metrics.stage("postprocess"):
+        rows = _postprocess(rows, req.top_k, diversity)
+    with metrics.stage("serialization"):
+        return SearchResponse(
+            results=_format_results(rows), query_text=req.query_text, client_id=req.client_id, mode=mode, cached=cached
+        )
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_documents_batch(req: BatchSearchRequest):
+    """
+    Resuelve varias búsquedas en una sola llamada: un único request de embeddings
+    para todas las queries y un único round trip a la base de datos.
+    Los resultados respetan el orden de entrada. Siempre en modo vector: una query con
+    mode hybrid/lexical u opciones de diversity se rechaza con 422 (usar /search).
     """
     if not embedder:
         raise HTTPException(status_code=503, detail="Embedder service not configured")
+    if not req.queries:
+        return BatchSearchResponse(results=[])
+    if len(req.queries) > SEARCH_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {SEARCH_BATCH_MAX} queries)")
 
-    # 1. Generar embedding para la query
+    # 1. Embeddings de todas las queries en una sola llamada
     try:
-        query_vector = await embedder.embed_query(req.query_text)
+        with metrics.stage("embedding"):
+            vectors = await embedder.embed_queries([q.query_text for q in req.queries])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Embedding generation failed: {str(e)}")
 
-    # 2. Búsqueda en DB (en threadpool ya que search_similar es síncrona)
+    # 2. Un solo round trip a la DB
+    items = [
+        {
+            "client_id": q.client_id,
+            "query_vector": vector,
+            "top_k": q.top_k,
+            "filters": q.filters.dict(exclude_none=True) if q.filters else None,
+            "ef_search": q.ef_search,
+        }
+        for q, vector in zip(req.queries, vectors)
+    ]
     try:
-        db_results = await run_in_threadpool(repo.search_similar, req.client_id, query_vector, req.top_k)
+        with metrics.stage("db_search"):
+            db_results = await call_repo(repo.search_similar_batch, items)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database search failed: {str(e)}")
 
-    # 3. Formatear resultados
-    formatted_results = []
-    for row in db_results:
-        formatted_results.append(SearchResult(
+    with metrics.stage("serialization"):
+        return BatchSearchResponse(results=[
+            SearchResponse(results=_format_results(rows), query_text=q.query_text, client_id=q.client_id, mode="vector")
+            for q, rows in zip(req.queries, db_results)
+        ])
+
+@router.get("/admin/index")
+async def index_report():
+    """
+    Estado del índice vectorial: parámetros de construcción y de búsqueda, tamaño por
+    índice / partición, construcción en curso y bloat (tuplas muertas).
+    """
+    try:
+        return await call_repo(repo.index_report)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Index report failed: {str(e)}")
+
+@router.post("/admin/index/bulk-load")
+async def begin_bulk_load():
+    """
+    Activa el modo bulk load (sin índice HNSW hasta POST /admin/index/rebuild).
+    """
+    try:
+        return await call_repo(repo.begin_bulk_load)
+    except Exception as e:
+        raise HTTPException(status_code=409, detail=f"Could not enter bulk load mode: {str(e)}")
+
+@router.post("/admin/index/rebuild")
+async def rebuild_index(background: bool = True):
+    """
+    Construye / reconstruye el índice HNSW con HNSW_M y HNSW_EF_CONSTRUCTION actuales,
+    de forma concurrente. Por defecto en segundo plano (202 + job_id).
+    """
+    try:
+        if background:
+            return JSONResponse(status_code=202, content={"status": "queued", **await _enqueue_index_rebuild()})
+        return await call_repo(repo.rebuild_vector_index)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Index rebuild failed: {str(e)}")
+
+def _postprocess(rows: List[Dict[str, Any]], top_k: int, diversity: Optional[DiversityOptions]) -> List[Dict[str, Any]]:
+    if diversity is None:
+        return rows[:top_k]
+    return diversify(
+        rows,
+        top_k,
+        lambda_mult=diversity.lambda_mult,
+        max_per_document=diversity.max_per_document,
+        min_score=diversity.min_score,
+        merge=diversity.merge_adjacent,
+    )
+
+def _format_results(db_results: List[Dict[str, Any]]) -> List[SearchResult]:
+    return [
+        SearchResult(
             content_id=row["content_id"],
             title=row["title"],
             body_content=row["body_content"],
             metadata=row["metadata"],
             score=row["similarity"]
-        ))
+        )
+        for row in db_results
+    ]
 
-    return SearchResponse(
-        results=formatted_results,
-        query_text=req.query_text,
-        client_id=req.client_id
-    )
+async def _enqueue_delete(client_id: str, content_id: Optional[str] = None) -> JSONResponse:
+    payload = {"client_id": client_id, "content_id": content_id}
+    job_id = await call_repo(repo.enqueue_job, "delete", payload, client_id, JOB_MAX_ATTEMPTS)
+    content = {"status": "queued", "job_id": job_id, "client_id": client_id}
+    if content_id:
+        content["content_id"] = content_id
+    content["status_url"] = f"/api/v1/jobs/{job_id}"
+    return JSONResponse(status_code=202, content=content)
 
 @router.delete("/client/{client_id}")
-async def delete_client_data(client_id: str):
+async def delete_client_data(client_id: str, background: Optional[bool] = None):
     """
     Endpoint para eliminar toda la memoria semántica de un cliente.
+    Por defecto (DELETE_BACKGROUND_DEFAULT) se encola un trabajo que borra por lotes
+    y responde 202 con job_id; background=false borra en la misma petición.
     """
     try:
-        count = await run_in_threadpool(repo.delete_client_data, client_id)
+        if DELETE_BACKGROUND_DEFAULT if background is None else background:
+            return await _enqueue_delete(client_id)
+        count = await call_repo(repo.delete_client_data, client_id)
+        _invalidate_results(client_id)
         return {
             "status": "success",
             "client_id": client_id,
@@ -183,12 +690,16 @@ async def delete_client_data(client_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to delete client data: {str(e)}")
 
 @router.delete("/client/{client_id}/document/{content_id}")
-async def delete_document(client_id: str, content_id: str):
+async def delete_document(client_id: str, content_id: str, background: bool = False):
     """
     Endpoint para eliminar un documento específico por su ID de contenido.
+    Con background=true (documentos muy grandes) se borra por lotes en un trabajo (202).
     """
     try:
-        count = await run_in_threadpool(repo.delete_document, client_id, content_id)
+        if background:
+            return await _enqueue_delete(client_id, content_id)
+        count = await call_repo(repo.delete_document, client_id, content_id)
+        _invalidate_results(client_id)
         if count == 0:
             # Opcional: Podríamos retornar 404, pero idempotencia (borrar algo que no existe = éxito) es válida.
             # Sin embargo, para debug es útil saber si borró algo.
@@ -202,3 +713,107 @@ async def delete_document(client_id: str, content_id: str):
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete document: {str(e)}")
+
+class _ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que ejecuta on_close al terminar el envío, también si el cliente
+    se desconecta a mitad de camino (Starlette no cierra el iterador en ese caso).
+    """
+
+    def __init__(self, content, on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Blindado: tras una desconexión el scope ya está cancelado
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(self.on_close)
+
+@router.get("/client/{client_id}/export")
+async def export_client_data(client_id: str, dtype: str = "float16"):
+    """
+    Exporta los chunks del cliente con sus embeddings en formato binario (.semvec,
+    ver app/transfer.py), en streaming y desde un único snapshot. Permite mover o
+    restaurar un tenant sin volver a generar embeddings. dtype: float16 | float32.
+    """
+    if dtype not in DTYPES:
+        raise HTTPException(status_code=400, detail=f"dtype must be one of {tuple(DTYPES)}")
+    try:
+        uuid.UUID(client_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="client_id must be a UUID")
+
+    stream = export_tenant(repo, client_id, dtype, embedder.model if embedder else None)
+    # El primer bloque (header) se genera antes de responder: los errores de la base son un 500 y no un stream cortado
+    try:
+        first = await run_in_threadpool(next, stream)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+    # El generador retiene una conexión del pool y un snapshot REPEATABLE READ: se cierra
+    # al terminar o si el cliente se desconecta, sin esperar al recolector de basura
+    return _ClosingStreamingResponse(
+        itertools.chain([first], stream),
+        on_close=stream.close,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{client_id}.semvec"'},
+    )
+
+@router.post("/client/{client_id}/import")
+async def import_client_data(
+    request: Request, client_id: str, mode: str = "replace", bulk_load: bool = False, force: bool = False
+):
+    """
+    Importa un archivo .semvec (cuerpo del request) en el cliente indicado con COPY
+    binario, sin llamar al embedder. mode=replace reemplaza los datos del cliente en
+    una transacción; mode=merge agrega los chunks nuevos. Con bulk_load=true el índice
+    HNSW se reconstruye al final en segundo plano (como en /ingest/batch).
+    Si el archivo se generó con otro modelo de embeddings se rechaza salvo force=true.
+    """
+    if mode not in IMPORT_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {IMPORT_MODES}")
+    try:
+        uuid.UUID(client_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="client_id must be a UUID")
+
+    # Se vuelca a disco: los embeddings se leen con memmap sin cargarlos en memoria
+    spool = tempfile.NamedTemporaryFile(suffix=".semvec")
+    try:
+        async for part in request.stream():
+            await run_in_threadpool(spool.write, part)
+        await run_in_threadpool(spool.flush)
+        try:
+            archive = TenantArchive(spool.name)
+        except (ValueError, KeyError, struct_error) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid archive: {str(e)}")
+        archive_model = archive.header.get("model")
+        if not force and embedder and archive_model and archive_model != embedder.model:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Archive embeddings come from '{archive_model}', current model is '{embedder.model}' (use force=true)",
+            )
+        if bulk_load:
+            try:
+                await call_repo(repo.begin_bulk_load)
+            except Exception as e:
+                raise HTTPException(status_code=409, detail=f"Could not enter bulk load mode: {str(e)}")
+        try:
+            result = await run_in_threadpool(import_archive, repo, archive, client_id, mode)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid archive: {str(e)}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+    finally:
+        spool.close()
+
+    _invalidate_results(client_id)
+    metrics.rows_upserted(result["chunks_imported"])
+    if bulk_load:
+        try:
+            result["index_rebuild"] = await _enqueue_index_rebuild()
+        except Exception as e:
+            result["index_rebuild"] = {"error": f"Job enqueue failed: {str(e)}"}
+    return {"status": "success", **result}
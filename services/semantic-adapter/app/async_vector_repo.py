@@ -0,0 +1,595 @@
+import json
+import time
+import uuid
+import asyncio
+import inspect
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import asyncpg
+from pgvector import Vector
+from pgvector.asyncpg import register_vector
+from psycopg2.extras import Json
+from starlette.concurrency import run_in_threadpool
+
+from app import metrics, migrations
+from app.vector_repo import VectorRepository, LAYOUT_QUERY
+
+logger = logging.getLogger("semantic_adapter.async_vector_repo")
+
+
+async def call_repo(method: Callable, *args, **kwargs) -> Any:
+    """
+    Ejecuta un método de cualquiera de los repositorios desde código async:
+    los métodos async se esperan directamente, los síncronos van al threadpool.
+    """
+    if inspect.iscoroutinefunction(method):
+        return await method(*args, **kwargs)
+    submitted = time.perf_counter()
+
+    def run() -> Any:
+        # Espera por un hilo libre (el threadpool de anyio es compartido por todo el proceso)
+        metrics.record_stage("threadpool_wait", time.perf_counter() - submitted)
+        return method(*args, **kwargs)
+
+    return await run_in_threadpool(run)
+
+
+def _to_asyncpg(query: str, params: Iterable[Any]) -> Tuple[str, list]:
+    """
+    Traduce placeholders psycopg2 (%s) a posicionales asyncpg ($1, $2, ...).
+    Los Json de psycopg2 se pasan como objetos (el codec jsonb serializa).
+    """
+    parts = query.split("%s")
+    sql = parts[0] + "".join(f"${i}{part}" for i, part in enumerate(parts[1:], start=1))
+    return sql, [p.adapted if isinstance(p, Json) else p for p in params]
+
+
+def _vector_text(vector) -> str:
+    # Formato texto de pgvector ('[0.1,0.2,...]'); se castea a vector en SQL
+    return Vector(vector).to_text()
+
+
+def _rowcount(status: str) -> int:
+    # asyncpg devuelve el command tag: "DELETE 12", "INSERT 0 3"
+    return int(status.rsplit(" ", 1)[-1]) if status and status[-1].isdigit() else 0
+
+
+class AsyncVectorRepository:
+    """
+    Variante asyncio de VectorRepository sobre asyncpg (DB_DRIVER=asyncpg).
+
+    Expone los mismos métodos del camino caliente (búsquedas, upserts, manifiesto,
+    cache de embeddings, deletes, cola de trabajos) como corutinas, sin pasar por el
+    threadpool. El SQL se genera con el VectorRepository interno (`self.sync`), así
+    ambos drivers comparten esquema y consultas.
+
+    Las operaciones de SYNC_OPERATIONS siguen en psycopg2 a propósito: son de
+    mantenimiento y poco frecuentes (DDL, VACUUM fuera de transacción, COPY binario,
+    cursores con nombre para el export). Corren en el threadpool con el pool síncrono,
+    que se abre solo si se usan; pool_stats() reporta ambos pools.
+    """
+
+    SYNC_OPERATIONS = frozenset({
+        "migrate", "migrate_layout", "migrate_storage", "schema_status",
+        "begin_bulk_load", "rebuild_vector_index", "index_report", "explain_search", "vacuum_items",
+        "embedding_cache_summary", "evict_cached_embeddings",
+        "iter_tenant_export", "import_tenant",
+    })
+
+    def __init__(self, sync_repo: Optional[VectorRepository] = None):
+        self.sync = sync_repo or VectorRepository()
+        self.conn_url = self.sync.conn_url
+        # Mismos límites DB_POOL_* que el pool síncrono
+        self.min_size = self.sync.pool.min_size
+        self.max_size = self.sync.pool.max_size
+        self.timeout = self.sync.pool.timeout
+        # asyncpg no recicla por antigüedad: se cierran las conexiones ociosas más de este tiempo
+        self.max_inactive = self.sync.pool.max_lifetime
+        self.pool: Optional[asyncpg.Pool] = None
+        self._open_lock = asyncio.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        # Configuración, builders de SQL y operaciones de SYNC_OPERATIONS del repositorio síncrono.
+        # Una operación de base nueva sin variante asyncpg falla aquí en lugar de abrir en
+        # silencio el pool síncrono
+        if name == "sync":
+            raise AttributeError(name)
+        value = getattr(self.sync, name)
+        if callable(value) and not name.startswith("_") and name not in self.SYNC_OPERATIONS | {"resolve_ef_search"}:
+            raise AttributeError(f"{type(self).__name__} has no asyncpg implementation of '{name}'")
+        return value
+
+    # --- Ciclo de vida ---
+
+    async def open(self):
+        async with self._open_lock:
+            if self.pool is not None:
+                return
+            pool = await asyncpg.create_pool(
+                self.conn_url,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                max_inactive_connection_lifetime=self.max_inactive,
+                init=self._init_connection,
+            )
+            try:
+                async with pool.acquire(timeout=self.timeout) as conn:
+                    version = await conn.fetchval("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+                    self.sync._apply_capabilities(version)
+                    await self._ensure_schema(conn)
+            except Exception:
+                await pool.close()
+                raise
+            self.pool = pool
+
+    @staticmethod
+    async def _init_connection(conn):
+        await register_vector(conn)
+        await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+    async def _ensure_schema(self, conn):
+        """
+        Misma verificación que VectorRepository._ensure_schema. Las migraciones pendientes
+        se aplican con el repositorio síncrono (mantenimiento: su pool se abre solo para esto).
+        """
+        repo = self.sync
+        repo.layout = repo._layout_from_catalog(await conn.fetchrow(_to_asyncpg(LAYOUT_QUERY, [])[0], repo.table_name))
+        version = 0
+        if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", repo.migrations_table):
+            version = await conn.fetchval(f"SELECT coalesce(max(version), 0) FROM {repo.migrations_table}")
+        if version < migrations.LATEST_VERSION:
+            if not repo.migrate_on_start:
+                raise migrations.SchemaOutdatedError(
+                    f"Schema version {version} is behind {migrations.LATEST_VERSION}: "
+                    f"run 'python -m app.migrations upgrade'"
+                )
+            await run_in_threadpool(repo.migrate)
+        repo._known_partitions.clear()
+
+    async def ping(self) -> None:
+        if self.pool is None:
+            raise RuntimeError("repository is not open")
+        async with self._connection() as conn:
+            await conn.fetchval("SELECT 1")
+
+    async def close(self):
+        async with self._open_lock:
+            if self.pool is not None:
+                await self.pool.close()
+                self.pool = None
+        # Cierra también el pool síncrono si alguna operación de mantenimiento lo abrió
+        await run_in_threadpool(self.sync.close)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        # sync_pool: pool psycopg2 de SYNC_OPERATIONS (closed mientras no se usen)
+        if self.pool is None:
+            stats = {"driver": "asyncpg", "min_size": self.min_size, "max_size": self.max_size, "closed": True}
+        else:
+            stats = {
+                "driver": "asyncpg",
+                "min_size": self.pool.get_min_size(),
+                "max_size": self.pool.get_max_size(),
+                "size": self.pool.get_size(),
+                "idle": self.pool.get_idle_size(),
+                "in_use": self.pool.get_size() - self.pool.get_idle_size(),
+                "closed": False,
+            }
+        return {**stats, "sync_pool": self.sync.pool_stats()}
+
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[asyncpg.Connection]:
+        if self.pool is None:
+            await self.open()
+        started = time.perf_counter()
+        async with self.pool.acquire(timeout=self.timeout) as conn:
+            metrics.record_stage("db_pool_wait", time.perf_counter() - started)
+            yield conn
+
+    # --- Escritura ---
+
+    async def _ensure_partitions(self, client_ids: Iterable[str]) -> None:
+        repo = self.sync
+        if repo.layout != "tenant":
+            return
+        missing = {c for c in client_ids if repo._partition_name(c) not in repo._known_partitions}
+        if not missing:
+            return
+        async with self._connection() as conn:
+            for client_id in missing:
+                name = repo._partition_name(client_id)
+                async with conn.transaction():
+                    await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", name)
+                    # DDL sin parámetros: el literal es un UUID ya validado por _partition_name
+                    await conn.execute(
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {repo.table_name} "
+                        f"FOR VALUES IN ('{uuid.UUID(str(client_id))}')"
+                    )
+                repo._known_partitions.add(name)
+
+    async def _with_partitions(self, client_ids: Iterable[str], write: Callable[[], Any]) -> Any:
+        client_ids = list(client_ids)
+        await self._ensure_partitions(client_ids)
+        try:
+            return await write()
+        except asyncpg.exceptions.CheckViolationError:
+            if self.sync.layout != "tenant":
+                raise
+            for client_id in client_ids:
+                self.sync._known_partitions.discard(self.sync._partition_name(client_id))
+            await self._ensure_partitions(client_ids)
+            return await write()
+
+    async def upsert_document(self, doc_data: dict, embedding: list):
+        await self.upsert_documents([(doc_data, embedding)])
+
+    async def upsert_documents(self, items: List[Tuple[dict, list]], page_size: int = 500) -> List[Dict[str, Any]]:
+        if not items:
+            return []
+
+        async def write():
+            async with self._connection() as conn:
+                async with conn.transaction():
+                    return await self._upsert_rows(conn, items)
+
+        return await self._with_partitions((doc_data["client_id"] for doc_data, _ in items), write)
+
+    async def _upsert_rows(self, conn, items: List[Tuple[dict, list]]) -> List[Dict[str, Any]]:
+        # Una sola sentencia: columnas como arrays + unnest (equivalente a execute_values)
+        rows_by_hash: Dict[str, dict] = {}
+        embeddings: Dict[str, Any] = {}
+        for doc_data, embedding in items:
+            rows_by_hash[doc_data["hash"]] = doc_data
+            embeddings[doc_data["hash"]] = embedding
+        docs = list(rows_by_hash.values())
+
+        rows_sql = """
+        SELECT content_id, client_id, source, title, body_content, metadata::jsonb, hash, embedding::vector
+        FROM unnest($1::text[], $2::uuid[], $3::text[], $4::text[], $5::text[], $6::text[], $7::text[], $8::text[])
+            AS u(content_id, client_id, source, title, body_content, metadata, hash, embedding)
+        """
+        returned = await conn.fetch(
+            self.sync._upsert_query(rows_sql),
+            [d["content_id"] for d in docs],
+            [d["client_id"] for d in docs],
+            [d["source"] for d in docs],
+            [d.get("title") for d in docs],
+            [d["body_content"] for d in docs],
+            [json.dumps(d.get("metadata", {})) for d in docs],
+            [d["hash"] for d in docs],
+            [_vector_text(embeddings[d["hash"]]) for d in docs],
+        )
+        return [
+            {"hash": row["hash"], "action": "inserted" if row["inserted"] else "updated"}
+            for row in returned
+        ]
+
+    async def get_document_hashes(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        if not keys:
+            return {}
+        query, _ = _to_asyncpg(self.sync._document_hashes_query(), [])
+        async with self._connection() as conn:
+            rows = await conn.fetch(query, [c for c, _ in keys], [c for _, c in keys])
+        return {keys[row["idx"] - 1]: row["doc_hash"] for row in rows}
+
+    async def get_chunk_hashes(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Set[str]]:
+        if not keys:
+            return {}
+        query, _ = _to_asyncpg(self.sync._chunk_hashes_query(), [])
+        async with self._connection() as conn:
+            rows = await conn.fetch(query, [c for c, _ in keys], [c for _, c in keys])
+        result: Dict[Tuple[str, str], Set[str]] = {}
+        for row in rows:
+            result.setdefault(keys[row["idx"] - 1], set()).add(row["hash"])
+        return result
+
+    async def replace_documents(self, documents: List[Tuple[dict, List[Tuple[dict, Optional[list]]]]], page_size: int = 500) -> List[Dict[str, Any]]:
+        if not documents:
+            return []
+        self.sync._check_unique_documents(documents)
+
+        delete_query, _ = _to_asyncpg(self.sync._stale_chunks_query(), [])
+        manifest_query = self.sync._manifest_upsert_query(
+            "SELECT * FROM unnest($1::uuid[], $2::text[], $3::text[], $4::int[])"
+        )
+        refresh_query = self.sync._refresh_chunks_query(
+            "SELECT c, h, s, ti, m::jsonb FROM unnest($1::uuid[], $2::text[], $3::text[], $4::text[], $5::text[]) AS u(c, h, s, ti, m)"
+        )
+        new_rows = [row for _, rows in documents for row in rows if row[1] is not None]
+        kept = [doc_data for _, rows in documents for doc_data, vector in rows if vector is None]
+
+        async def write():
+            summary = []
+            async with self._connection() as conn:
+                async with conn.transaction():
+                    upserted = {r["hash"]: r["action"] for r in await self._upsert_rows(conn, new_rows)} if new_rows else {}
+                    refreshed = set()
+                    if kept:
+                        returned = await conn.fetch(
+                            refresh_query,
+                            [d["client_id"] for d in kept],
+                            [d["hash"] for d in kept],
+                            [d["source"] for d in kept],
+                            [d.get("title") for d in kept],
+                            [json.dumps(d.get("metadata", {})) for d in kept],
+                        )
+                        refreshed = {row["hash"] for row in returned}
+                    for manifest, rows in documents:
+                        hashes = [doc_data["hash"] for doc_data, _ in rows]
+                        status = await conn.execute(delete_query, manifest["client_id"], manifest["content_id"], hashes)
+                        summary.append({
+                            "client_id": manifest["client_id"],
+                            "content_id": manifest["content_id"],
+                            **self.sync._replace_counts(rows, upserted, refreshed),
+                            "deleted": _rowcount(status),
+                        })
+                    await conn.execute(
+                        manifest_query,
+                        [m["client_id"] for m, _ in documents],
+                        [m["content_id"] for m, _ in documents],
+                        [m["hash"] for m, _ in documents],
+                        [len(rows) for _, rows in documents],
+                    )
+            return summary
+
+        return await self._with_partitions((m["client_id"] for m, _ in documents), write)
+
+    # --- Cache de embeddings ---
+
+    async def get_cached_embeddings(self, model: str, text_hashes: List[str]) -> Dict[str, Any]:
+        if not text_hashes:
+            return {}
+        query, touch = (_to_asyncpg(q, [])[0] for q in self.sync._cached_embeddings_queries())
+        async with self._connection() as conn:
+            rows = await conn.fetch(query, model, text_hashes)
+            found = {row["text_hash"]: row["embedding"].to_list() for row in rows}
+            if found:
+                await conn.execute(touch, model, list(found))
+        return found
+
+    async def put_cached_embeddings(self, model: str, items: List[Tuple[str, list]]) -> int:
+        if not items:
+            return 0
+        unique = dict(items)
+        query = self.sync._cache_insert_query(
+            "SELECT $1::text, h, e::vector FROM unnest($2::text[], $3::text[]) AS u(h, e)"
+        )
+        async with self._connection() as conn:
+            status = await conn.execute(query, model, list(unique), [_vector_text(v) for v in unique.values()])
+        return _rowcount(status)
+
+    # --- Búsqueda ---
+
+    async def search_similar(
+        self,
+        client_id: str,
+        query_vector: List[float],
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+        with_embeddings: bool = False,
+    ):
+        repo = self.sync
+        query, params = _to_asyncpg(*repo._similarity_query(client_id, query_vector, top_k, filters, with_embeddings))
+        async with self._connection() as conn:
+            async with conn.transaction():
+                # SET no admite parámetros: valores enteros ya validados
+                ef_search = repo._candidate_ef_search(top_k, repo.resolve_ef_search(client_id, ef_search))
+                if ef_search:
+                    await conn.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+                if repo._iterative_scan:
+                    await conn.execute("SET LOCAL hnsw.iterative_scan = relaxed_order")
+                    return [dict(row) for row in await conn.fetch(query, *params)]
+
+                rows = await conn.fetch(query, *params)
+                if len(rows) < top_k and await self._short_result_can_grow(conn, client_id, filters, top_k, len(rows)):
+                    await conn.execute(f"SET LOCAL hnsw.ef_search = {int(repo.max_ef_search)}")
+                    rows = await conn.fetch(query, *params)
+                return [dict(row) for row in rows]
+
+    async def search_lexical(
+        self,
+        client_id: str,
+        query_text: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        query, params = _to_asyncpg(*self.sync._lexical_query(client_id, query_text, top_k, filters))
+        async with self._connection() as conn:
+            return [dict(row) for row in await conn.fetch(query, *params)]
+
+    async def get_chunks_by_hash(
+        self, client_id: str, hashes: List[str], with_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        if not hashes:
+            return []
+        query, params = _to_asyncpg(*self.sync._chunks_by_hash_query(client_id, hashes, with_embeddings))
+        async with self._connection() as conn:
+            return [dict(row) for row in await conn.fetch(query, *params)]
+
+    async def search_similar_batch(self, queries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        if not queries:
+            return []
+        repo = self.sync
+        filters = [q.get("filters") or {} for q in queries]
+        query = repo._batch_query(
+            """(
+            SELECT ord, embedding::vector AS embedding, client_id, top_k, category, source, meta::jsonb AS meta
+            FROM unnest($1::int[], $2::text[], $3::uuid[], $4::int[], $5::text[], $6::text[], $7::text[])
+                AS u(ord, embedding, client_id, top_k, category, source, meta)
+        ) AS q"""
+        )
+        args = [
+            list(range(len(queries))),
+            [_vector_text(q["query_vector"]) for q in queries],
+            [q["client_id"] for q in queries],
+            [q.get("top_k", 5) for q in queries],
+            [f.get("category") for f in filters],
+            [f.get("source") for f in filters],
+            [json.dumps(f["metadata"]) if f.get("metadata") else None for f in filters],
+        ]
+
+        async def run(conn) -> List[List[Dict[str, Any]]]:
+            grouped: List[List[Dict[str, Any]]] = [[] for _ in queries]
+            for row in await conn.fetch(query, *args):
+                row = dict(row)
+                grouped[row.pop("ord")].append(row)
+            return grouped
+
+        async with self._connection() as conn:
+            async with conn.transaction():
+                ef_search = repo._candidate_ef_search(*repo._batch_ef_search(queries))
+                if ef_search:
+                    await conn.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+                if repo._iterative_scan:
+                    await conn.execute("SET LOCAL hnsw.iterative_scan = relaxed_order")
+                    return await run(conn)
+
+                grouped = await run(conn)
+                for rows, q in zip(grouped, queries):
+                    top_k = q.get("top_k", 5)
+                    if len(rows) < top_k and await self._short_result_can_grow(conn, q["client_id"], q.get("filters"), top_k, len(rows)):
+                        await conn.execute(f"SET LOCAL hnsw.ef_search = {int(repo.max_ef_search)}")
+                        return await run(conn)
+                return grouped
+
+    async def _short_result_can_grow(self, conn, client_id: str, filters: Optional[Dict[str, Any]], top_k: int, found: int) -> bool:
+        # Ver VectorRepository._short_result_can_grow
+        query, params = _to_asyncpg(*self.sync._matching_rows_query(client_id, filters, top_k))
+        return await conn.fetchval(query, *params) > found
+
+    # --- Borrado ---
+
+    async def delete_client_data(self, client_id: str) -> int:
+        repo = self.sync
+        if repo.layout == "tenant":
+            return await self._drop_tenant_partition(client_id)
+        async with self._connection() as conn:
+            async with conn.transaction():
+                status = await conn.execute(f"DELETE FROM {repo.table_name} WHERE client_id = $1", client_id)
+                await conn.execute(f"DELETE FROM {repo.manifest_table} WHERE client_id = $1", client_id)
+        return _rowcount(status)
+
+    async def _drop_tenant_partition(self, client_id: str) -> int:
+        repo = self.sync
+        name = repo._partition_name(client_id)
+        async with self._connection() as conn:
+            async with conn.transaction():
+                exists = await conn.fetchval("SELECT to_regclass($1)", name) is not None
+                deleted_count = await conn.fetchval(f"SELECT count(*) FROM {name}") if exists else 0
+                await conn.execute(f"DELETE FROM {repo.manifest_table} WHERE client_id = $1", client_id)
+
+            if exists:
+                # Fuera de transacción (asyncpg está en autocommit por defecto)
+                try:
+                    await conn.execute(f"ALTER TABLE {repo.table_name} DETACH PARTITION {name} CONCURRENTLY")
+                except (asyncpg.exceptions.PostgresSyntaxError, asyncpg.exceptions.FeatureNotSupportedError):
+                    logger.info(f"DETACH CONCURRENTLY not available, dropping {name} directly")
+                await conn.execute(f"DROP TABLE IF EXISTS {name}")
+        repo._known_partitions.discard(name)
+        return deleted_count
+
+    async def delete_chunks_batch(
+        self, client_id: str, content_id: Optional[str] = None, batch_size: int = 1000, with_manifest: bool = False
+    ) -> int:
+        # Ver VectorRepository.delete_chunks_batch
+        query, args = _to_asyncpg(
+            self.sync._batch_delete_query(content_id is not None),
+            [client_id, client_id] + ([content_id] if content_id else []) + [batch_size],
+        )
+        async with self._connection() as conn:
+            async with conn.transaction():
+                deleted_count = _rowcount(await conn.execute(query, *args))
+                if with_manifest and deleted_count < batch_size:
+                    manifest_query, manifest_args = _to_asyncpg(
+                        self.sync._manifest_delete_query(content_id is not None),
+                        [client_id] + ([content_id] if content_id else []),
+                    )
+                    await conn.execute(manifest_query, *manifest_args)
+        return deleted_count
+
+    async def count_chunks(self, client_id: str, content_id: Optional[str] = None) -> int:
+        repo = self.sync
+        async with self._connection() as conn:
+            if content_id:
+                return await conn.fetchval(
+                    f"SELECT count(*) FROM {repo.table_name} WHERE client_id = $1 AND content_id = $2", client_id, content_id
+                )
+            return await conn.fetchval(f"SELECT count(*) FROM {repo.table_name} WHERE client_id = $1", client_id)
+
+    async def delete_manifest(self, client_id: str, content_id: Optional[str] = None) -> int:
+        repo = self.sync
+        async with self._connection() as conn:
+            if content_id:
+                status = await conn.execute(
+                    f"DELETE FROM {repo.manifest_table} WHERE client_id = $1 AND content_id = $2", client_id, content_id
+                )
+            else:
+                status = await conn.execute(f"DELETE FROM {repo.manifest_table} WHERE client_id = $1", client_id)
+        return _rowcount(status)
+
+    async def delete_document(self, client_id: str, content_id: str) -> int:
+        repo = self.sync
+        async with self._connection() as conn:
+            async with conn.transaction():
+                status = await conn.execute(
+                    f"DELETE FROM {repo.table_name} WHERE client_id = $1 AND content_id = $2", client_id, content_id
+                )
+                await conn.execute(
+                    f"DELETE FROM {repo.manifest_table} WHERE client_id = $1 AND content_id = $2", client_id, content_id
+                )
+        return _rowcount(status)
+
+    async def chunk_relation(self, client_id: str) -> Optional[str]:
+        query, args = _to_asyncpg(self.sync._chunk_relation_query(), [client_id])
+        async with self._connection() as conn:
+            return await conn.fetchval(query, *args)
+
+    # --- Cola de trabajos (semantic_jobs) ---
+    # Cada worker la consulta alrededor de una vez por segundo: sin pasar por el threadpool
+    # ni por el pool síncrono
+
+    async def enqueue_job(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        client_id: Optional[str] = None,
+        max_attempts: int = 5,
+    ) -> str:
+        query, args = _to_asyncpg(self.sync._enqueue_job_query(), [kind, client_id, Json(payload), max_attempts])
+        async with self._connection() as conn:
+            return await conn.fetchval(query, *args)
+
+    async def claim_job(self, worker_id: str, lock_timeout: float = 600.0) -> Optional[Dict[str, Any]]:
+        query, args = _to_asyncpg(self.sync._claim_job_query(), [worker_id, float(lock_timeout)])
+        async with self._connection() as conn:
+            row = await conn.fetchrow(query, *args)
+        return dict(row) if row else None
+
+    async def update_job_progress(self, job_id: str, worker_id: str, progress: Dict[str, Any]) -> bool:
+        return await self._update_job(self.sync._job_progress_query(), [Json(progress), job_id, worker_id])
+
+    async def heartbeat_job(self, job_id: str, worker_id: str) -> bool:
+        return await self._update_job(self.sync._job_heartbeat_query(), [job_id, worker_id])
+
+    async def complete_job(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        return await self._update_job(self.sync._complete_job_query(), [Json(result), job_id, worker_id])
+
+    async def fail_job(self, job_id: str, worker_id: str, error: str, retry_in: Optional[float] = None) -> bool:
+        query, params = self.sync._fail_job_query(job_id, worker_id, error, None if retry_in is None else float(retry_in))
+        return await self._update_job(query, params)
+
+    async def release_job(self, job_id: str, worker_id: str) -> bool:
+        return await self._update_job(self.sync._release_job_query(), [job_id, worker_id])
+
+    async def _update_job(self, query: str, params: Iterable[Any]) -> bool:
+        query, args = _to_asyncpg(query, params)
+        async with self._connection() as conn:
+            return _rowcount(await conn.execute(query, *args)) > 0
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        query, args = _to_asyncpg(self.sync._get_job_query(), [job_id])
+        async with self._connection() as conn:
+            row = await conn.fetchrow(query, *args)
+        return dict(row) if row else None
@@ -1,36 +1,302 @@
-from typing import List
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import os
+import re
+import zlib
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+# Separadores de RecursiveCharacterTextSplitter (modo compat: mismos límites de chunk que antes)
+COMPAT_SEPARATORS = ["\n\n", "\n", " ", ""]
+# Modo sentence: párrafo > línea > oración > cláusula > palabra (la puntuación queda al final del fragmento)
+SENTENCE_SEPARATORS = ["\n\n", "\n", ". ", "? ", "! ", "; ", ": ", ", ", " ", ""]
+MODES = ("compat", "sentence", "cdc")
+
+# Aproximación de tokens sin tokenizer del proveedor: palabras y signos de puntuación
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    return sum(1 for _ in _TOKEN_PATTERN.finditer(text))
+
+
+LENGTH_FUNCTIONS: Dict[str, Callable[[str], int]] = {"chars": len, "tokens": count_tokens}
+
+
+class TextChunker:
+    """
+    Motor de chunking recursivo por separadores, compatible con el algoritmo de
+    LangChain RecursiveCharacterTextSplitter (mismas fronteras con COMPAT_SEPARATORS
+    y keep_separator="start"), pero:
+
+    - Separadores literales resueltos con `in` / str.split en lugar de regex por llamada.
+    - Merge lineal (ventana con índice) en lugar de recortar listas en cada paso.
+    - Longitudes de cada fragmento calculadas una sola vez (importa con length_unit="tokens").
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 100,
+        separators: Optional[Sequence[str]] = None,
+        keep_separator: str = "start",
+        length_unit: str = "chars",
+    ):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be > 0, got {chunk_size}")
+        if chunk_overlap < 0 or chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap must be between 0 and chunk_size, got {chunk_overlap}")
+        if keep_separator not in ("start", "end"):
+            raise ValueError("keep_separator must be 'start' or 'end'")
+        if length_unit not in LENGTH_FUNCTIONS:
+            raise ValueError(f"length_unit must be one of {tuple(LENGTH_FUNCTIONS)}")
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or COMPAT_SEPARATORS
+        self.keep_separator = keep_separator
+        self.length_unit = length_unit
+        self._length = LENGTH_FUNCTIONS[length_unit]
+
+    def split_text(self, text: str) -> List[str]:
+        return self._split(text, self.separators)
+
+    def _split(self, text: str, separators: Sequence[str]) -> List[str]:
+        # Primer separador presente en el texto; "" = corte por carácter
+        separator, remaining = separators[-1], []
+        for i, candidate in enumerate(separators):
+            if not candidate:
+                separator = candidate
+                break
+            if candidate in text:
+                separator, remaining = candidate, separators[i + 1:]
+                break
+
+        chunks: List[str] = []
+        good: List[str] = []
+        good_lengths: List[int] = []
+        for piece in self._split_keep(text, separator):
+            length = self._length(piece)
+            if length < self.chunk_size:
+                good.append(piece)
+                good_lengths.append(length)
+                continue
+            if good:
+                chunks.extend(self._merge(good, good_lengths))
+                good, good_lengths = [], []
+            if remaining:
+                chunks.extend(self._split(piece, remaining))
+            else:
+                chunks.append(piece)
+        if good:
+            chunks.extend(self._merge(good, good_lengths))
+        return chunks
+
+    def _split_keep(self, text: str, separator: str) -> List[str]:
+        if not separator:
+            return list(text)
+        parts = text.split(separator)
+        if self.keep_separator == "start":
+            pieces = [parts[0]] + [separator + part for part in parts[1:]]
+        else:
+            pieces = [part + separator for part in parts[:-1]] + [parts[-1]]
+        return [piece for piece in pieces if piece]
+
+    def _merge(self, pieces: List[str], lengths: List[int]) -> List[str]:
+        """
+        Agrupa fragmentos contiguos hasta chunk_size, solapando hasta chunk_overlap
+        con el chunk anterior. El separador ya está incluido en cada fragmento.
+        """
+        docs: List[str] = []
+        start, total = 0, 0
+        for end, length in enumerate(lengths):
+            if total + length > self.chunk_size and end > start:
+                doc = "".join(pieces[start:end]).strip()
+                if doc:
+                    docs.append(doc)
+                # Se descartan fragmentos del inicio hasta respetar el solapamiento
+                # y dejar lugar al fragmento actual
+                while start < end and (total > self.chunk_overlap or (total + length > self.chunk_size and total > 0)):
+                    total -= lengths[start]
+                    start += 1
+            total += length
+        doc = "".join(pieces[start:]).strip()
+        if doc:
+            docs.append(doc)
+        return docs
+
+
+# Palabra + espacios que la siguen (o espacios sueltos al inicio del texto)
+_CDC_TOKEN = re.compile(r"\S+\s*|\s+")
+
+
+class ContentDefinedChunker:
+    """
+    Chunking definido por contenido (CDC): las fronteras las decide un rolling hash
+    sobre una ventana de `window` palabras, no la posición en el documento.
+
+    Una edición solo mueve las fronteras del chunk que la contiene: en cuanto el hash
+    vuelve a coincidir después de la edición, los cortes siguientes son los mismos que
+    antes. Tamaños en caracteres: sin cortes antes de min_size, corte forzado en
+    chunk_size y tamaño esperado ~avg_size. Los chunks no se solapan.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        min_size: Optional[int] = None,
+        avg_size: Optional[int] = None,
+        window: int = 2,
+    ):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be > 0, got {chunk_size}")
+        self.chunk_size = chunk_size
+        self.min_size = min_size if min_size is not None else chunk_size // 4
+        self.avg_size = avg_size if avg_size is not None else chunk_size // 2
+        if not 0 <= self.min_size < self.avg_size <= chunk_size:
+            raise ValueError("Expected 0 <= min_size < avg_size <= chunk_size")
+        self.window = window
+        # Probabilidad de corte por palabra proporcional a su largo: ~1 corte cada (avg - min) caracteres
+        self._divisor = self.avg_size - self.min_size
+
+    def split_text(self, text: str) -> List[str]:
+        chunks: List[str] = []
+        start = previous_end = 0
+        recent: List[str] = []
+        for match in _CDC_TOKEN.finditer(text):
+            end = match.end()
+            if end - start > self.chunk_size and previous_end > start:
+                self._emit(chunks, text[start:previous_end])
+                start = previous_end
+            while end - start > self.chunk_size:
+                # Palabra más larga que un chunk: corte duro
+                self._emit(chunks, text[start:start + self.chunk_size])
+                start += self.chunk_size
+            previous_end = end
+
+            token = match.group()
+            recent.append(token.rstrip())
+            if len(recent) > self.window:
+                recent.pop(0)
+            # El ancla excluye los espacios: cambios de espaciado no mueven fronteras
+            anchor = zlib.crc32("\x00".join(recent).encode("utf-8"))
+            if end - start >= self.min_size and anchor % self._divisor < len(token):
+                self._emit(chunks, text[start:end])
+                start = end
+        if start < len(text):
+            self._emit(chunks, text[start:])
+        return chunks
+
+    @staticmethod
+    def _emit(chunks: List[str], piece: str) -> None:
+        piece = piece.strip()
+        if piece:
+            chunks.append(piece)
+
+
+def _build_engine(mode: str, chunk_size: int, chunk_overlap: int, length_unit: str):
+    if mode == "cdc":
+        if length_unit != "chars":
+            raise ValueError("CHUNKER_MODE=cdc measures chunk size in characters (CHUNKER_LENGTH_UNIT=chars)")
+        return ContentDefinedChunker(chunk_size)
+    if mode == "compat":
+        return TextChunker(chunk_size, chunk_overlap, COMPAT_SEPARATORS, "start", length_unit)
+    return TextChunker(chunk_size, chunk_overlap, SENTENCE_SEPARATORS, "end", length_unit)
+
+
+_process_engines: Dict[Tuple, Any] = {}
+
+
+def _split_in_process(config: Tuple, text: str) -> List[str]:
+    # Un motor por configuración y por proceso del pool
+    engine = _process_engines.get(config)
+    if engine is None:
+        engine = _process_engines[config] = _build_engine(*config)
+    return engine.split_text(text)
+
 
 class Chunker:
     """
-    Logic for text fragmentation using LangChain's RecursiveCharacterTextSplitter.
+    Logic for text fragmentation.
+
+    Uses the native TextChunker engine. `mode="compat"` reproduces the chunk
+    boundaries of LangChain's RecursiveCharacterTextSplitter (the previous
+    implementation), so existing documents keep their chunk hashes.
+    `mode="sentence"` prefers sentence and clause boundaries.
+    `mode="cdc"` uses content-defined boundaries (see ContentDefinedChunker);
+    chunk ids are then derived from chunk content, so re-ingesting an edited
+    document only embeds and writes the chunks that actually changed.
     """
 
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 100):
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 100,
+        mode: Optional[str] = None,
+        length_unit: Optional[str] = None,
+        process_threshold: Optional[int] = None,
+        process_workers: Optional[int] = None,
+    ):
         """
         Initialize the Chunker with configurable size and overlap.
-        
+
         Args:
             chunk_size (int): Maximum size of chunks. Defaults to 1000.
             chunk_overlap (int): Overlap between chunks. Defaults to 100.
+            mode (str): "compat", "sentence" or "cdc" (env CHUNKER_MODE, default compat).
+            length_unit (str): "chars" or "tokens" (env CHUNKER_LENGTH_UNIT, default chars).
+            process_threshold (int): texts with at least this many characters are split
+                in a process pool (env CHUNKER_PROCESS_MIN_CHARS, default 200000).
+            process_workers (int): process pool size (env CHUNKER_PROCESS_WORKERS).
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self._splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            length_function=len,
-            is_separator_regex=False,
-        )
+        self.mode = (mode or os.getenv("CHUNKER_MODE", "compat")).lower()
+        if self.mode not in MODES:
+            raise ValueError(f"CHUNKER_MODE must be one of {MODES}")
+        self.length_unit = (length_unit or os.getenv("CHUNKER_LENGTH_UNIT", "chars")).lower()
+        self.process_threshold = process_threshold or int(os.getenv("CHUNKER_PROCESS_MIN_CHARS", "200000"))
+        self.process_workers = process_workers or int(os.getenv("CHUNKER_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+        # Textos cortos se fragmentan en el propio event loop (más barato que el salto de hilo)
+        self.inline_threshold = int(os.getenv("CHUNKER_INLINE_MAX_CHARS", "20000"))
+
+        self._config = (self.mode, chunk_size, chunk_overlap, self.length_unit)
+        self._engine = _build_engine(*self._config)
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def content_defined(self) -> bool:
+        """True when chunk ids must be derived from chunk content (see pipeline.chunk_ids)."""
+        return self.mode == "cdc"
 
     def split_text(self, text: str) -> List[str]:
         """
         Split a text into chunks based on the configured settings.
-        
+
         Args:
             text (str): The input text to be chunked.
-            
+
         Returns:
             List[str]: list of text chunks.
         """
-        return self._splitter.split_text(text)
+        return self._engine.split_text(text)
+
+    async def asplit_text(self, text: str) -> List[str]:
+        """
+        Same as split_text without blocking the event loop: short texts inline,
+        medium texts in the threadpool, large texts (e.g. long PDFs) in a process pool.
+        """
+        if len(text) < self.inline_threshold:
+            return self._engine.split_text(text)
+        if len(text) < self.process_threshold or self.process_workers <= 0:
+            return await run_in_threadpool(self._engine.split_text, text)
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(max_workers=self.process_workers)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._processes, _split_in_process, self._config, text)
+
+    def close(self) -> None:
+        if self._processes is not None:
+            self._processes.shutdown(cancel_futures=True)
+            self._processes = None
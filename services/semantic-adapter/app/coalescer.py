@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("semantic_adapter.coalescer")
+
+
+class QueryEmbeddingCoalescer:
+    """
+    Agrupa llamadas concurrentes a embed_query en una sola llamada batch al proveedor.
+
+    La primera query que llega abre una ventana de `window_ms`; todas las que llegan
+    durante la ventana (o hasta completar `max_batch`) se envían juntas con
+    embed_queries y cada solicitante recibe su vector. Queries idénticas dentro
+    del lote se embeben una sola vez.
+    """
+
+    def __init__(self, embedder, window_ms: float = 5.0, max_batch: int = 100):
+        self.embedder = embedder
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "batches": 0, "provider_texts": 0, "max_batch_seen": 0, "errors": 0}
+
+    @property
+    def model(self) -> str:
+        return self.embedder.model
+
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embedder.embed_documents(texts)
+
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # Un lote explícito ya está agrupado: va directo al proveedor
+        return await self._provider_embed_queries(texts)
+
+    async def embed_query(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_batch_size"] = round(stats["queries"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["window_ms"] = self.window * 1000
+        stats["max_batch"] = self.max_batch
+        return stats
+
+    # --- Internos ---
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)  # referencia fuerte hasta que termine
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        unique = list(dict.fromkeys(text for text, _ in batch))
+        with self._lock:
+            self._stats["queries"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["provider_texts"] += len(unique)
+            self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], len(batch))
+
+        try:
+            vectors = await self._provider_embed_queries(unique)
+            if len(vectors) != len(unique):
+                raise ValueError("Mismatch between queries and vectors generated")
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_text = dict(zip(unique, vectors))
+        for text, future in batch:
+            # El solicitante pudo cancelar (ej: cliente desconectado)
+            if not future.done():
+                future.set_result(by_text[text])
+
+    async def _provider_embed_queries(self, texts: List[str]) -> List[List[float]]:
+        if hasattr(self.embedder, "embed_queries"):
+            return await self.embedder.embed_queries(texts)
+        return list(await asyncio.gather(*(self.embedder.embed_query(t) for t in texts)))
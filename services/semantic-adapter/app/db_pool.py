@@ -0,0 +1,289 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Any, Iterator, Optional
+
+import psycopg2
+from psycopg2 import extensions
+
+from app import metrics
+
+logger = logging.getLogger("semantic_adapter.db_pool")
+
+
+class PoolTimeout(Exception):
+    """No se obtuvo una conexión del pool dentro del tiempo de espera."""
+
+
+@dataclass
+class _PooledConnection:
+    conn: Any
+    created_at: float = field(default_factory=time.monotonic)
+    last_used_at: float = field(default_factory=time.monotonic)
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones psycopg2, seguro entre hilos.
+
+    - Mantiene entre `min_size` y `max_size` conexiones abiertas.
+    - `configure` se ejecuta una sola vez por conexión física (ej: register_vector).
+    - Verifica la conexión al hacer checkout si estuvo ociosa más de `check_idle` segundos.
+    - Recicla conexiones que superan `max_lifetime` o que fallaron durante su uso.
+    """
+
+    def __init__(
+        self,
+        dsn: Optional[str],
+        min_size: int = 1,
+        max_size: int = 10,
+        max_lifetime: float = 1800.0,
+        timeout: float = 30.0,
+        check_idle: float = 30.0,
+        configure: Optional[Callable[[Any], None]] = None,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._configure = configure
+
+        self._idle: Deque[_PooledConnection] = deque()
+        self._in_use: Dict[int, _PooledConnection] = {}
+        self._size = 0  # conexiones abiertas + en proceso de apertura
+        self._cond = threading.Condition()
+        self._closed = True
+
+        self._stats: Dict[str, float] = {
+            "requests": 0,
+            "requests_waiting": 0,
+            "wait_time_ms": 0.0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "connections_recycled": 0,
+            "health_check_failures": 0,
+        }
+
+    @classmethod
+    def from_env(cls, dsn: Optional[str], configure: Optional[Callable[[Any], None]] = None) -> "ConnectionPool":
+        """
+        Construye el pool leyendo los límites desde variables de entorno DB_POOL_*.
+        """
+        return cls(
+            dsn,
+            min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+            max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+            timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            check_idle=float(os.getenv("DB_POOL_CHECK_IDLE", "30")),
+            configure=configure,
+        )
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def open(self) -> None:
+        """
+        Abre el pool y precalienta `min_size` conexiones.
+        """
+        with self._cond:
+            if not self._closed:
+                return
+            self._closed = False
+
+        for _ in range(self.min_size):
+            with self._cond:
+                self._size += 1
+            try:
+                self._idle_push(self._connect())
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+
+    def close(self) -> None:
+        """
+        Cierra las conexiones ociosas; las que están en uso se cierran al devolverse.
+        """
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for item in idle:
+            self._discard(item.conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Entrega una conexión del pool y la devuelve al terminar.
+        Si el bloque falla con un error de conexión, la conexión se descarta.
+        """
+        started = time.perf_counter()
+        item = self._checkout()
+        metrics.record_stage("db_pool_wait", time.perf_counter() - started)
+        broken = False
+        try:
+            yield item.conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self._checkin(item, broken)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Estado actual del pool y contadores acumulados.
+        """
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "closed": self._closed,
+                **self._stats,
+            }
+
+    # --- Internos ---
+
+    def _connect(self) -> _PooledConnection:
+        conn = psycopg2.connect(self.dsn)
+        try:
+            if self._configure:
+                self._configure(conn)
+                # configure puede abrir una transacción implícita
+                conn.rollback()
+        except Exception:
+            conn.close()
+            raise
+        with self._cond:
+            self._stats["connections_created"] += 1
+        return _PooledConnection(conn)
+
+    def _discard(self, conn: Any) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._stats["connections_closed"] += 1
+
+    def _idle_push(self, item: _PooledConnection) -> None:
+        with self._cond:
+            item.last_used_at = time.monotonic()
+            self._idle.append(item)
+            self._cond.notify()
+
+    def _expired(self, item: _PooledConnection, now: float) -> bool:
+        return self.max_lifetime > 0 and now - item.created_at > self.max_lifetime
+
+    def _healthy(self, item: _PooledConnection, now: float) -> bool:
+        if item.conn.closed:
+            return False
+        if now - item.last_used_at < self.check_idle:
+            return True
+        try:
+            with item.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            item.conn.rollback()
+            return True
+        except Exception:
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+            return False
+
+    def _checkout(self) -> _PooledConnection:
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        started = time.monotonic()
+
+        with self._cond:
+            self._stats["requests"] += 1
+
+        while True:
+            item: Optional[_PooledConnection] = None
+            create = False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Connection pool is closed")
+                    if self._idle:
+                        # LIFO: reutiliza la conexión más reciente (más probable que esté viva)
+                        item = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"Timed out after {self.timeout}s waiting for a database connection "
+                            f"(max_size={self.max_size})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if create:
+                try:
+                    item = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                now = time.monotonic()
+                if self._expired(item, now) or not self._healthy(item, now):
+                    with self._cond:
+                        self._size -= 1
+                        self._stats["connections_recycled"] += 1
+                    self._discard(item.conn)
+                    continue
+
+            with self._cond:
+                self._in_use[id(item.conn)] = item
+                if waited:
+                    self._stats["requests_waiting"] += 1
+                    self._stats["wait_time_ms"] += (time.monotonic() - started) * 1000
+            return item
+
+    def _checkin(self, item: _PooledConnection, broken: bool) -> None:
+        conn = item.conn
+        with self._cond:
+            self._in_use.pop(id(conn), None)
+
+        if not broken and not conn.closed:
+            try:
+                # Limpia transacciones abiertas (ej: SELECT sin commit) antes de reutilizar
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                broken = True
+
+        recycle = broken or conn.closed or self._closed or self._expired(item, time.monotonic())
+        if recycle:
+            with self._cond:
+                self._size -= 1
+                if broken:
+                    self._stats["connections_recycled"] += 1
+                self._cond.notify()
+            self._discard(conn)
+            return
+
+        self._idle_push(item)
@@ -0,0 +1,77 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from app.async_vector_repo import call_repo
+from app.jobs import ProgressFn
+
+logger = logging.getLogger("semantic_adapter.deletion")
+
+
+class BatchedDeleter:
+    """
+    Handler de trabajos 'delete' (semantic_jobs): baja de un cliente o de un documento
+    sin afectar la latencia de búsqueda de los demás tenants.
+
+    - Primero se olvida el manifest (una re-ingesta posterior no responde 'unchanged');
+      el lote final lo vuelve a borrar en su misma transacción, por si una re-ingesta
+      lo escribió mientras se borraban los chunks.
+    - Los chunks se borran en lotes de batch_size filas, cada uno en su propia transacción
+      corta, con una pausa entre lotes para que autovacuum y la replicación acompañen.
+    - Layout tenant: la baja de un cliente desacopla y elimina su partición (sin lotes).
+    - Al terminar, VACUUM (ANALYZE) de la tabla / partición afectada.
+
+    El trabajo es idempotente: si un worker cae a mitad, el reintento borra lo que falta.
+    """
+
+    def __init__(
+        self,
+        repo,
+        batch_size: Optional[int] = None,
+        pause: Optional[float] = None,
+        vacuum: Optional[bool] = None,
+    ):
+        self.repo = repo
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv("DELETE_BATCH_SIZE", "1000"))
+        self.pause = pause if pause is not None else float(os.getenv("DELETE_BATCH_PAUSE_MS", "50")) / 1000
+        self.vacuum = vacuum if vacuum is not None else os.getenv("DELETE_VACUUM", "true").lower() == "true"
+        if self.batch_size <= 0:
+            raise ValueError("DELETE_BATCH_SIZE must be positive")
+
+    async def run(self, payload: Dict[str, Any], progress: ProgressFn) -> Dict[str, Any]:
+        client_id, content_id = payload["client_id"], payload.get("content_id")
+        result: Dict[str, Any] = {"status": "success", "client_id": client_id}
+        if content_id:
+            result["content_id"] = content_id
+
+        await call_repo(self.repo.delete_manifest, client_id, content_id)
+        if content_id is None and self.repo.layout == "tenant":
+            await progress({"stage": "dropping_partition"})
+            result["records_deleted"] = await call_repo(self.repo.delete_client_data, client_id)
+            return result
+
+        total = await call_repo(self.repo.count_chunks, client_id, content_id)
+        relation = await call_repo(self.repo.chunk_relation, client_id) if total else None
+        deleted = batches = 0
+        await progress({"stage": "deleting", "deleted": 0, "total": total})
+        while True:
+            count = await call_repo(self.repo.delete_chunks_batch, client_id, content_id, self.batch_size, with_manifest=True)
+            deleted += count
+            batches += 1
+            await progress({"stage": "deleting", "deleted": deleted, "total": total, "batches": batches})
+            if count < self.batch_size:
+                break
+            await asyncio.sleep(self.pause)
+        result["records_deleted"] = deleted
+
+        # Un documento suelto no justifica un VACUUM: autovacuum alcanza
+        if self.vacuum and content_id is None and deleted:
+            await progress({"stage": "vacuum", "deleted": deleted, "total": total, "relation": relation})
+            try:
+                result["vacuum"] = await call_repo(self.repo.vacuum_items, relation)
+            except Exception as e:
+                # Los datos ya se borraron: autovacuum terminará el trabajo
+                logger.warning(f"VACUUM after deleting client {client_id} failed: {e}")
+                result["vacuum"] = {"relation": relation, "error": str(e)}
+        return result
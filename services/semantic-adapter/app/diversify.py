@@ -0,0 +1,174 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Solapamiento mínimo (caracteres) para unir dos chunks contiguos sin duplicar texto
+MIN_MERGE_OVERLAP = 20
+
+
+def as_matrix(vectors: Sequence[Any]) -> np.ndarray:
+    """
+    Matriz float32 (n, dim) con filas normalizadas (L2). Acepta listas, ndarrays
+    o pgvector.Vector (lo que devuelven psycopg2 / asyncpg).
+    """
+    rows = [v.to_numpy() if hasattr(v, "to_numpy") else np.asarray(v) for v in vectors]
+    matrix = np.asarray(rows, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def mmr_select(
+    relevance: np.ndarray,
+    vectors: np.ndarray,
+    top_k: int,
+    lambda_mult: float = 0.5,
+    groups: Optional[Sequence[Any]] = None,
+    max_per_group: Optional[int] = None,
+) -> List[int]:
+    """
+    Maximal Marginal Relevance vectorizado:
+    argmax_i  lambda * rel(i) - (1 - lambda) * max_{j elegido} cos(i, j).
+
+    La similitud entre candidatos se calcula una sola vez (vectors @ vectors.T) y la
+    penalización de redundancia se actualiza con un np.maximum por paso.
+    Con groups / max_per_group se limita la cantidad de elegidos por grupo (ej: content_id).
+
+    Returns:
+        Índices elegidos, en orden de selección.
+    """
+    n = len(relevance)
+    if n == 0 or top_k <= 0:
+        return []
+    pairwise = vectors @ vectors.T
+    redundancy = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    group_ids = np.unique(np.asarray(groups, dtype=object), return_inverse=True)[1] if groups is not None else None
+    group_counts = np.zeros(group_ids.max() + 1, dtype=int) if group_ids is not None else None
+
+    selected: List[int] = []
+    while len(selected) < top_k and available.any():
+        # Primer paso: sin elegidos, solo cuenta la relevancia
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * penalty
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best])
+        if group_ids is not None and max_per_group:
+            group_counts[group_ids[best]] += 1
+            if group_counts[group_ids[best]] >= max_per_group:
+                available &= group_ids != group_ids[best]
+    return selected
+
+
+def _chunk_index(row: Dict[str, Any]) -> Optional[int]:
+    index = (row.get("metadata") or {}).get("chunk_index")
+    return index if isinstance(index, int) else None
+
+
+def _predecessors(rows: List[Dict[str, Any]], positions: List[int]) -> Dict[int, int]:
+    """
+    Chunk anterior (posición en rows) de cada chunk de un documento, si está en el resultado.
+    Con metadata.prev_chunk se enlaza por id; las filas anteriores a registrarlo usan
+    chunk_index consecutivo.
+    """
+    by_hash = {rows[p].get("hash"): p for p in positions if "prev_chunk" in rows[p]["metadata"]}
+    by_index = {_chunk_index(rows[p]): p for p in positions if "prev_chunk" not in rows[p]["metadata"]}
+    previous = {}
+    for position in positions:
+        metadata = rows[position]["metadata"]
+        if "prev_chunk" in metadata:
+            candidate = by_hash.get(metadata["prev_chunk"]) if metadata["prev_chunk"] else None
+        else:
+            candidate = by_index.get(_chunk_index(rows[position]) - 1)
+        if candidate is not None and candidate != position:
+            previous[position] = candidate
+    return previous
+
+
+def _join_overlapping(first: str, second: str) -> str:
+    # El chunker repite hasta chunk_overlap caracteres del final del chunk anterior
+    for size in range(min(len(first), len(second)), MIN_MERGE_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first} {second}"
+
+
+def merge_adjacent(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Une chunks contiguos (mismo content_id, metadata.prev_chunk = id del chunk anterior)
+    en un solo pasaje, sin repetir el texto solapado. El pasaje conserva la posición y el
+    score del mejor chunk. Los chunks sin metadata.chunk_index (ingeridos antes de
+    registrarlo) no se unen.
+    """
+    by_document: Dict[Any, List[int]] = {}
+    for position, row in enumerate(rows):
+        if _chunk_index(row) is not None:
+            by_document.setdefault(row["content_id"], []).append(position)
+
+    absorbed = set()
+    merged = {position: dict(row) for position, row in enumerate(rows)}
+    for positions in by_document.values():
+        previous = _predecessors(rows, positions)
+        following = {}
+        for position, before in previous.items():
+            following.setdefault(before, position)
+        for start in positions:
+            if start in previous and following.get(previous[start]) == start:
+                continue  # no es el primero de su tramo
+            run = [start]
+            while run[-1] in following and following[run[-1]] not in run:
+                run.append(following[run[-1]])
+            if len(run) > 1:
+                head = min(run)  # el mejor rankeado del grupo (rows viene ordenado por relevancia)
+                text = rows[run[0]]["body_content"]
+                for part in run[1:]:
+                    text = _join_overlapping(text, rows[part]["body_content"])
+                merged[head]["body_content"] = text
+                merged[head]["similarity"] = max(rows[p]["similarity"] for p in run)
+                merged[head]["merged_chunks"] = [_chunk_index(rows[p]) for p in run]
+                absorbed.update(p for p in run if p != head)
+    return [merged[p] for p in range(len(rows)) if p not in absorbed]
+
+
+def diversify(
+    rows: List[Dict[str, Any]],
+    top_k: int,
+    lambda_mult: float = 0.5,
+    max_per_document: Optional[int] = None,
+    min_score: Optional[float] = None,
+    merge: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Post-proceso de resultados de search_similar(..., with_embeddings=True):
+    corte por similitud, MMR con límite por documento y unión de chunks contiguos.
+    Si alguna fila no trae embedding (léxico / híbrido) se omite el MMR.
+    Devuelve como máximo top_k pasajes (menos si se unieron o no pasaron el corte),
+    sin la columna embedding.
+    """
+    if min_score is not None:
+        rows = [row for row in rows if row["similarity"] >= min_score]
+    if not rows:
+        return []
+
+    relevance = np.asarray([row["similarity"] for row in rows], dtype=np.float32)
+    groups = [row["content_id"] for row in rows]
+    if all(row.get("embedding") is not None for row in rows):
+        selected = mmr_select(
+            relevance, as_matrix([row["embedding"] for row in rows]), top_k, lambda_mult, groups, max_per_document
+        )
+    else:
+        # Sin vectores (resultados léxicos / híbridos): solo el límite por documento, en orden de ranking
+        selected, counts = [], {}
+        for i, group in enumerate(groups):
+            if len(selected) == top_k:
+                break
+            if max_per_document and counts.get(group, 0) >= max_per_document:
+                continue
+            counts[group] = counts.get(group, 0) + 1
+            selected.append(i)
+    # Orden final por relevancia: MMR decide qué entra, no la posición
+    chosen = sorted(selected, key=lambda i: -relevance[i])
+    result = [{k: v for k, v in rows[i].items() if k != "embedding"} for i in chosen]
+    return merge_adjacent(result) if merge else result
@@ -1,6 +1,13 @@
 import os
-from typing import List
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import math
+import time
+import random
+import asyncio
+import hashlib
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from app.scheduler import RateLimitError
 
 class GeminiEmbedder:
     """
@@ -16,11 +23,30 @@ class GeminiEmbedder:
         self.api_key = os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             raise ValueError("GOOGLE_API_KEY environment variable is not set.")
-        
-        self._client = GoogleGenerativeAIEmbeddings(
-            model=model,
-            google_api_key=self.api_key
-        )
+
+        self.model = model
+        self._client_instance = None
+
+    @property
+    def _client(self):
+        """
+        The LangChain client (and its SDK import) is built on first use or by warmup(),
+        so importing the service does not pay for it.
+        """
+        if self._client_instance is None:
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+            self._client_instance = GoogleGenerativeAIEmbeddings(
+                model=self.model,
+                google_api_key=self.api_key
+            )
+        return self._client_instance
+
+    async def warmup(self) -> None:
+        """
+        Build the client off the event loop (startup warm-up).
+        """
+        await asyncio.to_thread(lambda: self._client)
 
     async def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
@@ -33,3 +59,77 @@ class GeminiEmbedder:
         Generate embedding for a single query asynchronously.
         """
         return await self._client.aembed_query(text)
+
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for several queries in one batched request.
+        Uses the same task type as embed_query.
+        """
+        return await self._client.aembed_documents(texts, task_type="RETRIEVAL_QUERY")
+
+
+class FakeEmbedder:
+    """
+    Local embedder for tests and benchmarks (EMBEDDER=fake); no network calls.
+    Vectors are deterministic per text (seeded by its sha256) and unit-normalized.
+    Optionally simulates provider quotas: exceeding rpm/tpm within `window`
+    seconds raises RateLimitError, and batches above `max_batch` are rejected.
+    """
+
+    def __init__(
+        self,
+        dimensions: int = 768,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        max_batch: int = 100,
+        latency_ms: float = 0.0,
+        window: float = 60.0,
+        model: str = "fake-embedding",
+    ):
+        self.model = model
+        self.dimensions = dimensions
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_batch = max_batch
+        self.latency = latency_ms / 1000
+        self.window = window
+        self._calls: Deque[Tuple[float, int]] = deque()  # (timestamp, tokens)
+        self.stats = {"requests": 0, "texts": 0, "rate_limited": 0, "max_batch_seen": 0}
+
+    def vector(self, text: str) -> List[float]:
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        values = [rng.gauss(0, 1) for _ in range(self.dimensions)]
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [v / norm for v in values]
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) > self.max_batch:
+            raise ValueError(f"400 At most {self.max_batch} requests can be in one batch")
+
+        now = time.monotonic()
+        while self._calls and self._calls[0][0] <= now - self.window:
+            self._calls.popleft()
+        tokens = sum(len(text) // 4 + 1 for text in texts)
+        over_rpm = self.rpm is not None and len(self._calls) + 1 > self.rpm
+        over_tpm = self.tpm is not None and sum(t for _, t in self._calls) + tokens > self.tpm
+        if over_rpm or over_tpm:
+            self.stats["rate_limited"] += 1
+            retry_after = self._calls[0][0] + self.window - now if self._calls else self.window
+            raise RateLimitError("429 Resource has been exhausted (e.g. check quota).", retry_after=retry_after)
+        self._calls.append((now, tokens))
+
+        self.stats["requests"] += 1
+        self.stats["texts"] += len(texts)
+        self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(texts))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self.vector(text) for text in texts]
+
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._embed(texts)
+
+    async def embed_query(self, text: str) -> List[float]:
+        return (await self._embed([text]))[0]
+
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return await self._embed(texts)
@@ -0,0 +1,243 @@
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from array import array
+from typing import Any, Dict, List
+
+from app.async_vector_repo import call_repo
+from app.lru_cache import LRUCache
+
+logger = logging.getLogger("semantic_adapter.embedding_cache")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalización usada para la clave del cache: Unicode NFC y espacios colapsados.
+    No cambia mayúsculas ni puntuación, que sí afectan el embedding.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _as_list(vector: Any) -> List[float]:
+    # pgvector devuelve numpy.ndarray; el resto del servicio trabaja con listas de float
+    return vector.tolist() if hasattr(vector, "tolist") else list(vector)
+
+
+class CachedEmbedder:
+    """
+    Envuelve un embedder y consulta el cache persistente (tabla embedding_cache)
+    antes de llamar al proveedor: solo los textos que no están en cache se envían a embeber.
+    Expone la misma interfaz que GeminiEmbedder.
+    """
+
+    def __init__(self, embedder, repo):
+        self.embedder = embedder
+        self.repo = repo
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "texts": 0, "hits": 0, "misses": 0, "provider_calls": 0, "cache_errors": 0}
+
+    @property
+    def model(self) -> str:
+        return self.embedder.model
+
+    @property
+    def document_cache_key(self) -> str:
+        # Gemini usa task_type distinto para documentos y queries: claves separadas
+        return f"{self.model}:document"
+
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Genera embeddings para una lista de textos usando el cache cuando es posible.
+        """
+        hashes = [text_hash(t) for t in texts]
+        # Textos repetidos dentro del mismo lote se embeben una sola vez
+        first_text: Dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            first_text.setdefault(h, t)
+
+        cached: Dict[str, Any] = {}
+        try:
+            cached = await call_repo(self.repo.get_cached_embeddings, self.document_cache_key, list(first_text))
+        except Exception as e:
+            self._count(cache_errors=1)
+            logger.warning(f"Embedding cache lookup failed, falling back to provider: {e}")
+
+        missing = [h for h in first_text if h not in cached]
+        missing_set = set(missing)
+        if missing:
+            vectors = await self.embedder.embed_documents([first_text[h] for h in missing])
+            if len(vectors) != len(missing):
+                raise ValueError("Mismatch between texts and vectors generated")
+            fresh = dict(zip(missing, vectors))
+            try:
+                await call_repo(self.repo.put_cached_embeddings, self.document_cache_key, list(fresh.items()))
+            except Exception as e:
+                self._count(cache_errors=1)
+                logger.warning(f"Embedding cache write failed: {e}")
+            cached.update(fresh)
+
+        misses = sum(1 for h in hashes if h in missing_set)
+        self._count(
+            requests=1,
+            texts=len(texts),
+            hits=len(texts) - misses,
+            misses=misses,
+            provider_calls=1 if missing else 0,
+        )
+        return [_as_list(cached[h]) for h in hashes]
+
+    async def embed_query(self, text: str) -> List[float]:
+        return await self.embedder.embed_query(text)
+
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return await self.embedder.embed_queries(texts)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["hit_rate"] = round(stats["hits"] / stats["texts"], 4) if stats["texts"] else 0.0
+        stats["model"] = self.model
+        return stats
+
+    def _count(self, **deltas: int) -> None:
+        with self._lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalización para la clave de queries: además de espacios, ignora mayúsculas
+    ("Hola" y "hola" comparten embedding cacheado).
+    """
+    return normalize_text(text).casefold()
+
+
+class QueryCachedEmbedder:
+    """
+    Envuelve un embedder con un cache de embeddings de queries:
+    - L1: LRU en proceso con TTL (un hit cuesta solo la búsqueda en memoria).
+    - L2 opcional: tabla embedding_cache compartida entre réplicas (clave "<modelo>:query").
+    embed_documents pasa directo al embedder envuelto.
+    """
+
+    def __init__(self, embedder, cache: LRUCache, repo=None):
+        self.embedder = embedder
+        self.cache = cache
+        self.repo = repo  # None = sin nivel compartido
+        self._lock = threading.Lock()
+        self._stats = {"shared_hits": 0, "provider_calls": 0, "shared_errors": 0}
+
+    @property
+    def model(self) -> str:
+        return self.embedder.model
+
+    @property
+    def query_cache_key(self) -> str:
+        return f"{self.model}:query"
+
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embedder.embed_documents(texts)
+
+    async def embed_query(self, text: str) -> List[float]:
+        key, digest = self._keys(text)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached.tolist()
+
+        shared = await self._shared_lookup({digest: key})
+        if digest in shared:
+            return shared[digest]
+
+        vector = _as_list(await self.embedder.embed_query(text))
+        self._count(provider_calls=1)
+        await self._remember({digest: (key, vector)})
+        return vector
+
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Versión por lotes: hits locales, luego una consulta al nivel compartido
+        y una sola llamada al proveedor para el resto.
+        """
+        keys = [self._keys(text) for text in texts]
+        resolved: Dict[str, List[float]] = {}
+        missing: Dict[str, Any] = {}
+        first_text: Dict[str, str] = {}
+        for text, (key, digest) in zip(texts, keys):
+            if digest in resolved or digest in missing:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                resolved[digest] = cached.tolist()
+            else:
+                missing[digest] = key
+                first_text[digest] = text
+
+        if missing:
+            resolved.update(await self._shared_lookup(missing))
+            pending = [digest for digest in missing if digest not in resolved]
+            if pending:
+                vectors = await self.embedder.embed_queries([first_text[d] for d in pending])
+                self._count(provider_calls=1)
+                fresh = {d: (missing[d], _as_list(v)) for d, v in zip(pending, vectors)}
+                await self._remember(fresh)
+                resolved.update({d: vector for d, (_, vector) in fresh.items()})
+
+        return [resolved[digest] for _, digest in keys]
+
+    def _keys(self, text: str):
+        normalized = normalize_query(text)
+        return (self.model, normalized), hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    async def _shared_lookup(self, wanted: Dict[str, Any]) -> Dict[str, List[float]]:
+        if self.repo is None:
+            return {}
+        try:
+            found = await call_repo(self.repo.get_cached_embeddings, self.query_cache_key, list(wanted))
+        except Exception as e:
+            self._count(shared_errors=1)
+            logger.warning(f"Shared query cache lookup failed: {e}")
+            return {}
+        vectors = {}
+        for digest, vector in found.items():
+            vectors[digest] = _as_list(vector)
+            self.cache.set(wanted[digest], array("f", vectors[digest]))
+        self._count(shared_hits=len(vectors))
+        return vectors
+
+    async def _remember(self, fresh: Dict[str, Any]) -> None:
+        # array('f') ocupa ~3 KB por vector de 768 (vs ~18 KB como lista de floats)
+        for key, vector in fresh.values():
+            self.cache.set(key, array("f", vector))
+        if self.repo is None:
+            return
+        try:
+            await call_repo(
+                self.repo.put_cached_embeddings,
+                self.query_cache_key,
+                [(digest, vector) for digest, (_, vector) in fresh.items()],
+            )
+        except Exception as e:
+            self._count(shared_errors=1)
+            logger.warning(f"Shared query cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["local"] = self.cache.stats()
+        stats["shared_enabled"] = self.repo is not None
+        return stats
+
+    def _count(self, **deltas: int) -> None:
+        with self._lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
@@ -0,0 +1,74 @@
+import re
+import unicodedata
+from typing import Any, Dict, List, Sequence
+
+# Identificadores típicos: emails, URLs, códigos de propiedad ("TUL-123", "prop_001").
+# Un número suelto (precio, superficie, año: "menos de 200000") no es un identificador
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_URL = re.compile(r"https?://\S+")
+_CODE = re.compile(r"\b(?=[\w-]*\d)[A-Za-z0-9]+(?:[-_][A-Za-z0-9]+)+\b")
+_WORD = re.compile(r"\w+")
+
+# Hasta cuántas palabras una query se considera "búsqueda por palabra clave"
+KEYWORD_MAX_WORDS = 3
+
+
+def _fold(text: str) -> str:
+    """Minúsculas y sin acentos, para comparaciones literales."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def extract_identifiers(query: str) -> List[str]:
+    return _EMAIL.findall(query) + _URL.findall(query) + _CODE.findall(query)
+
+
+def is_keyword_query(query: str) -> bool:
+    """
+    True si la query parece una búsqueda exacta (identificador o pocas palabras)
+    y conviene intentar primero la búsqueda léxica.
+    """
+    return bool(extract_identifiers(query)) or len(_WORD.findall(query)) <= KEYWORD_MAX_WORDS
+
+
+def is_confident_match(query: str, lexical_rows: Sequence[Dict[str, Any]]) -> bool:
+    """
+    Decide si el primer resultado léxico es suficientemente seguro para responder
+    sin embeddings: contiene literalmente el identificador de la query, o bien
+    (queries cortas) el título contiene la frase completa.
+    """
+    if not lexical_rows:
+        return False
+    top = lexical_rows[0]
+    title = _fold(top.get("title") or "")
+    haystack = f"{title} {_fold(top.get('body_content') or '')}"
+
+    identifiers = extract_identifiers(query)
+    if identifiers:
+        return all(_fold(identifier) in haystack for identifier in identifiers)
+
+    phrase = " ".join(_WORD.findall(_fold(query)))
+    return bool(phrase) and len(phrase.split()) <= KEYWORD_MAX_WORDS and phrase in " ".join(_WORD.findall(title))
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Dict[str, Any]]],
+    top_k: int,
+    k: int = 60,
+    key: str = "hash",
+) -> List[Dict[str, Any]]:
+    """
+    Fusiona rankings con Reciprocal Rank Fusion: score = Σ 1 / (k + rank).
+    El score resultante se normaliza a [0, 1] dividiendo por el máximo posible.
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    scores: Dict[Any, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            row_key = row[key]
+            fused.setdefault(row_key, row)
+            scores[row_key] = scores.get(row_key, 0.0) + 1.0 / (k + rank)
+
+    best_possible = len(rankings) / (k + 1)
+    ordered = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [{**fused[row_key], "similarity": scores[row_key] / best_possible} for row_key in ordered]
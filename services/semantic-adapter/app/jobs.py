@@ -0,0 +1,199 @@
+import os
+import socket
+import asyncio
+import logging
+import random
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app import metrics
+from app.async_vector_repo import call_repo
+
+logger = logging.getLogger("semantic_adapter.jobs")
+
+ProgressFn = Callable[[Dict[str, Any]], Awaitable[None]]
+JobHandler = Callable[[Dict[str, Any], ProgressFn], Awaitable[Dict[str, Any]]]
+
+
+class JobLeaseLost(Exception):
+    """
+    El trabajo fue reclamado por otro worker (venció su lock).
+    """
+
+
+class JobWorkerPool:
+    """
+    Workers asyncio que consumen la cola durable semantic_jobs.
+
+    - Cada worker toma un trabajo con FOR UPDATE SKIP LOCKED (repo.claim_job),
+      ejecuta el handler registrado para su `kind` y registra el resultado.
+    - Los fallos se reintentan con backoff exponencial con jitter hasta max_attempts.
+    - Mientras corre el handler, el worker renueva el lock (heartbeat); un trabajo cuyo
+      worker murió se vuelve a tomar tras `lock_timeout` segundos.
+    - Progreso, resultado y fallos solo se registran si el worker todavía tiene el lock:
+      un worker que lo perdió descarta su resultado en lugar de pisar al nuevo dueño.
+    """
+
+    def __init__(
+        self,
+        repo,
+        handlers: Dict[str, JobHandler],
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        lock_timeout: Optional[float] = None,
+        heartbeat_interval: Optional[float] = None,
+    ):
+        self.repo = repo
+        self.handlers = handlers
+        self.concurrency = concurrency if concurrency is not None else int(os.getenv("JOB_WORKERS", "2"))
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+        self.backoff_base = backoff_base if backoff_base is not None else float(os.getenv("JOB_BACKOFF_BASE", "2.0"))
+        self.backoff_max = backoff_max if backoff_max is not None else float(os.getenv("JOB_BACKOFF_MAX", "300"))
+        self.lock_timeout = lock_timeout if lock_timeout is not None else float(os.getenv("JOB_LOCK_TIMEOUT", "600"))
+        # Renovación del lock de los trabajos en curso (por defecto, 4 veces por lock_timeout)
+        self.heartbeat_interval = (
+            heartbeat_interval
+            if heartbeat_interval is not None
+            else float(os.getenv("JOB_HEARTBEAT_INTERVAL", str(self.lock_timeout / 4)))
+        )
+
+        self._prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+        self._stats = {"claimed": 0, "succeeded": 0, "retried": 0, "failed": 0, "lease_lost": 0, "poll_errors": 0}
+
+    async def start(self) -> None:
+        if self._tasks or self.concurrency <= 0:
+            return
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._worker(f"{self._prefix}:{i}"), name=f"job-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        logger.info(f"Started {self.concurrency} job workers")
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """
+        Deja de tomar trabajos y espera a que terminen los que están en curso.
+        """
+        if not self._tasks:
+            return
+        self._stopping.set()
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    def backoff(self, attempts: int) -> float:
+        # Exponencial con "full jitter": evita que los reintentos lleguen todos juntos al proveedor
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, attempts - 1)))
+        return random.uniform(delay / 2, delay)
+
+    async def _worker(self, worker_id: str) -> None:
+        while not self._stopping.is_set():
+            try:
+                processed = await self.run_once(worker_id)
+            except Exception as e:
+                self._stats["poll_errors"] += 1
+                logger.warning(f"Job worker {worker_id} failed to poll: {e}")
+                processed = False
+            if not processed:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run_once(self, worker_id: str) -> bool:
+        """
+        Procesa como máximo un trabajo. Devuelve False si la cola estaba vacía.
+        """
+        job = await call_repo(self.repo.claim_job, worker_id, self.lock_timeout)
+        if not job:
+            return False
+        self._stats["claimed"] += 1
+        job_id = job["id"]
+
+        async def progress(update: Dict[str, Any]) -> None:
+            try:
+                owned = await call_repo(self.repo.update_job_progress, job_id, worker_id, update)
+            except Exception as e:
+                # El progreso es informativo: no debe hacer fallar el trabajo
+                logger.debug(f"Could not record progress for job {job_id}: {e}")
+                return
+            if not owned:
+                raise JobLeaseLost(job_id)
+
+        handler = self.handlers.get(job["kind"])
+        lease_lost = asyncio.Event()
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind '{job['kind']}'")
+            with metrics.request_context(f"job:{job['kind']}", job.get("client_id")):
+                task = asyncio.ensure_future(handler(job["payload"], progress))
+            heartbeat = asyncio.create_task(self._heartbeat(job_id, worker_id, task, lease_lost))
+            try:
+                result = await task
+            finally:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+        except asyncio.CancelledError:
+            if lease_lost.is_set() and not asyncio.current_task().cancelling():
+                return self._lease_lost(job_id, worker_id)
+            # Apagado: el trabajo vuelve a la cola de inmediato sin consumir un intento
+            await call_repo(self.repo.release_job, job_id, worker_id)
+            raise
+        except JobLeaseLost:
+            return self._lease_lost(job_id, worker_id)
+        except Exception as e:
+            error = getattr(e, "detail", None) or str(e) or type(e).__name__
+            if handler is not None and job["attempts"] < job["max_attempts"]:
+                delay = self.backoff(job["attempts"])
+                if not await call_repo(self.repo.fail_job, job_id, worker_id, error, delay):
+                    return self._lease_lost(job_id, worker_id)
+                self._stats["retried"] += 1
+                logger.warning(f"Job {job_id} attempt {job['attempts']} failed, retrying in {delay:.1f}s: {error}")
+            else:
+                if not await call_repo(self.repo.fail_job, job_id, worker_id, error):
+                    return self._lease_lost(job_id, worker_id)
+                self._stats["failed"] += 1
+                logger.error(f"Job {job_id} failed permanently: {error}")
+            return True
+
+        if not await call_repo(self.repo.complete_job, job_id, worker_id, result):
+            return self._lease_lost(job_id, worker_id)
+        self._stats["succeeded"] += 1
+        return True
+
+    async def _heartbeat(self, job_id: str, worker_id: str, task: asyncio.Future, lease_lost: asyncio.Event) -> None:
+        """
+        Renueva el lock cada heartbeat_interval segundos mientras corre el handler. Si otro
+        worker reclamó el trabajo (0 filas actualizadas) se cancela el handler: seguir
+        ejecutándolo duplicaría el trabajo (ej: dos reconstrucciones del índice a la vez).
+        """
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                owned = await call_repo(self.repo.heartbeat_job, job_id, worker_id)
+            except Exception as e:
+                # Un fallo puntual no pierde el lock: se reintenta en el próximo intervalo
+                logger.warning(f"Could not renew lock for job {job_id}: {e}")
+                continue
+            if not owned:
+                lease_lost.set()
+                task.cancel()
+                return
+
+    def _lease_lost(self, job_id: str, worker_id: str) -> bool:
+        self._stats["lease_lost"] += 1
+        logger.warning(f"Job {job_id} lock was lost by {worker_id}; its outcome is discarded")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "concurrency": self.concurrency,
+            "running": bool(self._tasks) and not self._stopping.is_set(),
+            **self._stats,
+        }
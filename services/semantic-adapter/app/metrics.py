@@ -0,0 +1,324 @@
+import os
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+
+from app.scheduler import is_rate_limited, is_transient
+
+# Etiqueta tenant (client_id) opcional: con muchos clientes dispara la cardinalidad de las series
+METRICS_TENANT_LABELS = os.getenv("METRICS_TENANT_LABELS", "false").lower() == "true"
+METRICS_MAX_TENANTS = int(os.getenv("METRICS_MAX_TENANTS", "50"))
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "true").lower() == "true"
+
+# De 0.5 ms (pool / threadpool) a 30 s (ingesta de PDFs grandes)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 100, 128, 250, 500)
+
+REQUEST_SECONDS = Histogram(
+    "semantic_request_seconds", "Latencia total por request HTTP",
+    ["endpoint", "method", "status", "tenant"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge("semantic_requests_in_flight", "Requests HTTP en curso", ["endpoint"])
+STAGE_SECONDS = Histogram(
+    "semantic_stage_seconds",
+    "Latencia por etapa: chunking, embedding, db_write, db_search, db_pool_wait, threadpool_wait, postprocess, serialization",
+    ["stage", "endpoint", "tenant"], buckets=LATENCY_BUCKETS,
+)
+ROWS_UPSERTED = Counter("semantic_rows_upserted_total", "Chunks escritos en semantic_items", ["endpoint", "tenant"])
+EMBEDDING_BATCH_SIZE = Histogram(
+    "semantic_embedding_batch_size", "Textos por llamada al proveedor de embeddings", ["kind"], buckets=BATCH_BUCKETS
+)
+EMBEDDING_PROVIDER_SECONDS = Histogram(
+    "semantic_embedding_provider_seconds", "Latencia de cada llamada al proveedor de embeddings",
+    ["kind"], buckets=LATENCY_BUCKETS,
+)
+EMBEDDING_PROVIDER_ERRORS = Counter(
+    "semantic_embedding_provider_errors_total", "Errores del proveedor de embeddings (rate_limited = 429)",
+    ["kind", "reason"],
+)
+
+
+class TenantLabels:
+    """
+    Limita la cardinalidad de la etiqueta tenant: los primeros max_tenants clientes
+    vistos tienen su propia serie, el resto se agrupa en "other".
+    Desactivada, la etiqueta queda vacía.
+    """
+
+    def __init__(self, enabled: bool = METRICS_TENANT_LABELS, max_tenants: int = METRICS_MAX_TENANTS):
+        self.enabled = enabled
+        self.max_tenants = max_tenants
+        self._seen: set = set()
+        self._lock = threading.Lock()
+
+    def label(self, client_id: Optional[str]) -> str:
+        if not self.enabled or not client_id:
+            return ""
+        if client_id in self._seen:
+            return client_id
+        with self._lock:
+            if len(self._seen) < self.max_tenants:
+                self._seen.add(client_id)
+                return client_id
+        return "other"
+
+
+tenant_labels = TenantLabels()
+
+
+class RequestTimings:
+    """
+    Tiempos por etapa de un request (o trabajo en segundo plano); la etapa
+    repetida se acumula. Se comparte por contextvar con threadpool y tareas hijas.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.tenant = ""
+        self.stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        with self._lock:
+            entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.stages.items()]
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("semantic_request_timings", default=None)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    timings = _current.get()
+    if timings is None:
+        STAGE_SECONDS.labels(stage, "background", "").observe(seconds)
+        return
+    STAGE_SECONDS.labels(stage, timings.endpoint, timings.tenant).observe(seconds)
+    timings.add(stage, seconds)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def set_tenant(client_id: Optional[str]) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.tenant = tenant_labels.label(client_id)
+
+
+def rows_upserted(count: int) -> None:
+    timings = _current.get()
+    endpoint, tenant = (timings.endpoint, timings.tenant) if timings else ("background", "")
+    ROWS_UPSERTED.labels(endpoint, tenant).inc(count)
+
+
+@contextmanager
+def request_context(endpoint: str, client_id: Optional[str] = None) -> Iterator[RequestTimings]:
+    """
+    Contexto de métricas fuera de HTTP (ej: trabajos de semantic_jobs: endpoint="job:ingest").
+    """
+    timings = RequestTimings(endpoint)
+    timings.tenant = tenant_labels.label(client_id)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def endpoint_label(scope: Dict[str, Any]) -> str:
+    """
+    Ruta con parámetros del request (ej: /api/v1/client/{client_id}): una serie por
+    endpoint y no por id. Algunas versiones de FastAPI guardan en scope["route"]
+    la ruta sin el prefijo de include_router; el prefijo se toma del path real.
+    """
+    route = scope.get("route")
+    if route is None or not hasattr(route, "path"):
+        return "unmatched"
+    path, regex = scope.get("path", ""), getattr(route, "path_regex", None)
+    if regex is not None:
+        for i, char in enumerate(path):
+            if char == "/" and regex.match(path[i:]):
+                return path[:i] + route.path
+    return route.path
+
+
+class MetricsRoute(APIRoute):
+    """
+    route_class del router de la API: fija el endpoint del request antes de ejecutar
+    el handler (las etapas quedan etiquetadas) y lleva los requests en curso.
+    En respuestas streaming (NDJSON) el request sigue en curso hasta la última línea.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def tracked_handler(request: Request) -> Response:
+            endpoint = endpoint_label(request.scope)
+            timings = _current.get()
+            if timings is not None:
+                timings.endpoint = endpoint
+            in_flight = REQUESTS_IN_FLIGHT.labels(endpoint)
+            in_flight.inc()
+            try:
+                response = await handler(request)
+            except BaseException:
+                in_flight.dec()
+                raise
+            if isinstance(response, StreamingResponse):
+                response.body_iterator = _tracked_stream(response.body_iterator, in_flight)
+            else:
+                in_flight.dec()
+            return response
+
+        return tracked_handler
+
+
+async def _tracked_stream(iterator, in_flight) -> AsyncIterator[Any]:
+    try:
+        async for chunk in iterator:
+            yield chunk
+    finally:
+        in_flight.dec()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latencia total por endpoint / método / status y header
+    Server-Timing con las etapas medidas durante el request.
+    """
+
+    def __init__(self, app, server_timing: bool = METRICS_SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings("unmatched")
+        token = _current.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = timings.server_timing(time.perf_counter() - started)
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if timings.endpoint == "unmatched":
+                # Rutas fuera del router de la API (/health, /metrics)
+                timings.endpoint = endpoint_label(scope)
+            REQUEST_SECONDS.labels(timings.endpoint, scope["method"], str(status), timings.tenant).observe(
+                time.perf_counter() - started
+            )
+            _current.reset(token)
+
+
+class InstrumentedEmbedder:
+    """
+    Envuelve al proveedor de embeddings (Gemini / Fake), antes del scheduler:
+    mide cada llamada real (tamaño de lote, latencia, errores y 429).
+    """
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+
+    @property
+    def model(self) -> str:
+        return self.embedder.model
+
+    async def _observe(self, kind: str, size: int, call):
+        EMBEDDING_BATCH_SIZE.labels(kind).observe(size)
+        started = time.perf_counter()
+        try:
+            return await call
+        except Exception as e:
+            reason = "rate_limited" if is_rate_limited(e) else "transient" if is_transient(e) else "error"
+            EMBEDDING_PROVIDER_ERRORS.labels(kind, reason).inc()
+            raise
+        finally:
+            EMBEDDING_PROVIDER_SECONDS.labels(kind).observe(time.perf_counter() - started)
+
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._observe("documents", len(texts), self.embedder.embed_documents(texts))
+
+    async def embed_query(self, text: str) -> List[float]:
+        return await self._observe("queries", 1, self.embedder.embed_query(text))
+
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        if hasattr(self.embedder, "embed_queries"):
+            call = self.embedder.embed_queries(texts)
+        else:
+            call = asyncio.gather(*(self.embedder.embed_query(t) for t in texts))
+        return list(await self._observe("queries", len(texts), call))
+
+
+class StatsCollector:
+    """
+    Expone los stats() de los componentes (pool de conexiones, scheduler, caches,
+    coalescer, workers) como semantic_component_stat{component, stat}.
+    Se leen en cada scrape: sin instrumentar cada contador por separado.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def register(self, component: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        self._sources[component] = stats
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "semantic_component_stat", "Contadores y estado de los componentes internos", labels=["component", "stat"]
+        )
+        for component, source in list(self._sources.items()):
+            try:
+                values = source()
+            except Exception:
+                continue
+            for stat, value in _numeric(values):
+                family.add_metric([component, stat], value)
+        yield family
+
+
+def _numeric(values: Dict[str, Any], prefix: str = "") -> Iterator[tuple]:
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _numeric(value, f"{prefix}{key}_")
+        elif isinstance(value, (bool, int, float)):
+            yield f"{prefix}{key}", float(value)
+
+
+component_stats = StatsCollector()
+REGISTRY.register(component_stats)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,134 @@
+"""
+Migraciones versionadas del esquema de semantic-adapter.
+
+Cada migración tiene un número de versión creciente y se registra en la tabla de
+versiones (repo.migrations_table) al aplicarse. Al abrir el repositorio solo se
+consulta la versión actual: si el esquema está al día no se ejecuta DDL, lo que
+mantiene el arranque rápido. Las pendientes se aplican en orden, cada una en su
+transacción, bajo un advisory lock (una sola réplica migra; el resto espera).
+
+Uso (paso explícito de despliegue, con DB_MIGRATE_ON_START=false en las réplicas):
+    python -m app.migrations status
+    python -m app.migrations upgrade
+"""
+import sys
+import json
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger("semantic_adapter.migrations")
+
+
+class SchemaOutdatedError(RuntimeError):
+    """
+    El esquema está detrás de la versión que espera el código y no se migra al abrir.
+    """
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    # (repo, cursor) -> None: corre dentro de la transacción de la migración
+    apply: Callable[[Any, Any], None]
+
+
+def _baseline(repo, cur) -> None:
+    # Esquema previo al versionado: todo es IF NOT EXISTS, así las bases existentes lo adoptan sin cambios
+    cur.execute(repo._support_ddl())
+    cur.execute(repo._bulk_load_query(), (repo.table_name,))
+    cur.execute(repo._items_ddl(repo.layout, with_index=not cur.fetchone()[0]))
+    if repo.layout == "hash":
+        for remainder in range(repo.hash_partitions):
+            cur.execute(
+                f"CREATE TABLE IF NOT EXISTS {repo.table_name}_h{remainder} "
+                f"PARTITION OF {repo.table_name} "
+                f"FOR VALUES WITH (MODULUS {repo.hash_partitions}, REMAINDER {remainder})"
+            )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline", _baseline),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def migrations_ddl(table: str) -> str:
+    return f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        version INT PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT now()
+    )
+    """
+
+
+def current_version(cur, table: str) -> int:
+    """
+    Versión aplicada (0 si la tabla de versiones no existe). Sin DDL: apta para cada arranque.
+    """
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute(f"SELECT coalesce(max(version), 0) FROM {table}")
+    return cur.fetchone()[0]
+
+
+def pending(version: int) -> List[Migration]:
+    return [migration for migration in MIGRATIONS if migration.version > version]
+
+
+def migrate(repo, conn) -> Dict[str, Any]:
+    """
+    Aplica las migraciones pendientes sobre una conexión psycopg2 (fuera de transacción).
+    El advisory lock es de sesión: se libera también si una migración falla.
+    """
+    applied = []
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(hashtext(%s))", (repo.migrations_table,))
+        conn.commit()
+        try:
+            cur.execute(migrations_ddl(repo.migrations_table))
+            # Otra réplica pudo migrar mientras se esperaba el lock
+            version = current_version(cur, repo.migrations_table)
+            conn.commit()
+            for migration in pending(version):
+                logger.info(f"Applying schema migration {migration.version} ({migration.name})")
+                migration.apply(repo, cur)
+                cur.execute(
+                    f"INSERT INTO {repo.migrations_table} (version, name) VALUES (%s, %s)",
+                    (migration.version, migration.name),
+                )
+                conn.commit()
+                applied.append(migration.name)
+                version = migration.version
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (repo.migrations_table,))
+            conn.commit()
+    return {"version": version, "latest": LATEST_VERSION, "applied": applied}
+
+
+def main():
+    from app.vector_repo import VectorRepository
+
+    parser = argparse.ArgumentParser(description="Semantic adapter schema migrations")
+    parser.add_argument("command", choices=("status", "upgrade"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    repo = VectorRepository()
+    try:
+        result = repo.migrate() if args.command == "upgrade" else repo.schema_status()
+    finally:
+        repo.close()
+    print(json.dumps(result))
+    sys.exit(0 if args.command == "upgrade" or not result["pending"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+from typing import Dict, Any, Optional, List, Literal
+from pydantic import BaseModel, Field
+
+class CanonicalMetadata(BaseModel):
+    client_id: str
+    category: Optional[str] = None
+    url: Optional[str] = None
+    source_timestamp: Optional[str] = None
+    ingested_at: Optional[str] = None
+    # Permite campos extra
+    class Config:
+        extra = "allow"
+
+class CanonicalDocument(BaseModel):
+    content_id: str
+    source: str
+    title: Optional[str] = None
+    body_content: str
+    metadata: CanonicalMetadata
+    hash: str
+
+class SearchFilters(BaseModel):
+    category: Optional[str] = None
+    source: Optional[str] = None
+    # Contención JSONB sobre metadata, ej: {"location": "Tulum", "type": "sale"}
+    metadata: Optional[Dict[str, Any]] = None
+
+class DiversityOptions(BaseModel):
+    # MMR: 1.0 = solo relevancia, 0.0 = máxima diversidad
+    lambda_mult: float = Field(0.5, ge=0, le=1)
+    # Máximo de pasajes por documento (content_id); None = sin límite
+    max_per_document: Optional[int] = Field(2, ge=1)
+    # Descarta resultados con score menor
+    min_score: Optional[float] = None
+    # Une chunks contiguos del mismo documento en un solo pasaje
+    merge_adjacent: bool = True
+    # Candidatos a evaluar: top_k * fetch_factor
+    fetch_factor: int = Field(4, ge=1, le=20)
+
+class SearchRequest(BaseModel):
+    query_text: str
+    client_id: str
+    top_k: int = 5
+    filters: Optional[SearchFilters] = None
+    # vector: solo similitud coseno; lexical: solo full-text; hybrid: fusión RRF de ambos
+    # None usa SEARCH_DEFAULT_MODE
+    mode: Optional[Literal["vector", "hybrid", "lexical"]] = None
+    # Candidatos del HNSW (recall vs latencia); None usa el del tenant o HNSW_EF_SEARCH
+    ef_search: Optional[int] = Field(None, ge=1, le=1000)
+    # Post-proceso MMR / agrupado por documento; None usa SEARCH_DIVERSITY_DEFAULT
+    diversity: Optional[DiversityOptions] = None
+
+class SearchResult(BaseModel):
+    content_id: str
+    title: Optional[str]
+    body_content: str
+    metadata: Dict[str, Any]
+    score: float
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    query_text: str
+    client_id: str
+    # Modo efectivo (hybrid puede resolverse como lexical si hay match exacto)
+    mode: Optional[str] = None
+    # Ranking servido desde el cache de resultados (ver app/result_cache.py)
+    cached: bool = False
+
+
+class BatchSearchItem(BaseModel):
+    # Opciones que resuelve el camino por lotes (una sola consulta vectorial en la DB)
+    query_text: str
+    client_id: str
+    top_k: int = 5
+    filters: Optional[SearchFilters] = None
+    mode: Optional[Literal["vector"]] = None
+    ef_search: Optional[int] = Field(None, ge=1, le=1000)
+    # hybrid / lexical / diversity no se ignoran en silencio: 422
+    class Config:
+        extra = "forbid"
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchSearchItem]
+
+class BatchSearchResponse(BaseModel):
+    results: List[SearchResponse]
@@ -0,0 +1,418 @@
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, IO, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from app import metrics
+from app.async_vector_repo import call_repo
+from app.models import CanonicalDocument
+
+logger = logging.getLogger("semantic_adapter.pipeline")
+
+_DONE = object()  # Sentinela de fin de etapa
+
+
+def chunk_ids(doc: CanonicalDocument, chunks: List[str], content_defined: bool = False) -> List[str]:
+    """
+    Ids (hash) de los chunks de un documento.
+
+    - Por posición (default): sha256(doc_hash + index). Cualquier cambio en el documento
+      cambia todos los ids.
+    - Por contenido (content_defined=True, chunker en modo cdc): sha256 del tenant, el documento
+      y el texto del chunk; un chunk que no cambió conserva su id y su embedding.
+      Textos repetidos dentro del documento se distinguen por número de aparición.
+    """
+    if not content_defined:
+        # Esto asegura idempotencia: el mismo documento fragmentado igual tendrá los mismos IDs.
+        return [hashlib.sha256(f"{doc.hash}_{i}".encode()).hexdigest() for i in range(len(chunks))]
+
+    seen: Dict[str, int] = {}
+    ids = []
+    for chunk_text in chunks:
+        occurrence = seen.get(chunk_text, 0)
+        seen[chunk_text] = occurrence + 1
+        key = "\x1f".join((doc.metadata.client_id, doc.content_id, str(occurrence), chunk_text))
+        ids.append(hashlib.sha256(key.encode("utf-8")).hexdigest())
+    return ids
+
+
+def build_chunk_rows(
+    doc: CanonicalDocument,
+    chunks: List[str],
+    vectors: List[Optional[List[float]]],
+    hashes: Optional[List[str]] = None,
+) -> List[Tuple[dict, Optional[list]]]:
+    """
+    Construye las filas (chunk_data, vector) listas para VectorRepository.upsert_documents.
+    Un vector None marca un chunk ya almacenado que se conserva (ver replace_documents).
+    """
+    hashes = hashes or chunk_ids(doc, chunks)
+    rows = []
+    metadata = doc.metadata.dict()
+    for i, (chunk_text, vector, chunk_hash) in enumerate(zip(chunks, vectors, hashes)):
+        chunk_data = {
+            "content_id": doc.content_id,
+            "client_id": doc.metadata.client_id,
+            "source": doc.source,
+            "title": doc.title,  # Opcional: f"{doc.title} (Part {i+1})"
+            "body_content": chunk_text,
+            # Posición del chunk y id del anterior (unión de chunks contiguos en app/diversify.py).
+            # prev_chunk solo cambia junto a una edición; chunk_index no se compara al conservar
+            # chunks (ver VectorRepository._refresh_chunks_query)
+            "metadata": {**metadata, "chunk_index": i, "prev_chunk": hashes[i - 1] if i else None},
+            "hash": chunk_hash,
+        }
+        rows.append((chunk_data, vector))
+    return rows
+
+
+def document_manifest(doc: CanonicalDocument) -> Dict[str, str]:
+    """
+    Entrada del manifiesto de documentos para VectorRepository.replace_documents.
+    """
+    return {"client_id": doc.metadata.client_id, "content_id": doc.content_id, "hash": doc.hash}
+
+
+@dataclass
+class _DocWork:
+    line: int
+    doc: CanonicalDocument
+    chunks: List[str] = field(default_factory=list)
+    vectors: List[Optional[List[float]]] = field(default_factory=list)
+    hashes: List[str] = field(default_factory=list)
+    stored: Set[str] = field(default_factory=set)  # ids de chunks ya almacenados (modo cdc)
+    todo: List[int] = field(default_factory=list)  # índices de chunks a embeber
+    pending: int = 0  # slices de embedding aún no resueltos
+    failed: Optional[str] = None
+
+
+class IngestPipeline:
+    """
+    Pipeline de ingesta masiva: parse → chunk → embed → persist.
+
+    Cada etapa corre concurrentemente y se comunica por colas acotadas,
+    por lo que la memoria se mantiene constante sin importar el tamaño del lote.
+    El resultado es un stream de líneas de estado (un dict por documento).
+    """
+
+    def __init__(
+        self,
+        chunker,
+        embedder,
+        repo,
+        embed_batch_size: Optional[int] = None,
+        embed_concurrency: Optional[int] = None,
+        write_batch_rows: Optional[int] = None,
+        chunk_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        flush_interval: float = 0.05,
+        force: bool = False,
+        on_write: Optional[Callable[[str], None]] = None,
+    ):
+        self.chunker = chunker
+        self.embedder = embedder
+        self.repo = repo
+        # Gemini acepta hasta 100 textos por batchEmbedContents
+        self.embed_batch_size = embed_batch_size or int(os.getenv("INGEST_BATCH_EMBED_SIZE", "100"))
+        self.embed_concurrency = embed_concurrency or int(os.getenv("INGEST_BATCH_EMBED_CONCURRENCY", "4"))
+        self.write_batch_rows = write_batch_rows or int(os.getenv("INGEST_BATCH_WRITE_ROWS", "500"))
+        self.chunk_workers = chunk_workers or int(os.getenv("INGEST_BATCH_CHUNK_WORKERS", "4"))
+        self.queue_size = queue_size or int(os.getenv("INGEST_BATCH_QUEUE_SIZE", "32"))
+        self.flush_interval = flush_interval
+        self.force = force  # ignora el manifiesto y re-procesa todo
+        self.on_write = on_write  # se llama con cada client_id escrito
+        # Ids por contenido: solo se embeben los chunks que no están almacenados
+        self.content_defined = bool(getattr(chunker, "content_defined", False))
+
+    async def run(self, source: IO[bytes]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Procesa un archivo NDJSON (un CanonicalDocument por línea) y produce
+        un estado por documento a medida que cada uno termina, más un resumen final.
+        """
+        chunk_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        embed_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        batch_q: asyncio.Queue = asyncio.Queue(self.embed_concurrency)
+        persist_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        out_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        summary = {
+            "documents": 0, "success": 0, "unchanged": 0, "ignored": 0, "superseded": 0, "error": 0,
+            "db_records_upserted": 0, "db_records_deleted": 0,
+        }
+
+        async def emit(status: Dict[str, Any]) -> None:
+            summary["documents"] += 1
+            summary[status["status"]] += 1
+            summary["db_records_upserted"] += status.get("db_records_upserted", 0)
+            summary["db_records_deleted"] += status.get("db_records_deleted", 0)
+            await out_q.put(status)
+
+        async def stages() -> None:
+            chunkers = [
+                asyncio.create_task(self._chunk_stage(chunk_q, embed_q, persist_q, emit))
+                for _ in range(self.chunk_workers)
+            ]
+            embedders = [
+                asyncio.create_task(self._embed_stage(batch_q, persist_q, emit))
+                for _ in range(self.embed_concurrency)
+            ]
+            batcher = asyncio.create_task(self._batch_stage(embed_q, batch_q))
+            persister = asyncio.create_task(self._persist_stage(persist_q, emit))
+            tasks = [*chunkers, *embedders, batcher, persister]
+            try:
+                # Cierre ordenado: cada etapa recibe su sentinela cuando la anterior terminó
+                await self._parse_stage(source, chunk_q, emit)
+                for _ in chunkers:
+                    await chunk_q.put(_DONE)
+                await asyncio.gather(*chunkers)
+                await embed_q.put(_DONE)
+                await batcher
+                for _ in embedders:
+                    await batch_q.put(_DONE)
+                await asyncio.gather(*embedders)
+                await persist_q.put(_DONE)
+                await persister
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await out_q.put(_DONE)
+
+        runner = asyncio.create_task(stages())
+        try:
+            while True:
+                item = await out_q.get()
+                if item is _DONE:
+                    break
+                yield item
+            await runner
+        finally:
+            if not runner.done():
+                runner.cancel()
+
+        yield {"summary": summary}
+
+    # --- Etapas ---
+
+    async def _parse_stage(self, source: IO[bytes], chunk_q: asyncio.Queue, emit) -> None:
+        line_no = 0
+        while True:
+            lines = await run_in_threadpool(lambda: list(itertools.islice(source, 256)))
+            if not lines:
+                return
+            block: List[_DocWork] = []
+            for raw in lines:
+                line_no += 1
+                if not raw.strip():
+                    continue
+                try:
+                    doc = CanonicalDocument.parse_obj(json.loads(raw))
+                except (ValueError, ValidationError) as e:
+                    await emit({"line": line_no, "status": "error", "detail": f"Invalid document: {e}"})
+                    continue
+                block.append(_DocWork(line=line_no, doc=doc))
+
+            # Gatekeeper: una sola consulta al manifiesto por bloque de líneas
+            known: Dict[Tuple[str, str], str] = {}
+            if block and not self.force:
+                keys = [(w.doc.metadata.client_id, w.doc.content_id) for w in block]
+                try:
+                    known = await call_repo(self.repo.get_document_hashes, keys)
+                except Exception as e:
+                    logger.warning(f"Manifest lookup failed, processing block without short-circuit: {e}")
+
+            changed = []
+            for work in block:
+                if known.get((work.doc.metadata.client_id, work.doc.content_id)) == work.doc.hash:
+                    await emit(self._status(work, "unchanged", chunks_processed=0, db_records_upserted=0))
+                    continue
+                changed.append(work)
+
+            # Documentos ya ingeridos que cambiaron: ids de sus chunks actuales, en una consulta
+            stored_keys = [
+                (w.doc.metadata.client_id, w.doc.content_id) for w in changed
+                if (w.doc.metadata.client_id, w.doc.content_id) in known
+            ]
+            if self.content_defined and stored_keys:
+                try:
+                    stored = await call_repo(self.repo.get_chunk_hashes, stored_keys)
+                except Exception as e:
+                    logger.warning(f"Chunk lookup failed, re-embedding changed documents in full: {e}")
+                    stored = {}
+                for work in changed:
+                    work.stored = stored.get((work.doc.metadata.client_id, work.doc.content_id), set())
+
+            for work in changed:
+                await chunk_q.put(work)
+
+    async def _chunk_stage(self, chunk_q: asyncio.Queue, embed_q: asyncio.Queue, persist_q: asyncio.Queue, emit) -> None:
+        while True:
+            work = await chunk_q.get()
+            if work is _DONE:
+                return
+            try:
+                with metrics.stage("chunking"):
+                    if hasattr(self.chunker, "asplit_text"):
+                        work.chunks = await self.chunker.asplit_text(work.doc.body_content)
+                    else:
+                        work.chunks = await run_in_threadpool(self.chunker.split_text, work.doc.body_content)
+            except Exception as e:
+                await emit(self._status(work, "error", detail=f"Chunking failed: {e}"))
+                continue
+            if not work.chunks:
+                await emit(self._status(work, "ignored", reason="empty_content"))
+                continue
+            work.vectors = [None] * len(work.chunks)
+            work.hashes = chunk_ids(work.doc, work.chunks, self.content_defined)
+            work.todo = [i for i, chunk_hash in enumerate(work.hashes) if chunk_hash not in work.stored]
+            if not work.todo:
+                # Nada que embeber (ej: solo se borraron chunks): directo a persistencia
+                await persist_q.put(work)
+                continue
+            await embed_q.put(work)
+
+    async def _batch_stage(self, embed_q: asyncio.Queue, batch_q: asyncio.Queue) -> None:
+        """
+        Agrupa chunks de uno o varios documentos en lotes de hasta embed_batch_size textos.
+        Un documento grande puede repartirse entre varios lotes. Los slices indexan work.todo.
+        """
+        batch: List[Tuple[_DocWork, int, int]] = []  # (work, start, end)
+        batch_len = 0
+        finished = False
+
+        while not finished:
+            try:
+                work = await asyncio.wait_for(embed_q.get(), timeout=self.flush_interval if batch else None)
+            except asyncio.TimeoutError:
+                work = None  # Sin llegadas: vaciar el lote parcial
+
+            if work is _DONE:
+                finished = True
+            elif work is not None:
+                # Se calculan todos los slices del documento antes de publicar lotes,
+                # así `pending` ya es definitivo cuando la etapa de embedding los resuelve.
+                ready = []
+                start = 0
+                while start < len(work.todo):
+                    take = min(self.embed_batch_size - batch_len, len(work.todo) - start)
+                    batch.append((work, start, start + take))
+                    work.pending += 1
+                    batch_len += take
+                    start += take
+                    if batch_len >= self.embed_batch_size:
+                        ready.append(batch)
+                        batch, batch_len = [], 0
+                for full_batch in ready:
+                    await batch_q.put(full_batch)
+                continue
+
+            if batch:
+                await batch_q.put(batch)
+                batch, batch_len = [], 0
+
+    async def _embed_stage(self, batch_q: asyncio.Queue, persist_q: asyncio.Queue, emit) -> None:
+        while True:
+            batch = await batch_q.get()
+            if batch is _DONE:
+                return
+            texts = [work.chunks[i] for work, start, end in batch for i in work.todo[start:end]]
+            error = None
+            try:
+                with metrics.stage("embedding"):
+                    vectors = await self.embedder.embed_documents(texts)
+                if len(vectors) != len(texts):
+                    error = "Mismatch between chunks and vectors generated"
+            except Exception as e:
+                error = f"Embedding failed: {e}"
+
+            offset = 0
+            for work, start, end in batch:
+                if error:
+                    work.failed = work.failed or error
+                else:
+                    for i, vector in zip(work.todo[start:end], vectors[offset:offset + (end - start)]):
+                        work.vectors[i] = vector
+                offset += end - start
+                work.pending -= 1
+                # El documento avanza cuando todos sus slices fueron resueltos
+                if work.pending == 0:
+                    if work.failed:
+                        await emit(self._status(work, "error", detail=work.failed))
+                    else:
+                        await persist_q.put(work)
+
+    async def _persist_stage(self, persist_q: asyncio.Queue, emit) -> None:
+        pending: List[_DocWork] = []
+        rows_count = 0
+        finished = False
+
+        while not finished:
+            try:
+                work = await asyncio.wait_for(persist_q.get(), timeout=self.flush_interval if pending else None)
+            except asyncio.TimeoutError:
+                work = None
+
+            if work is _DONE:
+                finished = True
+            elif work is not None:
+                pending.append(work)
+                rows_count += len(work.chunks)
+                if rows_count < self.write_batch_rows:
+                    continue
+
+            if pending:
+                await self._flush(pending, emit)
+                pending, rows_count = [], 0
+
+    async def _flush(self, works: List[_DocWork], emit) -> None:
+        # El mismo documento dos veces en el lote (líneas repetidas del NDJSON): gana la última
+        # línea. replace_documents exige un documento por clave (ON CONFLICT no puede tocar la
+        # misma fila dos veces y cada versión borraría los chunks nuevos de la otra).
+        latest: Dict[Tuple[str, str], _DocWork] = {}
+        for work in works:
+            key = (work.doc.metadata.client_id, work.doc.content_id)
+            if key not in latest or work.line > latest[key].line:
+                latest[key] = work
+        for work in works:
+            winner = latest[(work.doc.metadata.client_id, work.doc.content_id)]
+            if winner is not work:
+                await emit(self._status(work, "superseded", superseded_by=winner.line))
+        works = [work for work in works if latest[(work.doc.metadata.client_id, work.doc.content_id)] is work]
+
+        documents = [
+            (document_manifest(work.doc), build_chunk_rows(work.doc, work.chunks, work.vectors, work.hashes))
+            for work in works
+        ]
+        try:
+            with metrics.stage("db_write"):
+                results = await call_repo(self.repo.replace_documents, documents)
+        except Exception as e:
+            logger.error(f"Batch upsert failed ({len(works)} docs): {e}")
+            for work in works:
+                await emit(self._status(work, "error", detail=f"Database upsert failed: {e}"))
+            return
+
+        metrics.rows_upserted(sum(result["upserted"] for result in results))
+        if self.on_write:
+            # Ej: invalidar el cache de resultados de los tenants escritos
+            for client_id in {work.doc.metadata.client_id for work in works}:
+                self.on_write(client_id)
+        for work, result in zip(works, results):
+            await emit(self._status(
+                work,
+                "success",
+                chunks_processed=len(work.chunks),
+                chunks_embedded=len(work.todo),
+                db_records_upserted=result["upserted"],
+                db_records_deleted=result["deleted"],
+            ))
+
+    @staticmethod
+    def _status(work: _DocWork, status: str, **extra: Any) -> Dict[str, Any]:
+        return {"line": work.line, "document_id": work.doc.content_id, "status": status, **extra}
@@ -0,0 +1,158 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.async_vector_repo import call_repo
+from app.scheduler import is_rate_limited, is_transient
+
+logger = logging.getLogger("semantic_adapter.readiness")
+
+# Tiempo máximo del SELECT 1 de /readyz (un pool saturado también saca a la réplica del balanceo)
+READINESS_TIMEOUT = float(os.getenv("READINESS_TIMEOUT_SECONDS", "1"))
+# El proveedor de embeddings se prueba con un request real como máximo cada TTL segundos
+READINESS_EMBEDDER_TTL = float(os.getenv("READINESS_EMBEDDER_TTL_SECONDS", "300"))
+# Backoff máximo entre reintentos del warm-up de la base
+WARMUP_RETRY_MAX = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", "30"))
+
+
+def _describe(error: BaseException) -> str:
+    return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+
+class ReadinessProbe:
+    """
+    Warm-up en segundo plano y readiness real del servicio.
+
+    - start(): abre el repositorio (pool, registro de pgvector, verificación del
+      esquema) y construye el cliente del embedder en paralelo, sin bloquear el
+      arranque. El proceso acepta conexiones de inmediato: /livez responde y /readyz
+      da 503 hasta que ambos estén listos. Si la base no responde (o el esquema está
+      desactualizado) se reintenta con backoff en lugar de abortar el proceso.
+    - check(): SELECT 1 por el pool con timeout y estado del embedder. Un 429 o un
+      error transitorio del proveedor deja al embedder "degraded" pero listo: afecta
+      a todas las réplicas por igual y el scheduler ya reintenta.
+    """
+
+    def __init__(
+        self,
+        repo,
+        embedder,
+        on_db_ready: Optional[List[Callable[[], Awaitable[None]]]] = None,
+        timeout: Optional[float] = None,
+        embedder_ttl: Optional[float] = None,
+        retry_max: Optional[float] = None,
+    ):
+        self.repo = repo
+        self.embedder = embedder
+        self.on_db_ready = on_db_ready or []
+        self.timeout = timeout if timeout is not None else READINESS_TIMEOUT
+        self.embedder_ttl = embedder_ttl if embedder_ttl is not None else READINESS_EMBEDDER_TTL
+        self.retry_max = retry_max if retry_max is not None else WARMUP_RETRY_MAX
+
+        self._task: Optional[asyncio.Task] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self._db_ready = False
+        self._db_error: Optional[str] = None
+        self._embedder_status = "starting" if embedder is not None else "not_configured"
+        self._embedder_error: Optional[str] = None
+        self._embedder_checked_at: Optional[float] = None
+        self._embedder_lock = asyncio.Lock()
+        self.started_at = time.monotonic()
+        self.warmup_seconds: Optional[float] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self.started_at = time.monotonic()
+            self._task = asyncio.create_task(self._warmup(), name="semantic-warmup")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+
+    async def wait(self) -> None:
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def _warmup(self) -> None:
+        await asyncio.gather(self._warm_db(), self._warm_embedder())
+        self.warmup_seconds = round(time.monotonic() - self.started_at, 3)
+        logger.info(f"Warm-up completed in {self.warmup_seconds}s")
+
+    async def _warm_db(self) -> None:
+        delay = 0.5
+        while True:
+            try:
+                await call_repo(self.repo.open)
+                break
+            except Exception as e:
+                self._db_error = _describe(e)
+                logger.warning(f"Database warm-up failed ({self._db_error}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.retry_max)
+        self._db_ready, self._db_error = True, None
+        logger.info(f"Database ready: {self.repo.pool_stats()}")
+        for callback in self.on_db_ready:
+            await callback()
+
+    async def _warm_embedder(self) -> None:
+        if self.embedder is None:
+            return
+        if hasattr(self.embedder, "warmup"):
+            try:
+                await self.embedder.warmup()
+            except Exception as e:
+                self._embedder_status, self._embedder_error = "error", _describe(e)
+                logger.warning(f"Embedder warm-up failed: {self._embedder_error}")
+                return
+        await self._probe_embedder()
+
+    async def _probe_embedder(self) -> None:
+        async with self._embedder_lock:
+            if not self._probe_due():
+                return
+            try:
+                await asyncio.wait_for(self.embedder.embed_query("readiness probe"), 10)
+                self._embedder_status, self._embedder_error = "ok", None
+            except Exception as e:
+                transient = isinstance(e, asyncio.TimeoutError) or is_rate_limited(e) or is_transient(e)
+                self._embedder_status = "degraded" if transient else "error"
+                self._embedder_error = _describe(e)
+            self._embedder_checked_at = time.monotonic()
+
+    async def _check_db(self) -> Dict[str, Any]:
+        if not self._db_ready:
+            return {"status": "starting", "error": self._db_error}
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(call_repo(self.repo.ping), self.timeout)
+        except Exception as e:
+            return {"status": "error", "error": _describe(e)}
+        return {"status": "ok", "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+    async def _check_embedder(self) -> Dict[str, Any]:
+        # El probe vencido se renueva en segundo plano: /readyz responde con el último resultado
+        warming = self._task is not None and not self._task.done()
+        client_failed = self._embedder_status == "error" and self._embedder_checked_at is None
+        if self.embedder is not None and not warming and not client_failed and self._probe_due():
+            if self._probe_task is None or self._probe_task.done():
+                self._probe_task = asyncio.create_task(self._probe_embedder())
+        return {"status": self._embedder_status, "error": self._embedder_error}
+
+    def _probe_due(self) -> bool:
+        checked_at = self._embedder_checked_at
+        return checked_at is None or time.monotonic() - checked_at >= self.embedder_ttl
+
+    async def check(self) -> Dict[str, Any]:
+        db, embedder = await asyncio.gather(self._check_db(), self._check_embedder())
+        return {
+            "ready": db["status"] == "ok" and embedder["status"] in ("ok", "degraded"),
+            "checks": {"db": db, "embedder": embedder},
+            "warmup_seconds": self.warmup_seconds,
+        }
@@ -0,0 +1,102 @@
+import json
+import threading
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.embedding_cache import normalize_query
+from app.lru_cache import LRUCache
+
+# (hash del chunk, score) en el orden del ranking
+RankedIds = List[Tuple[str, float]]
+
+
+class SearchResultCache:
+    """
+    Cache de rankings de /search por tenant.
+
+    - Clave: (client_id, query normalizada, modo, top_k, candidatos (fetch_k), filtros, ef_search).
+    - Valor: hashes de los chunks y scores del ranking (no el texto): pocas decenas de
+      bytes por resultado. En un hit las filas se leen por (client_id, hash), así un
+      chunk borrado o reemplazado nunca se sirve desde el cache.
+    - Invalidación: cada tenant tiene un contador de generación; ingesta y borrados lo
+      incrementan y las entradas de generaciones anteriores dejan de ser válidas (se
+      descartan al leerlas o por LRU). Los demás tenants no se ven afectados.
+
+    Las generaciones son del proceso: escrituras hechas por otra réplica se reflejan al
+    vencer el TTL (RESULT_CACHE_TTL_SECONDS).
+    """
+
+    def __init__(self, cache: LRUCache):
+        self.cache = cache
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"stale": 0, "invalidations": 0}
+
+    def generation(self, client_id: str) -> int:
+        return self._generations.get(str(client_id), 0)
+
+    def invalidate(self, client_id: str) -> int:
+        with self._lock:
+            generation = self._generations.get(str(client_id), 0) + 1
+            self._generations[str(client_id)] = generation
+            self._stats["invalidations"] += 1
+        return generation
+
+    @staticmethod
+    def key(
+        client_id: str,
+        query_text: str,
+        mode: str,
+        top_k: int,
+        fetch_k: int,
+        filters: Optional[Dict[str, Any]],
+        ef_search: Optional[int],
+    ) -> Hashable:
+        filters_key = json.dumps(filters, sort_keys=True, separators=(",", ":")) if filters else ""
+        return (str(client_id), normalize_query(query_text), mode, top_k, fetch_k, filters_key, ef_search)
+
+    def get(self, key: Hashable) -> Optional[Tuple[str, RankedIds]]:
+        """
+        (modo efectivo, ranking) vigente para la clave, o None.
+        """
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        generation, mode, ranked = entry
+        if generation != self.generation(key[0]):
+            self.cache.pop(key)
+            with self._lock:
+                self._stats["stale"] += 1
+            return None
+        return mode, ranked
+
+    def set(self, key: Hashable, generation: int, mode: str, rows: List[Dict[str, Any]]) -> None:
+        """
+        generation es la leída antes de buscar: si una escritura la incrementó durante
+        la búsqueda, el ranking se guarda ya vencido y no se sirve.
+        """
+        if any(not row.get("hash") for row in rows):
+            return
+        ranked = [(row["hash"], float(row["similarity"])) for row in rows]
+        self.cache.set(key, (generation, mode, ranked))
+
+    def discard(self, key: Hashable) -> None:
+        """
+        Entrada que ya no se puede reconstruir (chunks borrados desde otra réplica).
+        """
+        if self.cache.pop(key) is not None:
+            with self._lock:
+                self._stats["stale"] += 1
+
+    def clear(self) -> int:
+        return self.cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["tenants"] = len(self._generations)
+        cache_stats = self.cache.stats()
+        # Una entrada de generación vieja cuenta como miss (LRUCache la contó como hit)
+        hits = cache_stats["hits"] - stats["stale"]
+        misses = cache_stats["misses"] + stats["stale"]
+        cache_stats.update(hits=hits, misses=misses, hit_rate=round(hits / (hits + misses), 4) if hits + misses else 0.0)
+        return {**cache_stats, **stats}
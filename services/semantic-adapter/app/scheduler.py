@@ -0,0 +1,306 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("semantic_adapter.scheduler")
+
+# Prioridades (menor = antes): las queries interactivas se adelantan a la ingesta masiva
+PRIORITY_QUERY = 0
+PRIORITY_INGEST = 10
+
+
+class RateLimitError(Exception):
+    """El proveedor rechazó la llamada por cuota (HTTP 429 / RESOURCE_EXHAUSTED)."""
+
+    def __init__(self, message: str = "429 Resource exhausted", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    if isinstance(exc, RateLimitError):
+        return True
+    text = str(exc).lower()
+    return "429" in text or "resource exhausted" in text or "resource_exhausted" in text or "quota" in text
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    text = str(exc).lower()
+    return any(marker in text for marker in ("500", "502", "503", "504", "unavailable", "deadline", "timeout"))
+
+
+def estimate_tokens(texts: List[str]) -> int:
+    # Aproximación sin tokenizer (~4 caracteres por token), suficiente para presupuestar TPM
+    return sum(len(text) // 4 + 1 for text in texts)
+
+
+class TokenBucket:
+    """
+    Token bucket con recarga continua: `rate` unidades por `window` segundos,
+    acumulables hasta `capacity`. rate=0 desactiva el límite.
+    """
+
+    def __init__(self, rate: float, window: float = 60.0, capacity: Optional[float] = None):
+        self.rate = rate
+        self.window = window
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate / self.window)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        """
+        Segundos hasta poder consumir `amount` (0 si ya se puede).
+        """
+        if not self.rate:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) * self.window / self.rate
+
+    def consume(self, amount: float) -> None:
+        if self.rate:
+            self._refill()
+            self._tokens -= min(amount, self.capacity)
+
+    def available(self) -> float:
+        if not self.rate:
+            return float("inf")
+        self._refill()
+        return self._tokens
+
+
+class EmbeddingScheduler:
+    """
+    Envuelve al embedder del proveedor y controla todo el tráfico hacia él
+    (ingesta y búsqueda comparten los mismos presupuestos):
+
+    - Token buckets de requests/minuto (rpm) y tokens/minuto (tpm).
+    - Cola con prioridad: las queries se despachan antes que los lotes de ingesta pendientes.
+    - Lotes de tamaño adaptativo (AIMD): crecen de a `batch_step` mientras la latencia esté
+      bajo `target_latency`, se reducen a la mitad ante un 429 (y el lote se re-divide).
+    - Hasta `max_concurrency` lotes en vuelo; reintentos con backoff ante 429 y errores transitorios.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_batch: Optional[int] = None,
+        min_batch: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        target_latency: Optional[float] = None,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        window: float = 60.0,
+        burst: Optional[float] = None,
+    ):
+        self.embedder = embedder
+        self.rpm = rpm if rpm is not None else float(os.getenv("EMBED_RPM", "1500"))
+        self.tpm = tpm if tpm is not None else float(os.getenv("EMBED_TPM", "1000000"))
+        # Gemini acepta como máximo 100 textos por batchEmbedContents
+        self.max_batch = max_batch or int(os.getenv("EMBED_MAX_BATCH", "100"))
+        self.min_batch = min_batch or int(os.getenv("EMBED_MIN_BATCH", "1"))
+        self.max_concurrency = max_concurrency or int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("EMBED_MAX_RETRIES", "5"))
+        self.target_latency = target_latency or float(os.getenv("EMBED_TARGET_LATENCY_MS", "5000")) / 1000
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.batch_step = max(1, self.max_batch // 10)
+        self.batch_size = self.max_batch
+
+        # Ráfaga permitida como fracción de la cuota: con recarga continua, en cualquier ventana
+        # se envía como máximo (1 + burst) * cuota; los 429 residuales los absorbe el AIMD.
+        burst = burst if burst is not None else float(os.getenv("EMBED_BURST_FRACTION", "0.25"))
+        self._requests = TokenBucket(self.rpm, window, capacity=max(1.0, self.rpm * burst))
+        self._tokens = TokenBucket(self.tpm, window, capacity=max(1.0, self.tpm * burst))
+        self._blocked_until = 0.0
+        self._seq = itertools.count()
+        self._waiters: List[list] = []
+        self._in_flight = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cond: Optional[asyncio.Condition] = None
+        self._stats = {
+            "requests": 0, "texts": 0, "rate_limited": 0, "retries": 0, "errors": 0,
+            "batch_increases": 0, "batch_decreases": 0, "max_in_flight": 0, "wait_time_ms": 0.0,
+        }
+
+    @property
+    def model(self) -> str:
+        return self.embedder.model
+
+    async def embed_documents(self, texts: List[str], priority: int = PRIORITY_INGEST) -> List[List[float]]:
+        if not texts:
+            return []
+        # El tamaño de lote se fija al encolar: los lotes posteriores ya usan el tamaño ajustado
+        size = self.batch_size
+        batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+        results = await asyncio.gather(*(self._run_batch("documents", batch, priority) for batch in batches))
+        return [vector for batch in results for vector in batch]
+
+    async def embed_query(self, text: str) -> List[float]:
+        return (await self._run_batch("queries", [text], PRIORITY_QUERY))[0]
+
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        size = self.batch_size
+        batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+        results = await asyncio.gather(*(self._run_batch("queries", batch, PRIORITY_QUERY) for batch in batches))
+        return [vector for batch in results for vector in batch]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["wait_time_ms"] = round(stats["wait_time_ms"], 2)
+        stats.update({
+            "batch_size": self.batch_size,
+            "in_flight": self._in_flight,
+            "queued": len(self._waiters),
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "requests_available": round(self._requests.available(), 2),
+            "tokens_available": round(self._tokens.available(), 2),
+            "cooldown_seconds": round(max(0.0, self._blocked_until - time.monotonic()), 2),
+        })
+        return stats
+
+    # --- Internos ---
+
+    async def _call(self, kind: str, texts: List[str]) -> List[List[float]]:
+        if kind == "documents":
+            return await self.embedder.embed_documents(texts)
+        if hasattr(self.embedder, "embed_queries"):
+            return await self.embedder.embed_queries(texts)
+        return list(await asyncio.gather(*(self.embedder.embed_query(t) for t in texts)))
+
+    async def _run_batch(self, kind: str, texts: List[str], priority: int) -> List[List[float]]:
+        attempt = 0
+        while True:
+            await self._acquire(priority, estimate_tokens(texts))
+            started = time.monotonic()
+            try:
+                vectors = await self._call(kind, texts)
+            except Exception as e:
+                await self._release()
+                if is_rate_limited(e):
+                    self._on_rate_limited(e, attempt)
+                    if len(texts) > self.batch_size:
+                        # Re-dividir al nuevo tamaño (más chico) y reintentar cada parte
+                        size = self.batch_size
+                        parts = await asyncio.gather(*(
+                            self._run_batch(kind, texts[i:i + size], priority) for i in range(0, len(texts), size)
+                        ))
+                        return [vector for part in parts for vector in part]
+                elif not is_transient(e):
+                    self._stats["errors"] += 1
+                    raise
+                if attempt >= self.max_retries:
+                    self._stats["errors"] += 1
+                    raise
+                attempt += 1
+                self._stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            await self._release()
+            self._on_success(len(texts), time.monotonic() - started)
+            return vectors
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(delay / 2, delay)
+
+    def _on_rate_limited(self, exc: BaseException, attempt: int) -> None:
+        self._stats["rate_limited"] += 1
+        # Pausa global: ningún lote sale hasta que pase el cooldown
+        cooldown = getattr(exc, "retry_after", None) or self._backoff(attempt + 1)
+        self._blocked_until = max(self._blocked_until, time.monotonic() + cooldown)
+        previous, self.batch_size = self.batch_size, max(self.min_batch, self.batch_size // 2)
+        if self.batch_size < previous:
+            self._stats["batch_decreases"] += 1
+            logger.warning(f"Provider rate limited; batch size {previous} -> {self.batch_size}, cooldown {cooldown:.2f}s")
+
+    def _on_success(self, texts: int, latency: float) -> None:
+        self._stats["requests"] += 1
+        self._stats["texts"] += texts
+        if latency > self.target_latency:
+            previous, self.batch_size = self.batch_size, max(self.min_batch, int(self.batch_size * 0.75))
+            if self.batch_size < previous:
+                self._stats["batch_decreases"] += 1
+        elif texts >= self.batch_size and self.batch_size < self.max_batch:
+            # Solo crece si el lote estaba lleno: lotes chicos no prueban capacidad
+            self.batch_size = min(self.max_batch, self.batch_size + self.batch_step)
+            self._stats["batch_increases"] += 1
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._cond = loop, asyncio.Condition()
+            self._waiters, self._in_flight = [], 0
+        return self._cond
+
+    def _budget_delay(self, tokens: int) -> float:
+        """
+        0 si el lote puede salir ya (y consume presupuesto); si no, segundos a esperar.
+        """
+        cooldown = self._blocked_until - time.monotonic()
+        if cooldown > 0:
+            return cooldown
+        delay = max(self._requests.delay(1), self._tokens.delay(tokens))
+        if delay > 0:
+            return delay
+        self._requests.consume(1)
+        self._tokens.consume(tokens)
+        return 0.0
+
+    async def _acquire(self, priority: int, tokens: int) -> None:
+        cond = self._condition()
+        entry = [priority, next(self._seq)]
+        heapq.heappush(self._waiters, entry)
+        started = time.monotonic()
+        async with cond:
+            try:
+                while True:
+                    if self._waiters[0] is entry and self._in_flight < self.max_concurrency:
+                        delay = self._budget_delay(tokens)
+                        if delay == 0:
+                            heapq.heappop(self._waiters)
+                            self._in_flight += 1
+                            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._in_flight)
+                            self._stats["wait_time_ms"] += (time.monotonic() - started) * 1000
+                            cond.notify_all()
+                            return
+                        try:
+                            await asyncio.wait_for(cond.wait(), timeout=delay)
+                        except asyncio.TimeoutError:
+                            pass
+                    else:
+                        await cond.wait()
+            except BaseException:
+                # Cancelado mientras esperaba: sale de la cola sin bloquear a los demás
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                cond.notify_all()
+                raise
+
+    async def _release(self) -> None:
+        cond = self._condition()
+        async with cond:
+            self._in_flight -= 1
+            cond.notify_all()
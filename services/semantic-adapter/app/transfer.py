@@ -0,0 +1,333 @@
+"""
+Export / import binario de los chunks de un tenant (sin volver a generar embeddings).
+
+Formato del archivo (.semvec, little-endian):
+
+    MAGIC (8 bytes) | largo del header (uint64) | header JSON | padding a 64 bytes
+    embeddings: matriz contigua count x dim (float32 o float16), fila i = registro i
+    registros: NDJSON, un chunk por línea (content_id, source, title, body_content, metadata, hash)
+    documentos: NDJSON, manifiesto por documento (content_id, doc_hash, chunk_count)
+    footer: offset y largo de registros y documentos + FOOTER_MAGIC
+
+Los embeddings van primero y alineados: al importar se leen con np.memmap sin
+cargarlos en memoria. La importación escribe con COPY ... (FORMAT binary), con los
+vectores en el formato binario de pgvector.
+
+Uso:
+    python -m app.transfer export <client_id> -o tenant.semvec [--dtype float16]
+    python -m app.transfer import tenant.semvec [--client-id <uuid>] [--mode replace|merge] [--bulk-load]
+"""
+import io
+import os
+import json
+import time
+import uuid
+import struct
+import logging
+import argparse
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("semantic_adapter.transfer")
+
+MAGIC = b"SEMVEC\x00\x01"
+FOOTER_MAGIC = b"SEMVEND\x00"
+FOOTER = struct.Struct("<QQQQ8s")
+ALIGNMENT = 64
+DTYPES = {"float32": "<f4", "float16": "<f2"}
+IMPORT_MODES = ("replace", "merge")
+
+# COPY binario: firma + flags + extensión; cada fila: cantidad de campos y (largo, bytes) por campo
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_TRAILER = struct.pack(">h", -1)
+COPY_COLUMNS = ("client_id", "content_id", "source", "title", "body_content", "metadata", "hash", "embedding")
+_ROW_HEADER = struct.pack(">h", len(COPY_COLUMNS))
+_NULL = struct.pack(">i", -1)
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _record(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: row.get(key) for key in ("content_id", "source", "title", "body_content", "metadata", "hash")}
+
+
+def export_tenant(
+    repo,
+    client_id: str,
+    dtype: str = "float16",
+    model: Optional[str] = None,
+    batch_size: int = 2000,
+) -> Iterator[bytes]:
+    """
+    Genera el archivo por partes (para escribir a disco o responder en streaming).
+    Los embeddings se emiten a medida que se leen; los registros se acumulan en un
+    archivo temporal (en disco si superan 8 MB) y se emiten al final.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {tuple(DTYPES)}")
+    source = repo.iter_tenant_export(client_id, batch_size)
+    records = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    # Cerrar este generador (fin, error o desconexión del cliente) cierra el del repositorio:
+    # libera la conexión y el snapshot
+    try:
+        summary = next(source)
+        first = next(source, [])
+        dim = len(first[0]["embedding"]) if first else 0
+        header = {
+            "format_version": MAGIC[-1],
+            "client_id": str(client_id),
+            "count": summary["count"],
+            "dim": dim,
+            "dtype": dtype,
+            "model": model,
+            "documents": len(summary["documents"]),
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        preamble = MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes
+        preamble += b"\x00" * (_align(len(preamble)) - len(preamble))
+        yield preamble
+        offset = len(preamble)
+
+        written = 0
+        batch = first
+        while batch:
+            matrix = np.asarray([row["embedding"] for row in batch], dtype=np.float32).astype(DTYPES[dtype])
+            chunk = matrix.tobytes()
+            yield chunk
+            offset += len(chunk)
+            records.write("".join(
+                json.dumps(_record(row), ensure_ascii=False, default=str) + "\n" for row in batch
+            ).encode("utf-8"))
+            written += len(batch)
+            batch = next(source, [])
+        if written != summary["count"]:
+            raise RuntimeError(f"Exported {written} chunks but the snapshot reported {summary['count']}")
+
+        records_offset, records_length = offset, records.tell()
+        records.seek(0)
+        for chunk in iter(lambda: records.read(1024 * 1024), b""):
+            yield chunk
+        documents = "".join(json.dumps(doc, ensure_ascii=False) + "\n" for doc in summary["documents"]).encode("utf-8")
+        yield documents
+        yield FOOTER.pack(records_offset, records_length, records_offset + records_length, len(documents), FOOTER_MAGIC)
+    finally:
+        records.close()
+        source.close()
+
+
+class TenantArchive:
+    """
+    Lector de un archivo .semvec: header, embeddings (memmap) y registros por lotes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("Not a semantic-adapter tenant archive (bad magic)")
+            (length,) = struct.unpack("<Q", f.read(8))
+            self.header: Dict[str, Any] = json.loads(f.read(length))
+            f.seek(-FOOTER.size, os.SEEK_END)
+            records_offset, self.records_length, self.documents_offset, self.documents_length, end = FOOTER.unpack(
+                f.read(FOOTER.size)
+            )
+        if end != FOOTER_MAGIC:
+            raise ValueError("Truncated tenant archive (missing footer)")
+        self.count, self.dim = self.header["count"], self.header["dim"]
+        self.dtype = DTYPES[self.header["dtype"]]
+        self.embeddings_offset = embeddings_offset = _align(len(MAGIC) + 8 + length)
+        if records_offset != embeddings_offset + self.count * self.dim * np.dtype(self.dtype).itemsize:
+            raise ValueError("Corrupt tenant archive (embedding section size mismatch)")
+        self.records_offset = records_offset
+        self.embeddings = (
+            np.memmap(path, dtype=self.dtype, mode="r", offset=embeddings_offset, shape=(self.count, self.dim))
+            if self.count else np.zeros((0, self.dim), dtype=self.dtype)
+        )
+
+    @property
+    def client_id(self) -> str:
+        return self.header["client_id"]
+
+    def documents(self) -> List[Dict[str, Any]]:
+        with open(self.path, "rb") as f:
+            f.seek(self.documents_offset)
+            data = f.read(self.documents_length)
+        return [json.loads(line) for line in data.splitlines() if line]
+
+    def iter_batches(self, batch_size: int = 5000) -> Iterator[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        """
+        (registros, embeddings) por lotes; los embeddings son vistas del memmap.
+        """
+        with open(self.path, "rb") as f:
+            f.seek(self.records_offset)
+            end = self.records_offset + self.records_length
+            start, batch = 0, []
+            while f.tell() < end:
+                batch.append(json.loads(f.readline()))
+                if len(batch) == batch_size:
+                    yield batch, self.embeddings[start:start + len(batch)]
+                    start, batch = start + len(batch), []
+            if batch:
+                yield batch, self.embeddings[start:start + len(batch)]
+            if start + len(batch) != self.count:
+                raise ValueError(f"Archive has {start + len(batch)} records but the header reports {self.count}")
+
+
+def _text(value: Optional[str]) -> bytes:
+    if value is None:
+        return _NULL
+    data = value.encode("utf-8")
+    return struct.pack(">i", len(data)) + data
+
+
+def encode_copy_rows(client_id: str, records: List[Dict[str, Any]], embeddings: np.ndarray) -> bytes:
+    """
+    Filas de COPY (FORMAT binary) para COPY_COLUMNS. El vector usa el formato binario
+    de pgvector: dim (int16), reservado (int16) y dim float4 big-endian.
+    """
+    client = uuid.UUID(str(client_id)).bytes
+    client_field = struct.pack(">i", len(client)) + client
+    vectors = np.asarray(embeddings).astype(">f4")
+    dim = vectors.shape[1] if vectors.ndim == 2 else 0
+    vector_prefix = struct.pack(">ihh", 4 + dim * 4, dim, 0)
+    parts = []
+    for record, vector in zip(records, vectors):
+        metadata = record.get("metadata")
+        metadata_field = _NULL
+        if metadata is not None:
+            # jsonb binario: versión 1 + texto JSON
+            data = b"\x01" + json.dumps(metadata, ensure_ascii=False).encode("utf-8")
+            metadata_field = struct.pack(">i", len(data)) + data
+        parts.extend((
+            _ROW_HEADER,
+            client_field,
+            _text(record["content_id"]),
+            _text(record["source"]),
+            _text(record.get("title")),
+            _text(record["body_content"]),
+            metadata_field,
+            _text(record["hash"]),
+            vector_prefix,
+            vector.tobytes(),
+        ))
+    return b"".join(parts)
+
+
+class _ChunkReader(io.RawIOBase):
+    """
+    Archivo de solo lectura sobre un iterador de bytes (origen de copy_expert).
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+def import_archive(
+    repo,
+    archive: TenantArchive,
+    client_id: Optional[str] = None,
+    mode: str = "replace",
+    batch_size: int = 5000,
+) -> Dict[str, Any]:
+    """
+    Carga el archivo en semantic_items con COPY binario (sin llamar al embedder).
+    client_id distinto al del archivo mueve los datos a otro tenant (se reescribe
+    metadata.client_id). mode=replace reemplaza los chunks y el manifiesto del tenant
+    en una transacción; mode=merge agrega solo los chunks cuyo hash no existe.
+    Con SEMANTIC_PARTITIONING=none el hash es único en toda la tabla: para copiar un
+    tenant a otro client_id de la misma base, el de origen no debe tener esos chunks.
+    """
+    from app.vector_repo import EMBEDDING_DIM
+
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"mode must be one of {IMPORT_MODES}")
+    if archive.count and archive.dim != EMBEDDING_DIM:
+        raise ValueError(f"Archive embeddings have {archive.dim} dimensions, semantic_items expects {EMBEDDING_DIM}")
+    target = str(uuid.UUID(str(client_id or archive.client_id)))
+    retarget = target != str(uuid.UUID(archive.client_id))
+
+    def copy_stream() -> Iterator[bytes]:
+        yield COPY_HEADER
+        for records, embeddings in archive.iter_batches(batch_size):
+            if retarget:
+                for record in records:
+                    if isinstance(record.get("metadata"), dict):
+                        record["metadata"] = {**record["metadata"], "client_id": target}
+            yield encode_copy_rows(target, records, embeddings)
+        yield COPY_TRAILER
+
+    started = time.monotonic()
+    result = repo.import_tenant(target, _ChunkReader(copy_stream()), archive.documents(), mode)
+    seconds = time.monotonic() - started
+    return {
+        "client_id": target,
+        "source_client_id": archive.client_id,
+        "mode": mode,
+        **result,
+        "seconds": round(seconds, 3),
+        "chunks_per_s": round(archive.count / seconds, 1) if seconds else None,
+    }
+
+
+def main():
+    from app.vector_repo import VectorRepository
+
+    parser = argparse.ArgumentParser(description="Export / import a tenant's chunks and embeddings")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export")
+    export.add_argument("client_id")
+    export.add_argument("-o", "--output", required=True)
+    export.add_argument("--dtype", choices=tuple(DTYPES), default="float16")
+    export.add_argument("--model", default=None, help="modelo de embeddings (se guarda en el header)")
+    importer = commands.add_parser("import")
+    importer.add_argument("path")
+    importer.add_argument("--client-id", default=None)
+    importer.add_argument("--mode", choices=IMPORT_MODES, default="replace")
+    importer.add_argument("--bulk-load", action="store_true", help="sin índice HNSW durante la carga, reconstruido al final")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    repo = VectorRepository()
+    try:
+        if args.command == "export":
+            with open(args.output, "wb") as out:
+                for chunk in export_tenant(repo, args.client_id, args.dtype, args.model):
+                    out.write(chunk)
+            archive = TenantArchive(args.output)
+            result = {**archive.header, "bytes": os.path.getsize(args.output)}
+        else:
+            archive = TenantArchive(args.path)
+            if args.bulk_load:
+                repo.begin_bulk_load()
+            result = import_archive(repo, archive, args.client_id, args.mode)
+            if args.bulk_load:
+                result["index_rebuild"] = repo.rebuild_vector_index()
+    finally:
+        repo.close()
+    print(json.dumps(result, default=str))
+
+
+if __name__ == "__main__":
+    main()
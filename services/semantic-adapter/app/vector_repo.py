@@ -1,29 +1,264 @@
 import os
-from typing import List
-import psycopg2
-from psycopg2.extras import RealDictCursor, Json
+import re
+import json
+import time
+import hashlib
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from psycopg2 import errors
+from psycopg2.extras import RealDictCursor, Json, execute_values
 from pgvector.psycopg2 import register_vector
 
+from app import migrations
+from app.db_pool import ConnectionPool
+
+logger = logging.getLogger("semantic_adapter.vector_repo")
+
+LAYOUTS = ("none", "tenant", "hash")
+# (relkind, partstrat) de semantic_items, o ninguna fila si no existe
+LAYOUT_QUERY = """
+SELECT c.relkind, p.partstrat
+FROM pg_class c
+LEFT JOIN pg_partitioned_table p ON p.partrelid = c.oid
+WHERE c.oid = to_regclass(%s)
+"""
+# Representación indexada del embedding (el vector completo siempre se guarda para re-ranking)
+STORAGE_MODES = ("full", "halfvec", "binary")
+EMBEDDING_DIM = 768
+
+# Valores de memoria de Postgres ("512MB", "1GB"): se interpolan en SET
+_MEMORY_SETTING = re.compile(r"^\d+\s*(kB|MB|GB|TB)?$")
+
+
+def _version_tuple(version: Optional[str]) -> Tuple[int, ...]:
+    if not version:
+        return (0,)
+    return tuple(int(part) for part in version.split(".") if part.isdigit())
+
 
 class VectorRepository:
-    def __init__(self):
+    def __init__(self, pool: Optional[ConnectionPool] = None):
         self.conn_url = os.getenv("DATABASE_URL")
         self.table_name = "semantic_items"
-        self._init_db()
+        self.manifest_table = "semantic_documents"
+        self.cache_table = "embedding_cache"
+        self.jobs_table = "semantic_jobs"
+        # Versión del esquema (app/migrations.py); DB_MIGRATE_ON_START=false exige el paso explícito
+        self.migrations_table = "semantic_schema_migrations"
+        self.migrate_on_start = os.getenv("DB_MIGRATE_ON_START", "true").lower() == "true"
+        # register_vector se ejecuta una vez por conexión física del pool
+        self.pool = pool or ConnectionPool.from_env(self.conn_url, configure=register_vector)
+        self._open_lock = threading.Lock()
+        self._ready = False
+        self.pgvector_version: Optional[str] = None
+        self._iterative_scan = False
+        # Límite de candidatos de HNSW (pgvector acepta hasta 1000)
+        self.max_ef_search = int(os.getenv("HNSW_MAX_EF_SEARCH", "1000"))
+        # Configuración de text search para search_tsv (se interpola en DDL: solo identificadores)
+        self.text_search_config = os.getenv("SEARCH_TEXT_CONFIG", "spanish")
+        if not self.text_search_config.isidentifier():
+            raise ValueError("SEARCH_TEXT_CONFIG must be a text search configuration name")
+
+        # Layout físico de semantic_items (ver _ensure_schema)
+        self.requested_layout = os.getenv("SEMANTIC_PARTITIONING", "none").lower()
+        if self.requested_layout not in LAYOUTS:
+            raise ValueError(f"SEMANTIC_PARTITIONING must be one of {LAYOUTS}")
+        self.hash_partitions = int(os.getenv("SEMANTIC_HASH_PARTITIONS", "16"))
+        self.layout = self.requested_layout
+        self._known_partitions: Set[str] = set()
 
-    def _get_connection(self):
-        conn = psycopg2.connect(self.conn_url)
-        register_vector(conn)  # Registra el tipo vector en la conexión
-        return conn
+        # Índice HNSW compacto (ver _index_target); los candidatos se re-rankean con el vector completo
+        self.storage_mode = os.getenv("VECTOR_STORAGE_MODE", "full").lower()
+        if self.storage_mode not in STORAGE_MODES:
+            raise ValueError(f"VECTOR_STORAGE_MODE must be one of {STORAGE_MODES}")
+        self.rerank_factor = max(1, int(os.getenv("VECTOR_RERANK_FACTOR", "4")))
 
-    def _init_db(self):
+        # Parámetros de construcción del HNSW (aplican a índices nuevos; ver rebuild_vector_index)
+        self.index_state_table = "semantic_index_state"
+        self.hnsw_m = int(os.getenv("HNSW_M", "16"))
+        self.hnsw_ef_construction = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+        if not 2 <= self.hnsw_m <= 100 or self.hnsw_ef_construction < 2 * self.hnsw_m:
+            raise ValueError("HNSW_M must be between 2 and 100 and HNSW_EF_CONSTRUCTION at least 2 * HNSW_M")
+        self.build_maintenance_work_mem = os.getenv("HNSW_BUILD_MAINTENANCE_WORK_MEM")
+        if self.build_maintenance_work_mem and not _MEMORY_SETTING.match(self.build_maintenance_work_mem):
+            raise ValueError("HNSW_BUILD_MAINTENANCE_WORK_MEM must be a memory size such as 512MB or 2GB")
+        self.build_parallel_workers = int(os.getenv("HNSW_BUILD_PARALLEL_WORKERS", "0"))
+
+        # ef_search: global (HNSW_EF_SEARCH), por tenant (HNSW_TENANT_EF_SEARCH, JSON) o por request
+        self.ef_search = int(os.getenv("HNSW_EF_SEARCH", "0")) or None
+        self.tenant_ef_search: Dict[str, int] = {
+            str(client_id): int(value)
+            for client_id, value in json.loads(os.getenv("HNSW_TENANT_EF_SEARCH", "{}")).items()
+        }
+
+    def open(self):
         """
-        Crea la tabla semantic_items basada en el esquema canónico
-        y prepara el índice vectorial.
+        Abre el pool de conexiones y verifica el esquema.
+        Se llama desde el warm-up del lifespan (app/readiness.py); si no, se abre en el primer uso.
         """
-        query = f"""
-        CREATE TABLE IF NOT EXISTS {self.table_name} (
-            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        with self._open_lock:
+            if self._ready:
+                return
+            self.pool.open()
+            try:
+                self._detect_capabilities()
+                self._ensure_schema()
+            except Exception:
+                self.pool.close()
+                raise
+            self._ready = True
+
+    def _detect_capabilities(self):
+        """
+        Detecta la versión de pgvector: iterative index scans requieren >= 0.8.0;
+        halfvec y binary_quantize requieren >= 0.7.0.
+        """
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+                row = cur.fetchone()
+        self._apply_capabilities(row[0] if row else None)
+
+    def _apply_capabilities(self, version: Optional[str]):
+        self.pgvector_version = version
+        self._iterative_scan = _version_tuple(self.pgvector_version) >= (0, 8, 0)
+        if self.storage_mode != "full" and _version_tuple(self.pgvector_version) < (0, 7, 0):
+            raise RuntimeError(
+                f"VECTOR_STORAGE_MODE='{self.storage_mode}' requires pgvector >= 0.7.0 "
+                f"(installed: {self.pgvector_version})"
+            )
+
+    def close(self):
+        with self._open_lock:
+            self._ready = False
+            self.pool.close()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return self.pool.stats()
+
+    @contextmanager
+    def _get_connection(self) -> Iterator[Any]:
+        if not self._ready:
+            self.open()
+        with self.pool.connection() as conn:
+            yield conn
+
+    def _ensure_schema(self):
+        """
+        Resuelve el layout de semantic_items y verifica la versión del esquema (ver
+        app/migrations.py). Con el esquema al día no se ejecuta DDL. Si hay migraciones
+        pendientes se aplican (DB_MIGRATE_ON_START=true) o se falla con SchemaOutdatedError.
+
+        Layouts (SEMANTIC_PARTITIONING):
+        - none:   tabla única con un índice HNSW global.
+        - tenant: una partición por client_id (creada en la primera ingesta), cada una con su HNSW.
+        - hash:   SEMANTIC_HASH_PARTITIONS particiones por hash de client_id, cada una con su HNSW.
+        """
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                self.layout = self._resolve_layout(cur)
+                version = migrations.current_version(cur, self.migrations_table)
+            conn.rollback()
+        if version < migrations.LATEST_VERSION:
+            if not self.migrate_on_start:
+                raise migrations.SchemaOutdatedError(
+                    f"Schema version {version} is behind {migrations.LATEST_VERSION}: "
+                    f"run 'python -m app.migrations upgrade'"
+                )
+            self._apply_migrations()
+        if self.layout == "tenant":
+            self._known_partitions.clear()
+
+    def _apply_migrations(self) -> Dict[str, Any]:
+        with self.pool.connection() as conn:
+            return migrations.migrate(self, conn)
+
+    def migrate(self) -> Dict[str, Any]:
+        """
+        Paso explícito de migración (python -m app.migrations upgrade): aplica las
+        migraciones pendientes aunque DB_MIGRATE_ON_START=false.
+        """
+        self.pool.open()
+        self._detect_capabilities()
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                self.layout = self._resolve_layout(cur)
+            conn.rollback()
+        result = self._apply_migrations()
+        self._known_partitions.clear()
+        return result
+
+    def schema_status(self) -> Dict[str, Any]:
+        self.pool.open()
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                version = migrations.current_version(cur, self.migrations_table)
+            conn.rollback()
+        return {
+            "version": version,
+            "latest": migrations.LATEST_VERSION,
+            "pending": [m.name for m in migrations.pending(version)],
+        }
+
+    def ping(self) -> None:
+        """
+        Probe de readiness: SELECT 1 por el pool. No abre el repositorio (eso es el warm-up).
+        """
+        if not self._ready:
+            raise RuntimeError("repository is not open")
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+            conn.rollback()
+
+    def _resolve_layout(self, cur) -> str:
+        """
+        Si la tabla ya existe se respeta su layout real (ver migrate_layout para cambiarlo).
+        """
+        cur.execute(LAYOUT_QUERY, (self.table_name,))
+        return self._layout_from_catalog(cur.fetchone())
+
+    def _layout_from_catalog(self, row: Optional[Tuple[str, Optional[str]]]) -> str:
+        if row is None:
+            return self.requested_layout
+        relkind, partstrat = row
+        actual = {"l": "tenant", "h": "hash"}.get(partstrat, "none") if relkind == "p" else "none"
+        if actual != self.requested_layout:
+            logger.warning(
+                f"{self.table_name} uses layout '{actual}' but SEMANTIC_PARTITIONING='{self.requested_layout}'; "
+                f"keeping '{actual}' (run migrate_layout() to convert)"
+            )
+        return actual
+
+    def _items_ddl(self, layout: str, table_name: Optional[str] = None, with_index: bool = True) -> str:
+        table_name = table_name or self.table_name
+        # En bulk load el índice vectorial se difiere (ver begin_bulk_load)
+        index_ddl = f"""
+        CREATE INDEX IF NOT EXISTS {self._index_name(self.storage_mode, table_name)}
+        ON {table_name}
+        USING hnsw ({self._index_target(self.storage_mode)}) {self._index_options()};""" if with_index else ""
+        if layout == "none":
+            identity, hash_column, constraints, partition_by = (
+                "id UUID PRIMARY KEY DEFAULT gen_random_uuid(),", "hash TEXT UNIQUE,", "", ""
+            )
+        else:
+            # En tablas particionadas las claves únicas deben incluir la clave de partición
+            identity, hash_column = "id UUID NOT NULL DEFAULT gen_random_uuid(),", "hash TEXT NOT NULL,"
+            constraints = ",\n            PRIMARY KEY (client_id, id),\n            UNIQUE (client_id, hash)"
+            partition_by = " PARTITION BY LIST (client_id)" if layout == "tenant" else " PARTITION BY HASH (client_id)"
+
+        # Con una partición por tenant el índice por client_id no aporta
+        client_index = "" if layout == "tenant" else f"""
+        CREATE INDEX IF NOT EXISTS {table_name}_client_idx
+        ON {table_name} (client_id);
+        """
+        return f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            {identity}
 
             -- Identidad lógica
             content_id TEXT NOT NULL,
@@ -38,7 +273,7 @@ class VectorRepository:
             metadata JSONB,
 
             -- Control de idempotencia / versionado
-            hash TEXT UNIQUE,
+            {hash_column}
 
             -- Vector embedding
             -- 1536: OpenAI
@@ -47,27 +282,261 @@ class VectorRepository:
 
             -- Auditoría
             created_at TIMESTAMP DEFAULT now(),
+            updated_at TIMESTAMP DEFAULT now(){constraints}
+        ){partition_by};
+
+        -- En tablas particionadas el índice se replica en cada partición (un grafo HNSW por partición)
+        {index_ddl}
+
+        -- Búsqueda léxica (identificadores, nombres propios): tsvector en español generado por Postgres
+        ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS search_tsv tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector('{self.text_search_config}', coalesce(title, '') || ' ' || body_content)
+        ) STORED;
+
+        CREATE INDEX IF NOT EXISTS {table_name}_search_tsv_idx
+        ON {table_name}
+        USING gin (search_tsv);
+        {client_index}"""
+
+    def _index_name(self, mode: str, table_name: Optional[str] = None, rebuild: bool = False) -> str:
+        table_name = table_name or self.table_name
+        if rebuild:
+            # Índice temporal de rebuild_vector_index (reemplaza al actual al terminar)
+            suffix = f"_embedding_rebuild_{mode}_idx"
+        else:
+            suffix = "_embedding_idx" if mode == "full" else f"_embedding_{mode}_idx"
+        if len(table_name) + len(suffix) <= 63:
+            return table_name + suffix
+        # Postgres trunca identificadores a 63 bytes: se acorta la tabla (no el sufijo) y se agrega
+        # un hash del nombre completo, así tablas con el mismo prefijo no comparten índice
+        digest = hashlib.sha256(table_name.encode("utf-8")).hexdigest()[:8]
+        return f"{table_name[:63 - len(suffix) - 9]}_{digest}{suffix}"
+
+    @staticmethod
+    def _index_target(mode: str) -> str:
+        """
+        Expresión + opclass del índice HNSW por modo de almacenamiento:
+        - full:    vector(768) float32 (~3 KB por chunk).
+        - halfvec: float16 (~1.5 KB), recall prácticamente igual.
+        - binary:  1 bit por dimensión (~96 B), requiere re-ranking sobre más candidatos.
+        """
+        if mode == "halfvec":
+            return f"(embedding::halfvec({EMBEDDING_DIM})) halfvec_cosine_ops"
+        if mode == "binary":
+            return f"(binary_quantize(embedding)::bit({EMBEDDING_DIM})) bit_hamming_ops"
+        return "embedding vector_cosine_ops"
+
+    def _index_options(self) -> str:
+        return f"WITH (m = {self.hnsw_m}, ef_construction = {self.hnsw_ef_construction})"
+
+    def _candidate_distance(self, column: str, vector_sql: str) -> str:
+        """
+        Distancia que usa el índice del modo actual (debe coincidir con la expresión indexada).
+        """
+        if self.storage_mode == "halfvec":
+            return f"{column}::halfvec({EMBEDDING_DIM}) <=> {vector_sql}::halfvec({EMBEDDING_DIM})"
+        if self.storage_mode == "binary":
+            return f"binary_quantize({column})::bit({EMBEDDING_DIM}) <~> binary_quantize({vector_sql})"
+        return f"{column} <=> {vector_sql}"
+
+    def _candidate_limit(self, top_k: int) -> int:
+        return top_k if self.storage_mode == "full" else top_k * self.rerank_factor
+
+    def resolve_ef_search(self, client_id: Optional[str] = None, requested: Optional[int] = None) -> Optional[int]:
+        """
+        ef_search efectivo: el del request, si no el del tenant, si no HNSW_EF_SEARCH.
+        None = default de pgvector (40). Más alto = más recall y más latencia.
+        """
+        if requested:
+            return requested
+        return self.tenant_ef_search.get(str(client_id)) or self.ef_search
+
+    def _candidate_ef_search(self, top_k: int, ef_search: Optional[int] = None) -> Optional[int]:
+        # El índice entrega como máximo ef_search filas (sin iterative scan): debe cubrir los candidatos
+        candidates = self._candidate_limit(top_k)
+        if ef_search:
+            return min(max(ef_search, candidates), self.max_ef_search)
+        if self.storage_mode != "full" and candidates > 40:
+            return min(candidates, self.max_ef_search)
+        return None
+
+    def _set_candidate_ef_search(self, cur, top_k: int, ef_search: Optional[int] = None) -> None:
+        ef_search = self._candidate_ef_search(top_k, ef_search)
+        if ef_search:
+            cur.execute("SET LOCAL hnsw.ef_search = %s", (ef_search,))
+
+    def _support_ddl(self) -> str:
+        return f"""
+        -- Manifiesto por documento: último hash ingerido y tamaño de su set de chunks
+        CREATE TABLE IF NOT EXISTS {self.manifest_table} (
+            client_id UUID NOT NULL,
+            content_id TEXT NOT NULL,
+            doc_hash TEXT NOT NULL,
+            chunk_count INT NOT NULL,
+            updated_at TIMESTAMP DEFAULT now(),
+            PRIMARY KEY (client_id, content_id)
+        );
+
+        -- Cache de embeddings direccionado por contenido (modelo + sha256 del texto normalizado).
+        -- Sin dimensión fija: admite modelos de distinto tamaño.
+        CREATE TABLE IF NOT EXISTS {self.cache_table} (
+            model TEXT NOT NULL,
+            text_hash TEXT NOT NULL,
+            embedding vector NOT NULL,
+            created_at TIMESTAMP DEFAULT now(),
+            last_used_at TIMESTAMP DEFAULT now(),
+            PRIMARY KEY (model, text_hash)
+        );
+
+        CREATE INDEX IF NOT EXISTS {self.cache_table}_last_used_idx
+        ON {self.cache_table} (last_used_at);
+
+        -- Cola durable de trabajos en segundo plano (ver app/jobs.py)
+        CREATE TABLE IF NOT EXISTS {self.jobs_table} (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            kind TEXT NOT NULL,
+            client_id UUID,
+            payload JSONB NOT NULL,
+            -- queued | running | succeeded | failed
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INT NOT NULL DEFAULT 0,
+            max_attempts INT NOT NULL DEFAULT 5,
+            run_after TIMESTAMP NOT NULL DEFAULT now(),
+            locked_by TEXT,
+            locked_at TIMESTAMP,
+            progress JSONB,
+            result JSONB,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT now(),
+            updated_at TIMESTAMP DEFAULT now(),
+            finished_at TIMESTAMP
+        );
+
+        CREATE INDEX IF NOT EXISTS {self.jobs_table}_pending_idx
+        ON {self.jobs_table} (run_after) WHERE status = 'queued';
+
+        CREATE INDEX IF NOT EXISTS {self.jobs_table}_running_idx
+        ON {self.jobs_table} (locked_at) WHERE status = 'running';
+
+        -- Estado del índice vectorial (bulk load en curso, última construcción)
+        CREATE TABLE IF NOT EXISTS {self.index_state_table} (
+            table_name TEXT PRIMARY KEY,
+            bulk_load BOOLEAN NOT NULL DEFAULT false,
+            bulk_load_started_at TIMESTAMP,
+            last_build_at TIMESTAMP,
+            last_build_seconds DOUBLE PRECISION,
+            last_build_params JSONB,
             updated_at TIMESTAMP DEFAULT now()
         );
+        """
+
+    @property
+    def _conflict_target(self) -> str:
+        return "(hash)" if self.layout == "none" else "(client_id, hash)"
 
-        CREATE INDEX IF NOT EXISTS {self.table_name}_embedding_idx
-        ON {self.table_name}
-        USING hnsw (embedding vector_cosine_ops);
+    def _partition_name(self, client_id: str) -> str:
+        return f"{self.table_name}_t_{uuid.UUID(str(client_id)).hex}"
 
-        CREATE INDEX IF NOT EXISTS {self.table_name}_client_idx
-        ON {self.table_name} (client_id);
+    def _ensure_partitions(self, client_ids: Iterable[str]) -> None:
         """
+        Layout tenant: crea la partición del cliente en su primera ingesta.
+        El DDL corre en su propia transacción corta para no retener el lock
+        del padre durante la escritura de los chunks.
+        """
+        if self.layout != "tenant":
+            return
+        missing = {c for c in client_ids if self._partition_name(c) not in self._known_partitions}
+        if not missing:
+            return
         with self._get_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(query)
-                conn.commit()
+                for client_id in missing:
+                    name = self._partition_name(client_id)
+                    # Serializa réplicas que crean la misma partición a la vez
+                    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (name,))
+                    cur.execute(
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {self.table_name} FOR VALUES IN (%s)",
+                        (str(client_id),),
+                    )
+                    conn.commit()
+                    self._known_partitions.add(name)
+
+    def _with_partitions(self, client_ids: Iterable[str], write: Callable[[], Any]) -> Any:
+        client_ids = list(client_ids)
+        self._ensure_partitions(client_ids)
+        try:
+            return write()
+        except errors.CheckViolation:
+            # "no partition of relation found": otra réplica eliminó la partición; se recrea una vez
+            if self.layout != "tenant":
+                raise
+            for client_id in client_ids:
+                self._known_partitions.discard(self._partition_name(client_id))
+            self._ensure_partitions(client_ids)
+            return write()
 
     def upsert_document(self, doc_data: dict, embedding: list):
         """
         Inserta o actualiza un documento semántico.
         La deduplicación se basa exclusivamente en el hash.
         """
-        query = f"""
+        self.upsert_documents([(doc_data, embedding)])
+
+    def upsert_documents(self, items: List[Tuple[dict, list]], page_size: int = 500) -> List[Dict[str, Any]]:
+        """
+        Inserta o actualiza un lote de chunks (de uno o varios documentos)
+        en una sola transacción mediante INSERT multi-fila ... ON CONFLICT.
+
+        Returns:
+            List[Dict]: un resultado por hash: {"hash", "action": "inserted" | "updated"}.
+        """
+        if not items:
+            return []
+
+        def write():
+            with self._get_connection() as conn:
+                with conn.cursor() as cur:
+                    results = self._upsert_rows(cur, items, page_size)
+                    conn.commit()
+            return results
+
+        return self._with_partitions((doc_data["client_id"] for doc_data, _ in items), write)
+
+    def _upsert_rows(self, cur, items: List[Tuple[dict, list]], page_size: int = 500) -> List[Dict[str, Any]]:
+        # ON CONFLICT no admite el mismo hash dos veces en una sentencia: gana el último
+        rows_by_hash: Dict[str, tuple] = {}
+        for doc_data, embedding in items:
+            rows_by_hash[doc_data["hash"]] = (
+                doc_data["content_id"],
+                doc_data["client_id"],
+                doc_data["source"],
+                doc_data.get("title"),
+                doc_data["body_content"],
+                Json(doc_data.get("metadata", {})),
+                doc_data["hash"],
+                embedding,
+            )
+
+        returned = execute_values(
+            cur,
+            self._upsert_query("VALUES %s"),
+            list(rows_by_hash.values()),
+            template="(%s, %s, %s, %s, %s, %s, %s, %s::vector)",
+            page_size=page_size,
+            fetch=True,
+        )
+        return [
+            {"hash": row_hash, "action": "inserted" if inserted else "updated"}
+            for row_hash, inserted in returned
+        ]
+
+    def _upsert_query(self, rows_sql: str) -> str:
+        """
+        INSERT ... ON CONFLICT de chunks; rows_sql es la fuente de filas
+        (VALUES %s con psycopg2, SELECT ... FROM unnest(...) con asyncpg).
+        """
+        return f"""
         INSERT INTO {self.table_name}
         (
             content_id,
@@ -79,65 +548,1319 @@ class VectorRepository:
             hash,
             embedding
         )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (hash) DO UPDATE SET
+        {rows_sql}
+        ON CONFLICT {self._conflict_target} DO UPDATE SET
             title = EXCLUDED.title,
             body_content = EXCLUDED.body_content,
             metadata = EXCLUDED.metadata,
             embedding = EXCLUDED.embedding,
+            updated_at = now()
+        RETURNING hash, (xmax = 0) AS inserted;
+        """
+
+    def get_document_hashes(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        """
+        Devuelve el último hash ingerido para cada par (client_id, content_id) conocido.
+        """
+        if not keys:
+            return {}
+        query = self._document_hashes_query()
+        client_ids = [client_id for client_id, _ in keys]
+        content_ids = [content_id for _, content_id in keys]
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (client_ids, content_ids))
+                rows = cur.fetchall()
+        # Las claves se devuelven tal como las envió el caller (idx es 1-based)
+        return {keys[idx - 1]: doc_hash for idx, doc_hash in rows}
+
+    def _document_hashes_query(self) -> str:
+        return f"""
+        SELECT k.idx, m.doc_hash
+        FROM unnest(%s::uuid[], %s::text[]) WITH ORDINALITY AS k(client_id, content_id, idx)
+        JOIN {self.manifest_table} m
+          ON m.client_id = k.client_id AND m.content_id = k.content_id;
+        """
+
+    def get_chunk_hashes(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Set[str]]:
+        """
+        Ids (hash) de los chunks almacenados para cada par (client_id, content_id).
+        """
+        if not keys:
+            return {}
+        query = self._chunk_hashes_query()
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, ([client_id for client_id, _ in keys], [content_id for _, content_id in keys]))
+                rows = cur.fetchall()
+        result: Dict[Tuple[str, str], Set[str]] = {}
+        for idx, chunk_hash in rows:
+            result.setdefault(keys[idx - 1], set()).add(chunk_hash)
+        return result
+
+    def _chunk_hashes_query(self) -> str:
+        return f"""
+        SELECT k.idx, t.hash
+        FROM unnest(%s::uuid[], %s::text[]) WITH ORDINALITY AS k(client_id, content_id, idx)
+        JOIN {self.table_name} t
+          ON t.client_id = k.client_id AND t.content_id = k.content_id;
+        """
+
+    def replace_documents(self, documents: List[Tuple[dict, List[Tuple[dict, Optional[list]]]]], page_size: int = 500) -> List[Dict[str, Any]]:
+        """
+        Reemplaza atómicamente el set de chunks de uno o varios documentos.
+
+        Por cada documento (manifest, rows): upsert de los chunks nuevos, borrado de los
+        chunks del documento que ya no forman parte del set y actualización del manifiesto.
+        Todo en una sola transacción.
+
+        Las filas con vector None son chunks ya almacenados con el mismo id (ids por contenido):
+        se conservan sin reescribir el embedding; solo se actualizan title/source/metadata
+        si cambiaron.
+
+        Args:
+            documents: lista de (manifest, rows); manifest = {"client_id", "content_id", "hash"}.
+
+        Returns:
+            List[Dict]: por documento: {"client_id", "content_id", "upserted", "inserted",
+            "kept", "refreshed", "deleted"}.
+
+        Raises:
+            ValueError: si un documento (client_id, content_id) aparece más de una vez.
+        """
+        if not documents:
+            return []
+        self._check_unique_documents(documents)
+
+        delete_query = self._stale_chunks_query()
+        manifest_query = self._manifest_upsert_query("VALUES %s")
+        refresh_query = self._refresh_chunks_query("VALUES %s")
+        new_rows = [row for _, rows in documents for row in rows if row[1] is not None]
+        kept_rows = [row for _, rows in documents for row in rows if row[1] is None]
+
+        def write():
+            summary = []
+            with self._get_connection() as conn:
+                with conn.cursor() as cur:
+                    upserted = {r["hash"]: r["action"] for r in self._upsert_rows(cur, new_rows, page_size)} if new_rows else {}
+                    refreshed = set()
+                    if kept_rows:
+                        returned = execute_values(
+                            cur,
+                            refresh_query,
+                            [self._refresh_values(doc_data) for doc_data, _ in kept_rows],
+                            template="(%s::uuid, %s, %s, %s, %s::jsonb)",
+                            page_size=page_size,
+                            fetch=True,
+                        )
+                        refreshed = {row_hash for (row_hash,) in returned}
+                    for manifest, rows in documents:
+                        hashes = [doc_data["hash"] for doc_data, _ in rows]
+                        cur.execute(delete_query, (manifest["client_id"], manifest["content_id"], hashes))
+                        summary.append({
+                            "client_id": manifest["client_id"],
+                            "content_id": manifest["content_id"],
+                            **self._replace_counts(rows, upserted, refreshed),
+                            "deleted": cur.rowcount,
+                        })
+                    execute_values(
+                        cur,
+                        manifest_query,
+                        [(m["client_id"], m["content_id"], m["hash"], len(rows)) for m, rows in documents],
+                        page_size=page_size,
+                    )
+                    conn.commit()
+            return summary
+
+        return self._with_partitions((m["client_id"] for m, _ in documents), write)
+
+    @staticmethod
+    def _check_unique_documents(documents: List[Tuple[dict, list]]) -> None:
+        # Un documento repetido haría que el upsert del manifiesto toque la misma fila dos veces
+        # (Postgres aborta toda la transacción) y que cada versión borre los chunks de la otra
+        seen: Set[Tuple[str, str]] = set()
+        for manifest, _ in documents:
+            key = (str(manifest["client_id"]), manifest["content_id"])
+            if key in seen:
+                raise ValueError(f"Document {key[1]} of client {key[0]} appears more than once in replace_documents")
+            seen.add(key)
+
+    @staticmethod
+    def _replace_counts(rows: List[Tuple[dict, Optional[list]]], upserted: Dict[str, str], refreshed: Set[str]) -> Dict[str, int]:
+        written = [doc_data["hash"] for doc_data, vector in rows if vector is not None]
+        kept = [doc_data["hash"] for doc_data, vector in rows if vector is None]
+        return {
+            "upserted": len(written),
+            "inserted": sum(1 for h in written if upserted.get(h) == "inserted"),
+            "kept": len(kept),
+            "refreshed": sum(1 for h in kept if h in refreshed),
+        }
+
+    @staticmethod
+    def _refresh_values(doc_data: dict) -> tuple:
+        return (
+            doc_data["client_id"],
+            doc_data["hash"],
+            doc_data["source"],
+            doc_data.get("title"),
+            Json(doc_data.get("metadata", {})),
+        )
+
+    def _refresh_chunks_query(self, rows_sql: str) -> str:
+        """
+        Actualiza los campos del documento en chunks conservados, solo donde difieren
+        (sin tocar el embedding ni reescribir filas idénticas).
+
+        metadata.chunk_index no cuenta como diferencia: una inserción al inicio del documento
+        desplaza la posición de todos los chunks siguientes y reescribirlos haría que el
+        volumen de escritura dependa del tamaño del documento y no del de la edición. El
+        índice guardado es el del momento en que la fila se escribió; la contigüidad se
+        resuelve con metadata.prev_chunk, que solo cambia junto a la edición.
+        """
+        return f"""
+        UPDATE {self.table_name} AS t SET
+            source = v.source,
+            title = v.title,
+            metadata = v.metadata,
+            updated_at = now()
+        FROM ({rows_sql}) AS v(client_id, hash, source, title, metadata)
+        WHERE t.client_id = v.client_id AND t.hash = v.hash
+          AND (t.source IS DISTINCT FROM v.source
+               OR t.title IS DISTINCT FROM v.title
+               OR t.metadata - 'chunk_index' IS DISTINCT FROM v.metadata - 'chunk_index')
+        RETURNING t.hash;
+        """
+
+    def _stale_chunks_query(self) -> str:
+        return f"""
+        DELETE FROM {self.table_name}
+        WHERE client_id = %s AND content_id = %s AND NOT (hash = ANY(%s));
+        """
+
+    def _manifest_upsert_query(self, rows_sql: str) -> str:
+        return f"""
+        INSERT INTO {self.manifest_table} (client_id, content_id, doc_hash, chunk_count)
+        {rows_sql}
+        ON CONFLICT (client_id, content_id) DO UPDATE SET
+            doc_hash = EXCLUDED.doc_hash,
+            chunk_count = EXCLUDED.chunk_count,
             updated_at = now();
         """
+
+    def get_cached_embeddings(self, model: str, text_hashes: List[str]) -> Dict[str, Any]:
+        """
+        Busca embeddings cacheados por (modelo, hash del texto).
+        Los hits refrescan last_used_at como máximo una vez por hora para no generar escrituras por lectura.
+        """
+        if not text_hashes:
+            return {}
+        query, touch = self._cached_embeddings_queries()
         with self._get_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    query,
-                    (
-                        doc_data["content_id"],
-                        doc_data["client_id"],
-                        doc_data["source"],
-                        doc_data.get("title"),
-                        doc_data["body_content"],
-                        Json(doc_data.get("metadata", {})),
-                        doc_data["hash"],
-                        embedding,
-                    ),
-                )
+                cur.execute(query, (model, text_hashes))
+                found = {text_hash: embedding for text_hash, embedding in cur.fetchall()}
+                if found:
+                    cur.execute(touch, (model, list(found)))
+                conn.commit()
+        return found
+
+    def _cached_embeddings_queries(self) -> Tuple[str, str]:
+        query = f"""
+        SELECT text_hash, embedding
+        FROM {self.cache_table}
+        WHERE model = %s AND text_hash = ANY(%s);
+        """
+        touch = f"""
+        UPDATE {self.cache_table} SET last_used_at = now()
+        WHERE model = %s AND text_hash = ANY(%s) AND last_used_at < now() - interval '1 hour';
+        """
+        return query, touch
+
+    def _cache_insert_query(self, rows_sql: str) -> str:
+        return f"""
+        INSERT INTO {self.cache_table} (model, text_hash, embedding)
+        {rows_sql}
+        ON CONFLICT (model, text_hash) DO NOTHING;
+        """
+
+    def put_cached_embeddings(self, model: str, items: List[Tuple[str, list]]) -> int:
+        """
+        Guarda embeddings en el cache. Si el hash ya existe se conserva el registro previo.
+        """
+        if not items:
+            return 0
+        query = self._cache_insert_query("VALUES %s")
+        rows = [(model, text_hash, embedding) for text_hash, embedding in dict(items).items()]
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, query, rows, template="(%s, %s, %s::vector)", page_size=500)
+                inserted = cur.rowcount
+                conn.commit()
+        return inserted
+
+    def evict_cached_embeddings(
+        self,
+        older_than_days: Optional[int] = None,
+        model: Optional[str] = None,
+        keep_model: Optional[str] = None,
+    ) -> int:
+        """
+        Elimina entradas del cache por antigüedad (sin uso en N días), por modelo,
+        o todas las de modelos distintos a `keep_model` (cambio de versión de modelo).
+        """
+        conditions, params = [], []
+        if older_than_days is not None:
+            conditions.append("last_used_at < now() - make_interval(days => %s)")
+            params.append(older_than_days)
+        # La clave guarda "<modelo>:<tipo>" (document/query); se compara por el modelo base
+        if model is not None:
+            conditions.append("split_part(model, ':', 1) = %s")
+            params.append(model)
+        if keep_model is not None:
+            conditions.append("split_part(model, ':', 1) <> %s")
+            params.append(keep_model)
+        if not conditions:
+            raise ValueError("At least one eviction criterion is required")
+
+        query = f"DELETE FROM {self.cache_table} WHERE " + " AND ".join(conditions)
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                deleted_count = cur.rowcount
+                conn.commit()
+                return deleted_count
+
+    def embedding_cache_summary(self) -> List[Dict[str, Any]]:
+        """
+        Entradas del cache por modelo.
+        """
+        query = f"""
+        SELECT model, count(*) AS entries, min(created_at) AS oldest, max(last_used_at) AS last_used
+        FROM {self.cache_table}
+        GROUP BY model
+        ORDER BY model;
+        """
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(query)
+                return cur.fetchall()
+
+    def enqueue_job(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        client_id: Optional[str] = None,
+        max_attempts: int = 5,
+    ) -> str:
+        """
+        Encola un trabajo en segundo plano. Devuelve su id.
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(self._enqueue_job_query(), (kind, client_id, Json(payload), max_attempts))
+                job_id = cur.fetchone()[0]
+                conn.commit()
+        return job_id
+
+    def claim_job(self, worker_id: str, lock_timeout: float = 600.0) -> Optional[Dict[str, Any]]:
+        """
+        Toma el próximo trabajo disponible con FOR UPDATE SKIP LOCKED: varios workers
+        (y réplicas) consumen la cola sin bloquearse entre sí. Los trabajos 'running'
+        cuyo lock superó lock_timeout (worker caído) se vuelven a tomar.
+        """
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(self._claim_job_query(), (worker_id, lock_timeout))
+                job = cur.fetchone()
+                conn.commit()
+        return job
+
+    def update_job_progress(self, job_id: str, worker_id: str, progress: Dict[str, Any]) -> bool:
+        """
+        Registra el progreso y renueva el lock del trabajo. False si worker_id ya no lo
+        tiene tomado (el lock venció y otro worker lo reclamó).
+        """
+        return self._update_job(self._job_progress_query(), (Json(progress), job_id, worker_id))
+
+    def heartbeat_job(self, job_id: str, worker_id: str) -> bool:
+        """
+        Renueva el lock de un trabajo en curso para que no se vuelva a tomar por
+        lock_timeout mientras el worker sigue vivo. False si el lock se perdió.
+        """
+        return self._update_job(self._job_heartbeat_query(), (job_id, worker_id))
+
+    def complete_job(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        return self._update_job(self._complete_job_query(), (Json(result), job_id, worker_id))
+
+    def fail_job(self, job_id: str, worker_id: str, error: str, retry_in: Optional[float] = None) -> bool:
+        """
+        Registra un fallo. Con retry_in el trabajo vuelve a la cola tras ese delay (segundos);
+        sin él queda en estado 'failed'. False si worker_id ya no tenía el lock.
+        """
+        query, params = self._fail_job_query(job_id, worker_id, error, retry_in)
+        return self._update_job(query, params)
+
+    def release_job(self, job_id: str, worker_id: str) -> bool:
+        """
+        Devuelve un trabajo en curso a la cola sin contarlo como intento (apagado del
+        worker, no un fallo): un trabajo largo no agota max_attempts por despliegues.
+        """
+        return self._update_job(self._release_job_query(), (job_id, worker_id))
+
+    def _update_job(self, query: str, params: tuple) -> bool:
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                updated = cur.rowcount
                 conn.commit()
+        return updated > 0
 
-    def search_similar(self, client_id: str, query_vector: List[float], top_k: int = 5):
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(self._get_job_query(), (job_id,))
+                return cur.fetchone()
+
+    # SQL de la cola semantic_jobs (compartido con AsyncVectorRepository)
+
+    def _enqueue_job_query(self) -> str:
+        return f"""
+        INSERT INTO {self.jobs_table} (kind, client_id, payload, max_attempts)
+        VALUES (%s, %s, %s, %s)
+        RETURNING id::text;
+        """
+
+    def _claim_job_query(self) -> str:
+        return f"""
+        UPDATE {self.jobs_table} j SET
+            status = 'running',
+            attempts = j.attempts + 1,
+            locked_by = %s,
+            locked_at = now(),
+            updated_at = now()
+        WHERE j.id = (
+            SELECT id FROM {self.jobs_table}
+            WHERE (status = 'queued' AND run_after <= now())
+               OR (status = 'running' AND locked_at < now() - %s * interval '1 second')
+            ORDER BY run_after
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING j.id::text AS id, j.kind, j.client_id::text AS client_id, j.payload, j.attempts, j.max_attempts;
+        """
+
+    def _job_progress_query(self) -> str:
+        return f"""
+        UPDATE {self.jobs_table} SET progress = %s, locked_at = now(), updated_at = now()
+        WHERE id = %s AND status = 'running' AND locked_by = %s;
+        """
+
+    def _job_heartbeat_query(self) -> str:
+        return f"""
+        UPDATE {self.jobs_table} SET locked_at = now()
+        WHERE id = %s AND status = 'running' AND locked_by = %s;
+        """
+
+    def _complete_job_query(self) -> str:
+        return f"""
+        UPDATE {self.jobs_table} SET
+            status = 'succeeded', result = %s, last_error = NULL,
+            locked_by = NULL, locked_at = NULL, updated_at = now(), finished_at = now()
+        WHERE id = %s AND status = 'running' AND locked_by = %s;
+        """
+
+    def _fail_job_query(self, job_id: str, worker_id: str, error: str, retry_in: Optional[float]) -> Tuple[str, tuple]:
+        if retry_in is None:
+            query = f"""
+            UPDATE {self.jobs_table} SET
+                status = 'failed', last_error = %s,
+                locked_by = NULL, locked_at = NULL, updated_at = now(), finished_at = now()
+            WHERE id = %s AND status = 'running' AND locked_by = %s;
+            """
+            return query, (error, job_id, worker_id)
+        query = f"""
+        UPDATE {self.jobs_table} SET
+            status = 'queued', last_error = %s, run_after = now() + %s * interval '1 second',
+            locked_by = NULL, locked_at = NULL, updated_at = now()
+        WHERE id = %s AND status = 'running' AND locked_by = %s;
+        """
+        return query, (error, retry_in, job_id, worker_id)
+
+    def _release_job_query(self) -> str:
+        # claim_job ya sumó el intento: se descuenta
+        return f"""
+        UPDATE {self.jobs_table} SET
+            status = 'queued', attempts = greatest(attempts - 1, 0), run_after = now(),
+            locked_by = NULL, locked_at = NULL, updated_at = now()
+        WHERE id = %s AND status = 'running' AND locked_by = %s;
+        """
+
+    def _get_job_query(self) -> str:
+        return f"""
+        SELECT id::text AS id, kind, client_id::text AS client_id, status, attempts, max_attempts,
+               run_after, progress, result, last_error, created_at, updated_at, finished_at
+        FROM {self.jobs_table}
+        WHERE id = %s;
+        """
+
+    def search_similar(
+        self,
+        client_id: str,
+        query_vector: List[float],
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+        with_embeddings: bool = False,
+    ):
         """
         Busca los documentos más similares para un cliente específico.
-        Utiliza distancia de coseno (operator <=>).
+        Utiliza distancia de coseno (operator <=>) ordenando por la expresión
+        indexada para que el planner use el índice HNSW. En modos compactos
+        (VECTOR_STORAGE_MODE) el índice genera top_k * VECTOR_RERANK_FACTOR
+        candidatos que se re-rankean con el vector completo.
+
+        Args:
+            filters: opcional {"category", "source", "metadata"}; se aplican en SQL.
+            ef_search: opcional; si no, el del tenant o HNSW_EF_SEARCH (ver resolve_ef_search).
+            with_embeddings: incluye la columna embedding (post-proceso MMR, app/diversify.py).
         """
+        query, params = self._similarity_query(client_id, query_vector, top_k, filters, with_embeddings)
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                self._set_candidate_ef_search(cur, top_k, self.resolve_ef_search(client_id, ef_search))
+                if self._iterative_scan:
+                    # pgvector >= 0.8: el índice sigue escaneando hasta reunir top_k filas filtradas
+                    cur.execute("SET LOCAL hnsw.iterative_scan = relaxed_order")
+                    cur.execute(query, params)
+                    return cur.fetchall()
+
+                cur.execute(query, params)
+                rows = cur.fetchall()
+                if len(rows) < top_k and self._short_result_can_grow(cur, client_id, filters, top_k, len(rows)):
+                    # Sin iterative scan, los filtros se aplican sobre ef_search candidatos:
+                    # se reintenta una vez con el máximo de candidatos del índice.
+                    cur.execute("SET LOCAL hnsw.ef_search = %s", (self.max_ef_search,))
+                    cur.execute(query, params)
+                    rows = cur.fetchall()
+                return rows
+
+    def search_similar_batch(self, queries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Resuelve varias búsquedas en un solo round trip: un LATERAL join por cada
+        fila de un VALUES con (vector, client_id, top_k, filtros).
+
+        Args:
+            queries: [{"client_id", "query_vector", "top_k", "filters", "ef_search"}].
+            ef_search es por transacción: se usa el mayor de las queries del lote.
+
+        Returns:
+            List[List[Dict]]: resultados por query, en el orden de entrada.
+        """
+        if not queries:
+            return []
+
+        values = []
+        for ordinal, q in enumerate(queries):
+            filters = q.get("filters") or {}
+            values.append((
+                ordinal,
+                q["query_vector"],
+                q["client_id"],
+                q.get("top_k", 5),
+                filters.get("category"),
+                filters.get("source"),
+                Json(filters["metadata"]) if filters.get("metadata") else None,
+            ))
+
+        query = self._batch_query("(VALUES %s) AS q(ord, embedding, client_id, top_k, category, source, meta)")
+        template = "(%s::int, %s::vector, %s::uuid, %s::int, %s::text, %s::text, %s::jsonb)"
+
+        def run(cur) -> List[List[Dict[str, Any]]]:
+            rows = execute_values(cur, query, values, template=template, page_size=len(values), fetch=True)
+            grouped: List[List[Dict[str, Any]]] = [[] for _ in queries]
+            for row in rows:
+                grouped[row.pop("ord")].append(row)
+            return grouped
+
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                self._set_candidate_ef_search(cur, *self._batch_ef_search(queries))
+                if self._iterative_scan:
+                    cur.execute("SET LOCAL hnsw.iterative_scan = relaxed_order")
+                    return run(cur)
+
+                grouped = run(cur)
+                if any(
+                    len(rows) < q.get("top_k", 5)
+                    and self._short_result_can_grow(cur, q["client_id"], q.get("filters"), q.get("top_k", 5), len(rows))
+                    for rows, q in zip(grouped, queries)
+                ):
+                    cur.execute("SET LOCAL hnsw.ef_search = %s", (self.max_ef_search,))
+                    grouped = run(cur)
+                return grouped
+
+    def _short_result_can_grow(self, cur, client_id: str, filters: Optional[Dict[str, Any]], top_k: int, found: int) -> bool:
+        """
+        Sin iterative scan, un resultado con menos de top_k filas puede deberse a que los
+        candidatos del índice (ef_search) no alcanzaron o a que el tenant no tiene más filas
+        que cumplan los filtros (lo normal en tenants chicos y filtros selectivos). Solo en
+        el primer caso vale la pena repetir con max_ef_search.
+        """
+        query, params = self._matching_rows_query(client_id, filters, top_k)
+        cur.execute(query, params)
+        row = cur.fetchone()
+        return (row["matching"] if isinstance(row, dict) else row[0]) > found
+
+    def _matching_rows_query(self, client_id: str, filters: Optional[Dict[str, Any]], limit: int) -> Tuple[str, list]:
+        # Conteo acotado a limit filas, sin ORDER BY: no pasa por el índice vectorial
+        filter_sql, filter_params = self._filter_clause(filters)
         query = f"""
-        SELECT 
-            content_id, 
-            title, 
-            body_content, 
-            metadata, 
-            1 - (embedding <=> %s::vector) AS similarity
-        FROM {self.table_name}
-        WHERE client_id = %s
-        ORDER BY similarity DESC
-        LIMIT %s;
+        SELECT count(*) AS matching
+        FROM (SELECT 1 FROM {self.table_name} WHERE client_id = %s{filter_sql} LIMIT %s) matching_rows;
+        """
+        return query, [client_id, *filter_params, limit]
+
+    def _batch_ef_search(self, queries: List[Dict[str, Any]]) -> Tuple[int, Optional[int]]:
+        top_k = max(q.get("top_k", 5) for q in queries)
+        requested = [self.resolve_ef_search(q["client_id"], q.get("ef_search")) for q in queries]
+        return top_k, max((ef for ef in requested if ef), default=None)
+
+    def _batch_query(self, queries_sql: str) -> str:
+        """
+        Búsqueda por lotes; queries_sql expone q(ord, embedding, client_id, top_k, category, source, meta).
         """
+        # Candidatos por el índice del modo actual; re-ranking exacto sobre el vector completo
+        return f"""
+        SELECT q.ord, r.content_id, r.title, r.body_content, r.metadata, r.hash, 1 - r.distance AS similarity
+        FROM {queries_sql}
+        CROSS JOIN LATERAL (
+            SELECT c.content_id, c.title, c.body_content, c.metadata, c.hash, c.embedding <=> q.embedding AS distance
+            FROM (
+                SELECT s.content_id, s.title, s.body_content, s.metadata, s.hash, s.embedding
+                FROM {self.table_name} s
+                WHERE s.client_id = q.client_id
+                  AND (q.category IS NULL OR s.metadata->>'category' = q.category)
+                  AND (q.source IS NULL OR s.source = q.source)
+                  AND (q.meta IS NULL OR s.metadata @> q.meta)
+                ORDER BY {self._candidate_distance("s.embedding", "q.embedding")}
+                LIMIT q.top_k * {self._candidate_limit(1)}
+            ) c
+            ORDER BY c.embedding <=> q.embedding
+            LIMIT q.top_k
+        ) r
+        ORDER BY q.ord, r.distance;
+        """
+
+    def explain_search(
+        self,
+        client_id: str,
+        query_vector: List[float],
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+    ) -> str:
+        """
+        Plan de ejecución de la búsqueda de similitud (diagnóstico / tests).
+        """
+        query, params = self._similarity_query(client_id, query_vector, top_k, filters)
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                self._set_candidate_ef_search(cur, top_k, self.resolve_ef_search(client_id, ef_search))
+                if self._iterative_scan:
+                    cur.execute("SET LOCAL hnsw.iterative_scan = relaxed_order")
+                cur.execute("EXPLAIN " + query, params)
+                return "\n".join(row[0] for row in cur.fetchall())
+
+    def search_lexical(
+        self,
+        client_id: str,
+        query_text: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Búsqueda full-text sobre search_tsv (índice GIN), sin embeddings.
+        Pensada para códigos, nombres y emails donde la similitud coseno es débil.
+
+        Returns:
+            List[Dict]: mismas columnas que search_similar; similarity es el
+            ts_rank_cd normalizado a [0, 1).
+        """
+        query, params = self._lexical_query(client_id, query_text, top_k, filters)
         with self._get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query, (query_vector, client_id, top_k))
+                cur.execute(query, params)
                 return cur.fetchall()
 
+    def get_chunks_by_hash(
+        self, client_id: str, hashes: List[str], with_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Filas de los chunks indicados (mismas columnas que search_similar, sin similarity),
+        en cualquier orden. Los hashes que ya no existen se omiten.
+        Usado por el cache de resultados de búsqueda (app/result_cache.py).
+        """
+        if not hashes:
+            return []
+        query, params = self._chunks_by_hash_query(client_id, hashes, with_embeddings)
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(query, params)
+                return cur.fetchall()
+
+    def _chunks_by_hash_query(self, client_id: str, hashes: List[str], with_embeddings: bool) -> Tuple[str, list]:
+        embedding_column = ", embedding" if with_embeddings else ""
+        query = f"""
+        SELECT content_id, title, body_content, metadata, hash{embedding_column}
+        FROM {self.table_name}
+        WHERE client_id = %s AND hash = ANY(%s::text[])
+        """
+        return query, [client_id, list(hashes)]
+
+    def _lexical_query(
+        self,
+        client_id: str,
+        query_text: str,
+        top_k: int,
+        filters: Optional[Dict[str, Any]],
+    ) -> Tuple[str, list]:
+        filter_sql, filter_params = self._filter_clause(filters)
+        # websearch_to_tsquery tolera input libre (comillas, OR, -exclusión) sin errores de sintaxis;
+        # normalización 32 de ts_rank_cd: rank / (rank + 1)
+        query = f"""
+        SELECT content_id, title, body_content, metadata, hash,
+               ts_rank_cd(search_tsv, q.tsq, 32) AS similarity
+        FROM {self.table_name}, websearch_to_tsquery('{self.text_search_config}', %s) AS q(tsq)
+        WHERE client_id = %s{filter_sql}
+          AND search_tsv @@ q.tsq
+        ORDER BY similarity DESC
+        LIMIT %s;
+        """
+        params = [query_text, client_id, *filter_params, top_k]
+        return query, params
+
+    def _similarity_query(
+        self,
+        client_id: str,
+        query_vector: List[float],
+        top_k: int,
+        filters: Optional[Dict[str, Any]],
+        with_embeddings: bool = False,
+    ) -> Tuple[str, list]:
+        filter_sql, filter_params = self._filter_clause(filters)
+        embedding_column = ", embedding" if with_embeddings else ""
+        if self.storage_mode != "full":
+            # Candidatos por el índice compacto, re-ranking exacto con el vector float32
+            query = f"""
+            SELECT content_id, title, body_content, metadata, hash{embedding_column}, 1 - (embedding <=> %s::vector) AS similarity
+            FROM (
+                SELECT content_id, title, body_content, metadata, hash, embedding
+                FROM {self.table_name}
+                WHERE client_id = %s{filter_sql}
+                ORDER BY {self._candidate_distance("embedding", "%s::vector")}
+                LIMIT %s
+            ) candidates
+            ORDER BY embedding <=> %s::vector
+            LIMIT %s;
+            """
+            params = [query_vector, client_id, *filter_params, query_vector, self._candidate_limit(top_k), query_vector, top_k]
+            return query, params
+
+        # El ORDER BY interno usa la expresión indexada; el externo reordena
+        # (iterative scan en modo relaxed_order puede devolver filas levemente desordenadas).
+        query = f"""
+        SELECT content_id, title, body_content, metadata, hash{embedding_column}, 1 - distance AS similarity
+        FROM (
+            SELECT content_id, title, body_content, metadata, hash{embedding_column}, embedding <=> %s::vector AS distance
+            FROM {self.table_name}
+            WHERE client_id = %s{filter_sql}
+            ORDER BY embedding <=> %s::vector
+            LIMIT %s
+        ) candidates
+        ORDER BY distance;
+        """
+        params = [query_vector, client_id, *filter_params, query_vector, top_k]
+        return query, params
+
+    @staticmethod
+    def _filter_clause(filters: Optional[Dict[str, Any]]) -> Tuple[str, list]:
+        """
+        Traduce los filtros de rag_query.json a condiciones SQL parametrizadas.
+        """
+        if not filters:
+            return "", []
+        clauses, params = [], []
+        if filters.get("category"):
+            clauses.append("metadata->>'category' = %s")
+            params.append(filters["category"])
+        if filters.get("source"):
+            clauses.append("source = %s")
+            params.append(filters["source"])
+        if filters.get("metadata"):
+            clauses.append("metadata @> %s::jsonb")
+            params.append(Json(filters["metadata"]))
+        return "".join(f" AND {clause}" for clause in clauses), params
+
     def delete_client_data(self, client_id: str) -> int:
         """
         Elimina todos los registros de conocimiento para un cliente específico.
         """
+        if self.layout == "tenant":
+            return self._drop_tenant_partition(client_id)
         query = f"DELETE FROM {self.table_name} WHERE client_id = %s"
         with self._get_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(query, (client_id,))
                 deleted_count = cur.rowcount
+                cur.execute(f"DELETE FROM {self.manifest_table} WHERE client_id = %s", (client_id,))
+                conn.commit()
+                return deleted_count
+
+    def _drop_tenant_partition(self, client_id: str) -> int:
+        """
+        Layout tenant: borrar un cliente es desacoplar y eliminar su partición
+        (sin DELETE fila a fila ni tuplas muertas en el HNSW de otros tenants).
+        """
+        name = self._partition_name(client_id)
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regclass(%s)", (name,))
+                exists = cur.fetchone()[0] is not None
+                deleted_count = 0
+                if exists:
+                    cur.execute(f"SELECT count(*) FROM {name}")
+                    deleted_count = cur.fetchone()[0]
+                cur.execute(f"DELETE FROM {self.manifest_table} WHERE client_id = %s", (client_id,))
+                conn.commit()
+
+                if exists:
+                    conn.autocommit = True
+                    try:
+                        try:
+                            # PG14+: no bloquea las búsquedas de otros tenants
+                            cur.execute(f"ALTER TABLE {self.table_name} DETACH PARTITION {name} CONCURRENTLY")
+                        except (errors.SyntaxError, errors.FeatureNotSupported):
+                            logger.info(f"DETACH CONCURRENTLY not available, dropping {name} directly")
+                        cur.execute(f"DROP TABLE IF EXISTS {name}")
+                    finally:
+                        conn.autocommit = False
+        self._known_partitions.discard(name)
+        return deleted_count
+
+    def _batch_delete_query(self, with_document: bool) -> str:
+        # Lote acotado por la PK (id, o (client_id, id) en tablas particionadas)
+        document = " AND content_id = %s" if with_document else ""
+        return f"""
+        DELETE FROM {self.table_name}
+        WHERE client_id = %s AND id IN (
+            SELECT id FROM {self.table_name} WHERE client_id = %s{document} LIMIT %s
+        )
+        """
+
+    def delete_chunks_batch(
+        self, client_id: str, content_id: Optional[str] = None, batch_size: int = 1000, with_manifest: bool = False
+    ) -> int:
+        """
+        Borra a lo sumo batch_size chunks del cliente (o de un documento) en una
+        transacción corta: locks, WAL y tuplas muertas del HNSW se reparten en lotes
+        en lugar de un único DELETE que degrada la búsqueda de los demás tenants.
+
+        Con with_manifest, el lote final (menos de batch_size filas) borra también el
+        manifiesto en la misma transacción: una re-ingesta que escribió manifiesto y
+        chunks durante el borrado no queda con manifiesto y sin chunks ('unchanged' para
+        siempre).
+
+        Returns:
+            Filas borradas (menos de batch_size: no queda nada por borrar).
+        """
+        params = [client_id, client_id] + ([content_id] if content_id else []) + [batch_size]
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(self._batch_delete_query(content_id is not None), params)
+                deleted_count = cur.rowcount
+                if with_manifest and deleted_count < batch_size:
+                    cur.execute(self._manifest_delete_query(content_id is not None), [client_id] + ([content_id] if content_id else []))
                 conn.commit()
                 return deleted_count
 
+    def count_chunks(self, client_id: str, content_id: Optional[str] = None) -> int:
+        query = f"SELECT count(*) FROM {self.table_name} WHERE client_id = %s"
+        params = [client_id]
+        if content_id:
+            query += " AND content_id = %s"
+            params.append(content_id)
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.fetchone()[0]
+
+    def delete_manifest(self, client_id: str, content_id: Optional[str] = None) -> int:
+        """
+        Olvida el hash ingerido del cliente (o de un documento): una re-ingesta
+        durante el borrado en segundo plano no responde 'unchanged'.
+        """
+        params = [client_id] + ([content_id] if content_id else [])
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(self._manifest_delete_query(content_id is not None), params)
+                deleted_count = cur.rowcount
+                conn.commit()
+                return deleted_count
+
+    def _manifest_delete_query(self, with_document: bool) -> str:
+        document = " AND content_id = %s" if with_document else ""
+        return f"DELETE FROM {self.manifest_table} WHERE client_id = %s{document}"
+
+    def chunk_relation(self, client_id: str) -> Optional[str]:
+        """
+        Tabla física que guarda los chunks del cliente (su partición en layouts
+        particionados), para acotar el VACUUM posterior al borrado.
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(self._chunk_relation_query(), (client_id,))
+                row = cur.fetchone()
+                return row[0] if row else None
+
+    def _chunk_relation_query(self) -> str:
+        return f"SELECT tableoid::regclass::text FROM {self.table_name} WHERE client_id = %s LIMIT 1"
+
+    def vacuum_items(self, relation: Optional[str] = None) -> Dict[str, Any]:
+        """
+        VACUUM (ANALYZE) tras un borrado masivo: recupera las tuplas muertas de la tabla
+        y limpia los nodos borrados del grafo HNSW. relation acota a una partición.
+        """
+        relation = relation or self.table_name
+        started = time.monotonic()
+        with self._maintenance_cursor() as cur:
+            # VACUUM no puede correr dentro de una transacción
+            cur.execute(f"VACUUM (ANALYZE) {relation}")
+        return {"relation": relation, "seconds": round(time.monotonic() - started, 3)}
+
+    def iter_tenant_export(self, client_id: str, batch_size: int = 2000) -> Iterator[Any]:
+        """
+        Lectura de los chunks de un cliente para app/transfer.py, en un único snapshot
+        (REPEATABLE READ): primero {"count", "documents"} (manifiesto) y luego lotes de
+        filas con su embedding, leídas con un cursor de servidor (memoria acotada).
+        """
+        with self._get_connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                    cur.execute(f"SELECT count(*) FROM {self.table_name} WHERE client_id = %s", (client_id,))
+                    count = cur.fetchone()[0]
+                    cur.execute(
+                        f"SELECT content_id, doc_hash, chunk_count FROM {self.manifest_table} "
+                        f"WHERE client_id = %s ORDER BY content_id",
+                        (client_id,),
+                    )
+                    documents = [
+                        {"content_id": content_id, "doc_hash": doc_hash, "chunk_count": chunk_count}
+                        for content_id, doc_hash, chunk_count in cur.fetchall()
+                    ]
+                yield {"count": count, "documents": documents}
+
+                with conn.cursor(name=f"export_{uuid.uuid4().hex}", cursor_factory=RealDictCursor) as cur:
+                    cur.itersize = batch_size
+                    cur.execute(
+                        f"SELECT content_id, source, title, body_content, metadata, hash, embedding "
+                        f"FROM {self.table_name} WHERE client_id = %s",
+                        (client_id,),
+                    )
+                    while True:
+                        rows = cur.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        yield rows
+            finally:
+                conn.rollback()
+
+    def import_tenant(
+        self, client_id: str, copy_source: Any, documents: List[Dict[str, Any]], mode: str = "replace"
+    ) -> Dict[str, Any]:
+        """
+        Carga chunks ya embebidos con COPY (FORMAT binary); copy_source es un archivo con
+        el stream de COPY de app/transfer.py (columnas transfer.COPY_COLUMNS).
+
+        - replace: borra los chunks y el manifiesto del cliente y copia en la misma
+          transacción (las búsquedas ven los datos anteriores hasta el commit).
+        - merge: copia a una tabla temporal e inserta solo los hashes que no existen.
+        """
+        from app.transfer import COPY_COLUMNS
+
+        columns = ", ".join(COPY_COLUMNS)
+        self._ensure_partitions([client_id])
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                replaced = 0
+                if mode == "replace":
+                    cur.execute(f"DELETE FROM {self.table_name} WHERE client_id = %s", (client_id,))
+                    replaced = cur.rowcount
+                    cur.execute(f"DELETE FROM {self.manifest_table} WHERE client_id = %s", (client_id,))
+                    cur.copy_expert(f"COPY {self.table_name} ({columns}) FROM STDIN WITH (FORMAT binary)", copy_source)
+                    imported = cur.rowcount
+                else:
+                    staging = f"{self.table_name}_import_{uuid.uuid4().hex[:8]}"
+                    cur.execute(f"CREATE TEMP TABLE {staging} (LIKE {self.table_name} INCLUDING DEFAULTS) ON COMMIT DROP")
+                    cur.copy_expert(f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT binary)", copy_source)
+                    cur.execute(
+                        f"INSERT INTO {self.table_name} ({columns}) SELECT {columns} FROM {staging} "
+                        f"ON CONFLICT {self._conflict_target} DO NOTHING"
+                    )
+                    imported = cur.rowcount
+                if documents:
+                    execute_values(
+                        cur,
+                        self._manifest_upsert_query("VALUES %s"),
+                        [(client_id, d["content_id"], d["doc_hash"], d["chunk_count"]) for d in documents],
+                    )
+                conn.commit()
+        return {"chunks_imported": imported, "chunks_replaced": replaced, "documents": len(documents)}
+
+    def migrate_layout(self, target: str) -> Dict[str, Any]:
+        """
+        Convierte semantic_items a otro layout copiando los datos a una tabla nueva.
+        La tabla anterior queda renombrada como respaldo (<tabla>_legacy_<ts>) para
+        eliminarla manualmente. Operación offline: ejecutar en ventana de mantenimiento.
+        """
+        if target not in LAYOUTS:
+            raise ValueError(f"target must be one of {LAYOUTS}")
+        if target == self.layout:
+            return {"status": "unchanged", "layout": target}
+
+        legacy = f"{self.table_name}_legacy_{int(time.time())}"
+        columns = "id, content_id, client_id, source, title, body_content, metadata, hash, embedding, created_at, updated_at"
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"ALTER TABLE {self.table_name} RENAME TO {legacy}")
+                # Los nombres de índices/constraints son globales al schema
+                cur.execute(
+                    """
+                    SELECT c.relname FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE i.indrelid = to_regclass(%s)
+                    """,
+                    (legacy,),
+                )
+                for (index_name,) in cur.fetchall():
+                    cur.execute(f"ALTER INDEX {index_name} RENAME TO {legacy}_{index_name[len(self.table_name) + 1:]}")
+
+                cur.execute(self._items_ddl(target))
+                if target == "hash":
+                    for remainder in range(self.hash_partitions):
+                        cur.execute(
+                            f"CREATE TABLE {self.table_name}_h{remainder} PARTITION OF {self.table_name} "
+                            f"FOR VALUES WITH (MODULUS {self.hash_partitions}, REMAINDER {remainder})"
+                        )
+                elif target == "tenant":
+                    cur.execute(f"SELECT DISTINCT client_id::text FROM {legacy}")
+                    for (client_id,) in cur.fetchall():
+                        cur.execute(
+                            f"CREATE TABLE {self._partition_name(client_id)} PARTITION OF {self.table_name} "
+                            f"FOR VALUES IN (%s)",
+                            (client_id,),
+                        )
+                cur.execute(f"INSERT INTO {self.table_name} ({columns}) SELECT {columns} FROM {legacy}")
+                copied = cur.rowcount
+                conn.commit()
+
+        previous, self.layout = self.layout, target
+        self._known_partitions.clear()
+        logger.info(f"Migrated {self.table_name} from '{previous}' to '{target}' ({copied} rows); backup in {legacy}")
+        return {"status": "migrated", "from": previous, "layout": target, "rows": copied, "legacy_table": legacy}
+
+    def migrate_storage(self, target: str) -> Dict[str, Any]:
+        """
+        Cambia el índice HNSW al modo de almacenamiento indicado sin reescribir filas:
+        los índices compactos son expresiones sobre la columna embedding existente.
+        El índice nuevo se construye con CREATE INDEX CONCURRENTLY (las búsquedas e
+        ingestas siguen funcionando) y recién después se eliminan los de otros modos.
+        Tras migrar, fijar VECTOR_STORAGE_MODE=<target> en todas las réplicas.
+        """
+        if target not in STORAGE_MODES:
+            raise ValueError(f"target must be one of {STORAGE_MODES}")
+
+        with self._maintenance_cursor() as cur:
+            if not self._try_maintenance_lock(cur):
+                raise RuntimeError("Another vector index operation is running")
+            try:
+                index_name = self._build_vector_index(cur, target)
+                dropped = self._drop_vector_indexes(cur, exclude=target)
+            finally:
+                self._release_maintenance_lock(cur)
+
+        previous, self.storage_mode = self.storage_mode, target
+        logger.info(f"Migrated {self.table_name} vector index from '{previous}' to '{target}' (dropped {dropped})")
+        return {"status": "migrated", "from": previous, "storage_mode": target, "index": index_name, "dropped": dropped}
+
+    # --- Ciclo de vida del índice HNSW ---
+
+    def begin_bulk_load(self) -> Dict[str, Any]:
+        """
+        Modo bulk load: elimina el índice HNSW para que las cargas masivas no paguen la
+        inserción en el grafo fila por fila. Hasta rebuild_vector_index() las búsquedas
+        vectoriales hacen scan secuencial (exactas, más lentas). El estado se persiste:
+        el índice no se vuelve a crear de forma bloqueante al migrar el esquema.
+        """
+        with self._maintenance_cursor() as cur:
+            if not self._try_maintenance_lock(cur):
+                raise RuntimeError("Another vector index operation is running")
+            try:
+                # Primero el estado: otra réplica que arranque ahora no recrea el índice
+                cur.execute(
+                    f"""
+                    INSERT INTO {self.index_state_table} (table_name, bulk_load, bulk_load_started_at)
+                    VALUES (%s, true, now())
+                    ON CONFLICT (table_name) DO UPDATE SET
+                        bulk_load = true,
+                        bulk_load_started_at = coalesce({self.index_state_table}.bulk_load_started_at, now()),
+                        updated_at = now()
+                    """,
+                    (self.table_name,),
+                )
+                dropped = self._drop_vector_indexes(cur)
+            finally:
+                self._release_maintenance_lock(cur)
+        logger.info(f"Bulk load mode enabled on {self.table_name} (dropped {dropped})")
+        return {"status": "bulk_load", "table": self.table_name, "dropped": dropped}
+
+    def rebuild_vector_index(self) -> Dict[str, Any]:
+        """
+        Construye el índice HNSW del modo actual con HNSW_M / HNSW_EF_CONSTRUCTION sin
+        bloquear búsquedas ni ingestas, y cierra un bulk load en curso. Si ya hay un índice
+        (ej: cambio de parámetros), el nuevo se construye al lado y lo reemplaza al terminar.
+        """
+        started = time.monotonic()
+        params = {"m": self.hnsw_m, "ef_construction": self.hnsw_ef_construction}
+        with self._maintenance_cursor() as cur:
+            if not self._try_maintenance_lock(cur):
+                # Otro worker / réplica ya está construyendo
+                return {"status": "already_running", "table": self.table_name}
+            try:
+                index_name = self._index_name(self.storage_mode)
+                cur.execute("SELECT to_regclass(%s)", (index_name,))
+                exists = cur.fetchone()[0] is not None
+                built = self._build_vector_index(cur, self.storage_mode, rebuild=exists)
+                if exists:
+                    self._swap_vector_index(cur, built, index_name)
+                seconds = time.monotonic() - started
+                cur.execute(
+                    f"""
+                    INSERT INTO {self.index_state_table}
+                        (table_name, bulk_load, last_build_at, last_build_seconds, last_build_params)
+                    VALUES (%s, false, now(), %s, %s)
+                    ON CONFLICT (table_name) DO UPDATE SET
+                        bulk_load = false,
+                        bulk_load_started_at = NULL,
+                        last_build_at = now(),
+                        last_build_seconds = EXCLUDED.last_build_seconds,
+                        last_build_params = EXCLUDED.last_build_params,
+                        updated_at = now()
+                    """,
+                    (self.table_name, seconds, Json(params)),
+                )
+            finally:
+                self._release_maintenance_lock(cur)
+        logger.info(f"Built {index_name} ({params}) in {seconds:.1f}s")
+        return {
+            "status": "built",
+            "index": index_name,
+            "replaced_existing": exists,
+            "seconds": round(seconds, 2),
+            "params": params,
+        }
+
+    def index_report(self) -> Dict[str, Any]:
+        """
+        Estado del índice vectorial: tamaño por índice / partición, construcción en curso
+        (pg_stat_progress_create_index) y bloat (tuplas muertas que el grafo HNSW conserva
+        hasta el próximo VACUUM).
+        """
+        relations = """
+            SELECT to_regclass(%s)::oid
+            UNION ALL
+            SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s)
+        """
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    f"SELECT bulk_load, bulk_load_started_at, last_build_at, last_build_seconds, last_build_params "
+                    f"FROM {self.index_state_table} WHERE table_name = %s",
+                    (self.table_name,),
+                )
+                state = cur.fetchone() or {"bulk_load": False}
+                cur.execute(
+                    f"""
+                    SELECT c.relname AS name, t.relname AS "table", i.indisvalid AS valid,
+                           pg_relation_size(c.oid) AS size_bytes, c.reloptions AS options
+                    FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    JOIN pg_class t ON t.oid = i.indrelid
+                    JOIN pg_am am ON am.oid = c.relam
+                    WHERE am.amname = 'hnsw' AND i.indrelid IN ({relations})
+                    ORDER BY c.relname
+                    """,
+                    (self.table_name, self.table_name),
+                )
+                indexes = cur.fetchall()
+                cur.execute(
+                    f"""
+                    SELECT p.pid, p.relid::regclass::text AS "table", p.index_relid::regclass::text AS index,
+                           p.phase, p.blocks_done, p.blocks_total, p.tuples_done, p.tuples_total
+                    FROM pg_stat_progress_create_index p
+                    WHERE p.relid IN ({relations})
+                    """,
+                    (self.table_name, self.table_name),
+                )
+                progress = cur.fetchall()
+                cur.execute(
+                    f"""
+                    SELECT coalesce(sum(n_live_tup), 0) AS live_tuples, coalesce(sum(n_dead_tup), 0) AS dead_tuples,
+                           max(last_vacuum) AS last_vacuum, max(last_autovacuum) AS last_autovacuum
+                    FROM pg_stat_user_tables
+                    WHERE relid IN ({relations})
+                    """,
+                    (self.table_name, self.table_name),
+                )
+                table_stats = cur.fetchone()
+
+        for build in progress:
+            total = build["tuples_total"] or build["blocks_total"]
+            done = build["tuples_done"] if build["tuples_total"] else build["blocks_done"]
+            build["percent"] = round(100.0 * done / total, 1) if total else None
+        live, dead = int(table_stats["live_tuples"]), int(table_stats["dead_tuples"])
+        total_size = sum(index["size_bytes"] for index in indexes)
+        return {
+            "table": self.table_name,
+            "layout": self.layout,
+            "storage_mode": self.storage_mode,
+            "build_params": {"m": self.hnsw_m, "ef_construction": self.hnsw_ef_construction},
+            "ef_search": {"default": self.ef_search, "tenants": self.tenant_ef_search, "max": self.max_ef_search},
+            "state": state,
+            "indexes": indexes,
+            "total_size_bytes": total_size,
+            "build_progress": progress,
+            "bloat": {
+                **table_stats,
+                "live_tuples": live,
+                "dead_tuples": dead,
+                "dead_ratio": round(dead / (live + dead), 4) if live + dead else 0.0,
+                "index_bytes_per_live_row": round(total_size / live, 1) if live else None,
+            },
+        }
+
+    @contextmanager
+    def _maintenance_cursor(self) -> Iterator[Any]:
+        # CREATE/DROP INDEX CONCURRENTLY no puede correr dentro de una transacción
+        with self._get_connection() as conn:
+            conn.autocommit = True
+            try:
+                with conn.cursor() as cur:
+                    yield cur
+            finally:
+                conn.autocommit = False
+
+    def _try_maintenance_lock(self, cur) -> bool:
+        # Un solo cambio de índice a la vez entre réplicas y workers (lock de sesión)
+        cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (f"{self.table_name}:vector_index",))
+        return bool(cur.fetchone()[0])
+
+    def _release_maintenance_lock(self, cur) -> None:
+        cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (f"{self.table_name}:vector_index",))
+
+    def _bulk_load_query(self) -> str:
+        return f"SELECT EXISTS (SELECT 1 FROM {self.index_state_table} WHERE table_name = %s AND bulk_load)"
+
+    def _build_vector_index(self, cur, mode: str, rebuild: bool = False) -> str:
+        """
+        Construye el índice HNSW del modo con los parámetros actuales usando CREATE INDEX
+        CONCURRENTLY (por partición en tablas particionadas). Requiere autocommit.
+        """
+        index_name = self._index_name(mode, rebuild=rebuild)
+        using = f"USING hnsw ({self._index_target(mode)}) {self._index_options()}"
+
+        # Un CREATE INDEX CONCURRENTLY interrumpido deja el índice INVALID
+        cur.execute(
+            """
+            SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE NOT i.indisvalid AND c.relname LIKE '%%embedding%%'
+              AND (i.indrelid = to_regclass(%s)
+                   OR i.indrelid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s)))
+            """,
+            (self.table_name, self.table_name),
+        )
+        for (invalid,) in cur.fetchall():
+            cur.execute(f"DROP INDEX IF EXISTS {invalid}")
+
+        # Memoria y workers de construcción (HNSW es mucho más rápido si el grafo entra en memoria)
+        if self.build_maintenance_work_mem:
+            cur.execute(f"SET maintenance_work_mem = '{self.build_maintenance_work_mem}'")
+        if self.build_parallel_workers:
+            cur.execute(f"SET max_parallel_maintenance_workers = {int(self.build_parallel_workers)}")
+        try:
+            if self.layout == "none":
+                cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {self.table_name} {using}")
+            else:
+                # CONCURRENTLY no aplica a tablas particionadas: índice padre vacío (ON ONLY),
+                # construcción concurrente por partición y ATTACH.
+                cur.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON ONLY {self.table_name} {using}")
+                for partition in self._partitions(cur):
+                    child = self._index_name(mode, partition, rebuild=rebuild)
+                    cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} ON {partition} {using}")
+                    cur.execute(
+                        "SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(%s) AND inhparent = to_regclass(%s)",
+                        (child, index_name),
+                    )
+                    if cur.fetchone() is None:
+                        cur.execute(f"ALTER INDEX {index_name} ATTACH PARTITION {child}")
+        finally:
+            cur.execute("RESET maintenance_work_mem")
+            cur.execute("RESET max_parallel_maintenance_workers")
+        return index_name
+
+    def _partitions(self, cur) -> List[str]:
+        cur.execute(
+            "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(%s)",
+            (self.table_name,),
+        )
+        return [partition for (partition,) in cur.fetchall()]
+
+    def _drop_vector_indexes(self, cur, exclude: Optional[str] = None) -> List[str]:
+        dropped = []
+        for mode in STORAGE_MODES:
+            if mode == exclude:
+                continue
+            old_index = self._index_name(mode)
+            cur.execute("SELECT to_regclass(%s)", (old_index,))
+            if cur.fetchone()[0] is not None:
+                concurrently = "CONCURRENTLY " if self.layout == "none" else ""
+                cur.execute(f"DROP INDEX {concurrently}IF EXISTS {old_index}")
+                dropped.append(old_index)
+        return dropped
+
+    def _swap_vector_index(self, cur, built: str, index_name: str) -> None:
+        """
+        Reemplaza el índice actual por el recién construido (el nuevo ya es válido:
+        las búsquedas no quedan sin índice entre el DROP y el RENAME).
+        """
+        concurrently = "CONCURRENTLY " if self.layout == "none" else ""
+        cur.execute(f"DROP INDEX {concurrently}IF EXISTS {index_name}")
+        cur.execute(f"ALTER INDEX {built} RENAME TO {index_name}")
+        if self.layout != "none":
+            # Los índices de cada partición vuelven a su nombre canónico
+            cur.execute(
+                """
+                SELECT ix.indexrelid::regclass::text, ix.indrelid::regclass::text
+                FROM pg_inherits inh JOIN pg_index ix ON ix.indexrelid = inh.inhrelid
+                WHERE inh.inhparent = to_regclass(%s)
+                """,
+                (index_name,),
+            )
+            for child, partition in cur.fetchall():
+                canonical = self._index_name(self.storage_mode, partition)
+                if child != canonical:
+                    cur.execute(f"ALTER INDEX {child} RENAME TO {canonical}")
+
     def delete_document(self, client_id: str, content_id: str) -> int:
         """
         Elimina un documento específico (y sus chunks) basado en content_id y client_id.
@@ -147,5 +1870,9 @@ class VectorRepository:
             with conn.cursor() as cur:
                 cur.execute(query, (client_id, content_id))
                 deleted_count = cur.rowcount
+                cur.execute(
+                    f"DELETE FROM {self.manifest_table} WHERE client_id = %s AND content_id = %s",
+                    (client_id, content_id),
+                )
                 conn.commit()
                 return deleted_count
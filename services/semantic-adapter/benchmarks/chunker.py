@@ -0,0 +1,104 @@
+"""
+Throughput del chunker nativo frente a LangChain RecursiveCharacterTextSplitter
+sobre textos grandes en español generados (fichas de propiedades concatenadas).
+
+Reporta MB/s por motor, si el modo compat produce exactamente los mismos chunks,
+y la latencia de asplit_text (threadpool / process pool) para el documento completo.
+
+Uso:
+    python benchmarks/chunker.py --mb 20 --chunk-size 1000 --overlap 100
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.chunker import Chunker
+
+SENTENCES = [
+    "Hermosa casa en Tulum con alberca privada y jardín tropical",
+    "El departamento cuenta con tres recámaras, dos baños completos y estacionamiento techado",
+    "A cinco minutos de la playa y de la zona hotelera",
+    "Precio de lista negociable; se aceptan créditos bancarios e Infonavit",
+    "La cocina integral incluye electrodomésticos de acero inoxidable",
+    "¿Busca invertir? La zona tiene alta demanda de renta vacacional",
+    "Amenidades: gimnasio, roof garden, seguridad las 24 horas y área de asadores",
+    "Entrega inmediata, escrituras en regla y sin adeudos de predial",
+]
+
+
+def make_text(megabytes: float, seed: int) -> str:
+    rng = random.Random(seed)
+    target = int(megabytes * 1024 * 1024)
+    paragraphs, size = [], 0
+    while size < target:
+        sentences = [rng.choice(SENTENCES) + rng.choice([".", ".", "!", "?"]) for _ in range(rng.randint(2, 8))]
+        paragraph = rng.choice([" ", "\n"]).join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def timed(fn, text: str, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=10.0)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    text = make_text(args.mb, args.seed)
+    mb = len(text.encode("utf-8")) / (1024 * 1024)
+    report = {"megabytes": round(mb, 2), "chunk_size": args.chunk_size, "overlap": args.overlap, "engines": {}}
+
+    engines = {
+        "native_compat": Chunker(args.chunk_size, args.overlap, mode="compat"),
+        "native_sentence": Chunker(args.chunk_size, args.overlap, mode="sentence"),
+        "native_tokens": Chunker(args.chunk_size // 4, args.overlap // 4, mode="sentence", length_unit="tokens"),
+    }
+    results = {}
+    for name, engine in engines.items():
+        seconds, chunks = timed(engine.split_text, text, args.repeat)
+        results[name] = chunks
+        report["engines"][name] = {"seconds": round(seconds, 3), "mb_per_s": round(mb / seconds, 2), "chunks": len(chunks)}
+
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        RecursiveCharacterTextSplitter = None
+    if RecursiveCharacterTextSplitter is not None:
+        splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.overlap)
+        seconds, chunks = timed(splitter.split_text, text, args.repeat)
+        report["engines"]["langchain"] = {"seconds": round(seconds, 3), "mb_per_s": round(mb / seconds, 2), "chunks": len(chunks)}
+        report["compat_identical"] = chunks == results["native_compat"]
+
+    # Latencia vista por el event loop: el documento completo va al process pool
+    chunker = Chunker(args.chunk_size, args.overlap, mode="compat", process_threshold=1)
+    try:
+        asyncio.run(chunker.asplit_text(text[:1000]))  # arranque del pool fuera de la medición
+        started = time.perf_counter()
+        asyncio.run(chunker.asplit_text(text))
+        report["process_pool_seconds"] = round(time.perf_counter() - started, 3)
+    finally:
+        chunker.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
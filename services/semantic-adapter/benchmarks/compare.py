@@ -0,0 +1,109 @@
+"""
+Compara dos resultados de benchmarks/suite.py (base vs candidato) y marca regresiones.
+
+Las métricas se comparan por nombre (ej: search.c8.p99_ms, recall.ef40.recall_at_10);
+latencias y segundos son mejores cuanto menores, throughput y recall cuanto mayores.
+Sale con código 1 si alguna métrica empeora más que --threshold (relativo).
+
+Uso:
+    python benchmarks/compare.py results/base.json results/candidato.json --threshold 0.10
+"""
+import sys
+import json
+import argparse
+from typing import Any, Dict, List, Optional
+
+# Sufijos de métrica -> True si mayor es mejor
+DIRECTIONS = (
+    ("_ms", False),
+    ("seconds", False),
+    ("p99_slowdown", False),
+    ("errors", False),
+    ("_per_s", True),
+    ("qps", True),
+    ("recall_at_", True),
+)
+# Conteos y tamaños: contexto, no rendimiento
+IGNORED = ("count", "documents", "chunks", "concurrency")
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = float(value)
+    return metrics
+
+
+def higher_is_better(metric: str) -> Optional[bool]:
+    leaf = metric.rsplit(".", 1)[-1]
+    if leaf in IGNORED:
+        return None
+    for pattern, higher in DIRECTIONS:
+        if pattern in leaf:
+            return higher
+    return None
+
+
+def compare(base: Dict[str, Any], candidate: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Filas {metric, base, candidate, change, regression} para las métricas presentes en ambas corridas.
+    change es relativo y con signo "bueno positivo" (0.1 = 10% mejor).
+    """
+    before, after = flatten(base.get("results", {})), flatten(candidate.get("results", {}))
+    rows = []
+    for metric in sorted(before.keys() & after.keys()):
+        higher = higher_is_better(metric)
+        if higher is None:
+            continue
+        old, new = before[metric], after[metric]
+        if old == 0:
+            change = 0.0 if new == 0 else (1.0 if (new > 0) == higher else -1.0)
+        else:
+            change = (new - old) / abs(old) * (1 if higher else -1)
+        rows.append({
+            "metric": metric, "base": old, "candidate": new,
+            "change": round(change, 4), "regression": change < -threshold,
+        })
+    return rows
+
+
+def _label(report: Dict[str, Any]) -> str:
+    git = report.get("git") or {}
+    return f"{git.get('commit') or '?'}{'+dirty' if git.get('dirty') else ''} ({report.get('started_at', '?')})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="empeoramiento relativo tolerado")
+    parser.add_argument("--json", action="store_true", help="salida JSON en lugar de tabla")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    rows = compare(base, candidate, args.threshold)
+    regressions = [row for row in rows if row["regression"]]
+
+    if args.json:
+        print(json.dumps({"base": _label(base), "candidate": _label(candidate), "metrics": rows}, indent=2))
+    else:
+        if base.get("config") != candidate.get("config"):
+            print("warning: runs used different configurations", file=sys.stderr)
+        print(f"base:      {_label(base)}\ncandidate: {_label(candidate)}\n")
+        width = max((len(row["metric"]) for row in rows), default=10)
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"{row['metric']:<{width}}  {row['base']:>12.3f}  {row['candidate']:>12.3f}  {row['change']:>+8.1%}{flag}")
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
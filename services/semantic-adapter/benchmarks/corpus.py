@@ -0,0 +1,215 @@
+"""
+Generador de corpus sintético multi-tenant para benchmarks (reproducible por semilla).
+
+Dos tipos de documento, en español:
+  - property: fichas del catálogo de propiedades (1-2 chunks, metadata de negocio).
+  - pdf: textos largos tipo manual / contrato con secciones (decenas de chunks).
+
+Cada documento se genera a partir de (seed, tenant, índice): el corpus se produce en
+streaming y cualquier documento se puede regenerar sin materializar el resto, por lo
+que escala a millones de chunks con memoria constante.
+
+Uso (escribe NDJSON compatible con POST /api/v1/ingest/batch):
+    python benchmarks/corpus.py --tenants 20 --docs-per-tenant 5000 --pdf-ratio 0.1 > corpus.ndjson
+"""
+import sys
+import json
+import uuid
+import random
+import hashlib
+import argparse
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+LOCATIONS = ["Tulum", "Playa del Carmen", "Cancún", "Mérida", "Puerto Morelos", "Bacalar", "Valladolid", "Cozumel"]
+PROPERTY_TYPES = ["Casa", "Departamento", "Villa", "Terreno", "Penthouse", "Local comercial"]
+OPERATIONS = {"sale": "Venta", "rent": "Renta"}
+AMENITIES = [
+    "alberca", "gimnasio", "roof garden", "seguridad 24 horas", "jardín", "cuarto de servicio",
+    "terraza", "elevador", "área de asadores", "cancha de pádel", "coworking", "estacionamiento techado",
+]
+PROPERTY_SENTENCES = [
+    "A {n} minutos de la playa y de la zona hotelera",
+    "La cocina integral incluye electrodomésticos de acero inoxidable",
+    "Ideal para renta vacacional con alta ocupación todo el año",
+    "Entrega inmediata, escrituras en regla y sin adeudos de predial",
+    "Acabados de lujo con piso de mármol y cancelería de aluminio",
+    "Se aceptan créditos bancarios, Infonavit y Fovissste",
+    "Vista panorámica a la selva desde la recámara principal",
+    "Desarrollo con reglamento de condóminos y cuota de mantenimiento de {n}00 pesos",
+]
+PDF_TOPICS = {
+    "financial_products": [
+        "La tasa de interés anual fija aplica durante los primeros {n} meses del crédito",
+        "El costo anual total incluye comisiones por apertura y seguros obligatorios",
+        "El pago mínimo se calcula como el {n} por ciento del saldo insoluto",
+        "Las aportaciones voluntarias reducen el plazo y no generan penalización",
+        "El cliente puede solicitar la portabilidad de su nómina sin costo",
+        "La tarjeta adicional comparte la línea de crédito del titular",
+    ],
+    "legal": [
+        "Las partes se someten a la jurisdicción de los tribunales de la ciudad de {loc}",
+        "El arrendatario se obliga a entregar el inmueble en las mismas condiciones",
+        "La rescisión anticipada genera una pena convencional de {n} mensualidades",
+        "El depósito en garantía se reembolsa dentro de los treinta días naturales",
+        "Cualquier modificación al presente contrato deberá constar por escrito",
+        "El fiador responde solidariamente de las obligaciones del arrendatario",
+    ],
+    "operations": [
+        "El procedimiento de mantenimiento preventivo se ejecuta cada {n} semanas",
+        "El personal de recepción registra a los visitantes en la bitácora digital",
+        "Los reportes de incidencias se atienden en un máximo de {n} horas hábiles",
+        "La póliza cubre daños por huracán, inundación y responsabilidad civil",
+        "El inventario de mobiliario se verifica al inicio y al final de cada estancia",
+        "Las llaves maestras se resguardan en la caja fuerte de administración",
+    ],
+}
+
+
+@dataclass
+class CorpusSpec:
+    tenants: int = 10
+    docs_per_tenant: int = 1000
+    # Fracción de documentos largos tipo PDF (el resto son fichas de propiedades)
+    pdf_ratio: float = 0.1
+    # Páginas por documento PDF (~2.5k caracteres por página)
+    pdf_pages: int = 8
+    # Tamaño relativo de los tenants: docs(t) = docs_per_tenant / (t + 1) ** tenant_skew
+    tenant_skew: float = 0.0
+    seed: int = 42
+
+    def tenant_id(self, tenant: int) -> str:
+        # UUID determinista: válido también para el layout tenant (una partición por cliente)
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"semantic-bench/{self.seed}/{tenant}"))
+
+    def tenant_docs(self, tenant: int) -> int:
+        return max(1, int(self.docs_per_tenant / (tenant + 1) ** self.tenant_skew))
+
+    def total_docs(self) -> int:
+        return sum(self.tenant_docs(t) for t in range(self.tenants))
+
+    def estimated_chars(self) -> int:
+        # Ficha ~600 caracteres, PDF ~2.5k por página
+        per_doc = (1 - self.pdf_ratio) * 600 + self.pdf_ratio * self.pdf_pages * 2500
+        return int(self.total_docs() * per_doc)
+
+
+def _rng(spec: CorpusSpec, *key: Any) -> random.Random:
+    return random.Random(":".join(str(k) for k in (spec.seed,) + key))
+
+
+def _fill(template: str, rng: random.Random) -> str:
+    return template.format(n=rng.randint(2, 48), loc=rng.choice(LOCATIONS))
+
+
+def _property(rng: random.Random, tenant_id: str, index: int, revision: int) -> Dict[str, Any]:
+    kind, location = rng.choice(PROPERTY_TYPES), rng.choice(LOCATIONS)
+    operation = rng.choice(list(OPERATIONS))
+    # Las revisiones simulan cambios de precio del ETL nocturno
+    price = rng.randrange(80, 900) * 1000 + revision * 5000
+    bedrooms, bathrooms = rng.randint(1, 5), rng.randint(1, 4)
+    amenities = ", ".join(rng.sample(AMENITIES, rng.randint(2, 5)))
+    sentences = [_fill(s, rng) for s in rng.sample(PROPERTY_SENTENCES, rng.randint(2, 5))]
+    body = (
+        f"{kind} en {OPERATIONS[operation]} en {location}, ${price:,} USD. "
+        f"{bedrooms} Recámaras, {bathrooms} Baños. Amenidades: {amenities}. " + ". ".join(sentences) + "."
+    )
+    return {
+        "content_id": f"property_{index}",
+        "source": "property_catalog",
+        "title": f"{kind} en {location} - P{index:06d}",
+        "body_content": body,
+        "metadata": {
+            "client_id": tenant_id, "category": "property_catalog", "price": price,
+            "currency": "USD", "location": location, "type": operation,
+        },
+    }
+
+
+def _pdf(rng: random.Random, tenant_id: str, index: int, revision: int, pages: int) -> Dict[str, Any]:
+    topic = rng.choice(list(PDF_TOPICS))
+    templates = PDF_TOPICS[topic]
+    sections = []
+    for page in range(pages):
+        paragraphs = []
+        while sum(len(p) for p in paragraphs) < 2400:
+            paragraphs.append(". ".join(_fill(rng.choice(templates), rng) for _ in range(rng.randint(2, 6))) + ".")
+        sections.append(f"{page + 1}. Sección {rng.randint(1, 99)}\n\n" + "\n\n".join(paragraphs))
+    if revision:
+        # Edición puntual en una página (útil con CHUNKER_MODE=cdc)
+        page = rng.randrange(pages)
+        sections[page] += f"\n\nNota de la revisión {revision}: se actualizaron las condiciones vigentes."
+    return {
+        "content_id": f"pdf_{index}",
+        "source": "pdf_upload",
+        "title": f"Documento {topic} {index}",
+        "body_content": "\n\n".join(sections),
+        "metadata": {"client_id": tenant_id, "category": topic},
+    }
+
+
+def make_document(spec: CorpusSpec, tenant: int, index: int, revision: int = 0) -> Dict[str, Any]:
+    """
+    CanonicalDocument (dict) número index del tenant. revision > 0 produce una
+    versión editada del mismo documento (mismo content_id, hash distinto).
+    """
+    tenant_id = spec.tenant_id(tenant)
+    rng = _rng(spec, tenant, index)
+    if rng.random() < spec.pdf_ratio:
+        document = _pdf(rng, tenant_id, index, revision, spec.pdf_pages)
+    else:
+        document = _property(rng, tenant_id, index, revision)
+    document["hash"] = hashlib.sha256(document["body_content"].encode("utf-8")).hexdigest()
+    return document
+
+
+def iter_documents(spec: CorpusSpec, tenants: Optional[List[int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Documentos intercalados entre tenants (como llegan a un servicio compartido).
+    """
+    tenants = list(range(spec.tenants)) if tenants is None else tenants
+    sizes = {t: spec.tenant_docs(t) for t in tenants}
+    for index in range(max(sizes.values(), default=0)):
+        for tenant in tenants:
+            if index < sizes[tenant]:
+                yield make_document(spec, tenant, index)
+
+
+def make_queries(spec: CorpusSpec, count: int, seed: Optional[int] = None) -> List[Tuple[str, str]]:
+    """
+    Queries (client_id, texto) tomadas de fragmentos de documentos del corpus, más
+    una fracción de queries cortas tipo catálogo ("casa Tulum alberca").
+    """
+    rng = random.Random(spec.seed + 1 if seed is None else seed)
+    queries = []
+    for _ in range(count):
+        tenant = rng.randrange(spec.tenants)
+        document = make_document(spec, tenant, rng.randrange(spec.tenant_docs(tenant)))
+        if rng.random() < 0.3:
+            text = f"{rng.choice(PROPERTY_TYPES).lower()} {rng.choice(LOCATIONS)} {rng.choice(AMENITIES)}"
+        else:
+            words = document["body_content"].split()
+            start = rng.randrange(max(1, len(words) - 8))
+            text = " ".join(words[start:start + rng.randint(4, 8)])
+        queries.append((spec.tenant_id(tenant), text))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic multi-tenant NDJSON corpus")
+    for field, value in asdict(CorpusSpec()).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(value), default=value)
+    parser.add_argument("--stats", action="store_true", help="solo imprimir el tamaño estimado")
+    args = parser.parse_args()
+    spec = CorpusSpec(**{field: getattr(args, field) for field in asdict(CorpusSpec())})
+
+    if args.stats:
+        print(json.dumps({**asdict(spec), "documents": spec.total_docs(), "estimated_chars": spec.estimated_chars()}))
+        return
+    out = sys.stdout
+    for document in iter_documents(spec):
+        out.write(json.dumps(document, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Reporte de recall / latencia por modo de almacenamiento vectorial (VECTOR_STORAGE_MODE).
+
+Carga el mismo corpus sintético en una tabla por modo (bench_items_<modo>), ejecuta
+las mismas queries y compara contra el top-k exacto (scan secuencial, sin índice).
+
+Uso:
+    DATABASE_URL=postgresql://... python benchmarks/storage_modes.py --rows 20000 --queries 200
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import statistics
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.vector_repo import VectorRepository, STORAGE_MODES, EMBEDDING_DIM
+
+
+def _normalize(vector):
+    norm = sum(x * x for x in vector) ** 0.5 or 1.0
+    return [x / norm for x in vector]
+
+
+def make_corpus(rows: int, clusters: int, seed: int):
+    """
+    Vectores agrupados alrededor de centroides (más realista que ruido uniforme).
+    """
+    rng = random.Random(seed)
+    centroids = [[rng.gauss(0, 1) for _ in range(EMBEDDING_DIM)] for _ in range(clusters)]
+    vectors = []
+    for _ in range(rows):
+        centroid = rng.choice(centroids)
+        vectors.append(_normalize([c + rng.gauss(0, 0.6) for c in centroid]))
+    return vectors
+
+
+def load(repo: VectorRepository, client_id: str, vectors) -> None:
+    items = [
+        ({
+            "content_id": f"bench-{i}",
+            "client_id": client_id,
+            "source": "benchmark",
+            "title": f"Bench {i}",
+            "body_content": f"documento sintético {i}",
+            "metadata": {"client_id": client_id},
+            "hash": f"bench-{i}",
+        }, vector)
+        for i, vector in enumerate(vectors)
+    ]
+    for start in range(0, len(items), 1000):
+        repo.upsert_documents(items[start:start + 1000])
+    with repo._get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"ANALYZE {repo.table_name}")
+            conn.commit()
+
+
+def exact_top_k(repo: VectorRepository, client_id: str, query, top_k: int):
+    with repo._get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL enable_indexscan = off")
+            cur.execute(
+                f"SELECT content_id FROM {repo.table_name} WHERE client_id = %s "
+                f"ORDER BY embedding <=> %s::vector LIMIT %s",
+                (client_id, query, top_k),
+            )
+            return [row[0] for row in cur.fetchall()]
+
+
+def index_size_mb(repo: VectorRepository) -> float:
+    with repo._get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_relation_size(to_regclass(%s))", (repo._index_name(repo.storage_mode),))
+            return round(cur.fetchone()[0] / 1024 / 1024, 2)
+
+
+def run(args) -> dict:
+    vectors = make_corpus(args.rows, args.clusters, args.seed)
+    rng = random.Random(args.seed + 1)
+    queries = [_normalize([x + rng.gauss(0, 0.3) for x in rng.choice(vectors)]) for _ in range(args.queries)]
+    client_id = str(uuid.uuid4())
+
+    report = {"rows": args.rows, "queries": args.queries, "top_k": args.top_k, "modes": {}}
+    truth = None
+    for mode in args.modes:
+        repo = VectorRepository()
+        repo.table_name = f"bench_items_{mode}"
+        repo.requested_layout = repo.layout = "none"
+        repo.storage_mode = mode
+        repo.rerank_factor = args.rerank_factor
+        repo.open()
+        try:
+            load(repo, client_id, vectors)
+            if truth is None:
+                truth = [exact_top_k(repo, client_id, q, args.top_k) for q in queries]
+
+            latencies, hits = [], 0
+            for query, expected in zip(queries, truth):
+                started = time.perf_counter()
+                rows = repo.search_similar(client_id, query, args.top_k)
+                latencies.append((time.perf_counter() - started) * 1000)
+                hits += len(set(r["content_id"] for r in rows) & set(expected))
+
+            latencies.sort()
+            report["modes"][mode] = {
+                f"recall@{args.top_k}": round(hits / (len(queries) * args.top_k), 4),
+                "p50_ms": round(statistics.median(latencies), 2),
+                "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+                "index_mb": index_size_mb(repo),
+            }
+        finally:
+            if not args.keep:
+                with repo._get_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(f"DROP TABLE IF EXISTS {repo.table_name}")
+                        conn.commit()
+            repo.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare VECTOR_STORAGE_MODE recall and latency")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", choices=STORAGE_MODES, default=list(STORAGE_MODES))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="no borrar las tablas bench_items_*")
+    parser.add_argument("--output", help="escribir el reporte JSON en este archivo")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL is required")
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+Suite de rendimiento reproducible del semantic adapter contra Postgres + pgvector local.
+
+Escenarios (mismo camino de código que la API: IngestPipeline, embed_query + search_similar):
+  - ingest: carga del corpus sintético (docs/s, chunks/s).
+  - search: latencia p50/p95/p99 y QPS por nivel de concurrencia.
+  - mixed:  búsquedas concurrentes mientras se re-ingesta una parte del corpus (revisiones).
+  - recall: recall@k del HNSW (por ef_search) frente al top-k exacto por fuerza bruta.
+
+Embeddings deterministas sin red (BagOfWordsEmbedder): textos con palabras en común
+quedan cerca, así que las queries tienen vecinos con sentido y el recall es comparable.
+Las tablas usan el prefijo --prefix (bench_items, bench_documents, ...) para no tocar
+las del servicio. La configuración del repositorio (VECTOR_STORAGE_MODE, HNSW_*,
+DB_POOL_*, CHUNKER_*, ...) se toma del entorno, igual que en producción.
+
+El resultado es un JSON (benchmarks/results/<fecha>-<commit>.json por defecto) con la
+configuración, el commit y las métricas; benchmarks/compare.py compara dos corridas.
+
+Uso:
+    DATABASE_URL=postgresql://... python benchmarks/suite.py --tenants 10 --docs-per-tenant 2000
+    DATABASE_URL=postgresql://... python benchmarks/suite.py --skip-load --scenarios search recall
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import platform
+import argparse
+import tempfile
+import subprocess
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.chunker import Chunker
+from app.pipeline import IngestPipeline
+from app.vector_repo import VectorRepository, EMBEDDING_DIM
+from app.async_vector_repo import AsyncVectorRepository, call_repo
+from benchmarks.corpus import CorpusSpec, iter_documents, make_document, make_queries
+
+SCENARIOS = ("ingest", "search", "mixed", "recall")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# Variables de entorno que cambian el rendimiento y se registran con cada corrida
+RECORDED_ENV = (
+    "DB_DRIVER", "DB_POOL_MIN_SIZE", "DB_POOL_MAX_SIZE", "VECTOR_STORAGE_MODE", "VECTOR_RERANK_FACTOR",
+    "SEMANTIC_PARTITIONING", "SEMANTIC_HASH_PARTITIONS", "HNSW_M", "HNSW_EF_CONSTRUCTION", "HNSW_EF_SEARCH",
+    "CHUNKER_MODE", "CHUNKER_LENGTH_UNIT", "INGEST_BATCH_EMBED_SIZE", "INGEST_BATCH_EMBED_CONCURRENCY",
+    "INGEST_BATCH_WRITE_ROWS", "INGEST_BATCH_CHUNK_WORKERS",
+)
+_WORD = re.compile(r"\w+")
+
+
+class BagOfWordsEmbedder:
+    """
+    Embedder determinista para benchmarks: suma normalizada de vectores por palabra
+    (cada palabra, un vector gaussiano fijo por su sha256) más un pequeño ruido por texto.
+    Misma interfaz async que GeminiEmbedder.
+    """
+
+    def __init__(self, dimensions: int = EMBEDDING_DIM, noise: float = 0.05, model: str = "bench-bow"):
+        self.model = model
+        self.dimensions = dimensions
+        self.noise = noise
+        self._words: Dict[str, np.ndarray] = {}
+        self.stats = {"requests": 0, "texts": 0}
+
+    def _seeded(self, key: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+
+    def vector(self, text: str) -> List[float]:
+        total = self._seeded("\x00" + text) * self.noise
+        for word in _WORD.findall(text.lower()):
+            if word not in self._words:
+                self._words[word] = self._seeded(word)
+            total += self._words[word]
+        norm = np.linalg.norm(total)
+        return (total / (norm or 1.0)).tolist()
+
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.stats["requests"] += 1
+        self.stats["texts"] += len(texts)
+        return [self.vector(text) for text in texts]
+
+    async def embed_query(self, text: str) -> List[float]:
+        return (await self.embed_documents([text]))[0]
+
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return await self.embed_documents(texts)
+
+
+def latency_summary(latencies_ms: List[float], seconds: Optional[float] = None) -> Dict[str, Any]:
+    if not latencies_ms:
+        return {"count": 0}
+    values = np.asarray(latencies_ms)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    summary = {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+    if seconds:
+        summary["qps"] = round(len(values) / seconds, 2)
+    return summary
+
+
+class BenchmarkContext:
+    def __init__(self, args):
+        self.args = args
+        self.spec = CorpusSpec(**{field: getattr(args, field) for field in asdict(CorpusSpec())})
+        self.sync_repo = VectorRepository()
+        for attribute, suffix in (
+            ("table_name", "items"), ("manifest_table", "documents"), ("cache_table", "embedding_cache"),
+            ("jobs_table", "jobs"), ("index_state_table", "index_state"), ("migrations_table", "schema_migrations"),
+        ):
+            setattr(self.sync_repo, attribute, f"{args.prefix}_{suffix}")
+        self.repo = AsyncVectorRepository(self.sync_repo) if args.driver == "asyncpg" else self.sync_repo
+        self.embedder = BagOfWordsEmbedder()
+        self.chunker = Chunker()
+
+    async def open(self) -> None:
+        self.sync_repo.open()
+        if not self.args.skip_load:
+            # Corrida limpia: se recrea el esquema del benchmark
+            self.drop_tables()
+            self.sync_repo.migrate()
+        if self.repo is not self.sync_repo:
+            await self.repo.open()
+
+    async def close(self) -> None:
+        if self.repo is not self.sync_repo:
+            await self.repo.close()
+        if not self.args.keep:
+            self.drop_tables()
+        self.sync_repo.close()
+        self.chunker.close()
+
+    def drop_tables(self) -> None:
+        repo = self.sync_repo
+        with repo._get_connection() as conn:
+            with conn.cursor() as cur:
+                for table in (
+                    repo.table_name, repo.manifest_table, repo.cache_table, repo.jobs_table,
+                    repo.index_state_table, repo.migrations_table,
+                ):
+                    cur.execute(f"DROP TABLE IF EXISTS {table} CASCADE")
+                conn.commit()
+
+    def server_info(self) -> Dict[str, Any]:
+        with self.sync_repo._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SHOW server_version")
+                version = cur.fetchone()[0]
+                cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+                row = cur.fetchone()
+                cur.execute(f"SELECT count(*), pg_total_relation_size(%s) FROM {self.sync_repo.table_name}", (self.sync_repo.table_name,))
+                chunks, size = cur.fetchone()
+        return {"postgres": version, "pgvector": row[0] if row else None, "chunks": chunks, "table_bytes": size}
+
+    async def search(self, client_id: str, text: str, ef_search: Optional[int] = None) -> List[Dict[str, Any]]:
+        vector = await self.embedder.embed_query(text)
+        return await call_repo(self.repo.search_similar, client_id, vector, self.args.top_k, None, ef_search=ef_search)
+
+
+async def _ingest(ctx: BenchmarkContext, documents) -> Dict[str, Any]:
+    # El corpus se escribe a disco primero: se mide el pipeline, no el generador
+    with tempfile.TemporaryFile() as spool:
+        count = 0
+        for document in documents:
+            spool.write(json.dumps(document, ensure_ascii=False).encode("utf-8") + b"\n")
+            count += 1
+        spool.seek(0)
+        pipeline = IngestPipeline(ctx.chunker, ctx.embedder, ctx.repo)
+        summary: Dict[str, Any] = {}
+        started = time.perf_counter()
+        async for status in pipeline.run(spool):
+            summary = status.get("summary", summary)
+        seconds = time.perf_counter() - started
+    chunks = summary.get("db_records_upserted", 0)
+    return {
+        "documents": count,
+        "chunks": chunks,
+        "errors": summary.get("error", 0),
+        "seconds": round(seconds, 3),
+        "docs_per_s": round(count / seconds, 2) if seconds else None,
+        "chunks_per_s": round(chunks / seconds, 2) if seconds else None,
+    }
+
+
+async def bench_ingest(ctx: BenchmarkContext) -> Dict[str, Any]:
+    result = await _ingest(ctx, iter_documents(ctx.spec))
+    # Estadísticas frescas antes de medir búsquedas
+    await call_repo(ctx.sync_repo.vacuum_items)
+    return result
+
+
+async def _search_load(
+    ctx: BenchmarkContext,
+    queries: List[Tuple[str, str]],
+    concurrency: int,
+    stop: Optional[asyncio.Event] = None,
+) -> Tuple[List[float], float]:
+    """
+    concurrency clientes lanzando búsquedas: recorre las queries una vez, o en ciclo
+    hasta que se active stop. Devuelve latencias (ms) y segundos totales.
+    """
+    latencies: List[float] = []
+    position = 0
+
+    async def client() -> None:
+        nonlocal position
+        while True:
+            if stop is None and position >= len(queries):
+                return
+            if stop is not None and stop.is_set():
+                return
+            client_id, text = queries[position % len(queries)]
+            position += 1
+            started = time.perf_counter()
+            await ctx.search(client_id, text)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+async def bench_search(ctx: BenchmarkContext) -> Dict[str, Any]:
+    queries = make_queries(ctx.spec, ctx.args.queries)
+    # Calentamiento: caches de Postgres y del embedder
+    await _search_load(ctx, queries[: min(len(queries), 50)], 4)
+    results = {}
+    for concurrency in ctx.args.concurrency:
+        latencies, seconds = await _search_load(ctx, queries, concurrency)
+        results[f"c{concurrency}"] = latency_summary(latencies, seconds)
+    return results
+
+
+async def bench_mixed(ctx: BenchmarkContext) -> Dict[str, Any]:
+    """
+    Búsquedas con la concurrencia más alta mientras se re-ingestan revisiones de
+    --mixed-docs documentos (cambios de precio / ediciones, como el ETL nocturno).
+    """
+    rng = random.Random(ctx.spec.seed + 2)
+    # Sin repetidos: un mismo documento dos veces en un lote no es un caso real del ETL
+    picks = {(t, rng.randrange(ctx.spec.tenant_docs(t))) for t in (rng.randrange(ctx.spec.tenants) for _ in range(ctx.args.mixed_docs))}
+    revisions = [make_document(ctx.spec, tenant, index, revision=1 + rng.randrange(1000)) for tenant, index in sorted(picks)]
+    queries = make_queries(ctx.spec, ctx.args.queries, seed=ctx.spec.seed + 3)
+    concurrency = max(ctx.args.concurrency)
+
+    baseline, baseline_seconds = await _search_load(ctx, queries, concurrency)
+    stop = asyncio.Event()
+    load = asyncio.create_task(_search_load(ctx, queries, concurrency, stop))
+    try:
+        ingest = await _ingest(ctx, revisions)
+    finally:
+        stop.set()
+    latencies, seconds = await load
+
+    read_only = latency_summary(baseline, baseline_seconds)
+    during_writes = latency_summary(latencies, seconds)
+    return {
+        "concurrency": concurrency,
+        "ingest": ingest,
+        "search_read_only": read_only,
+        "search_during_writes": during_writes,
+        "p99_slowdown": round(during_writes["p99_ms"] / read_only["p99_ms"], 3) if latencies and baseline else None,
+    }
+
+
+def exact_top_k(repo: VectorRepository, client_id: str, vector: List[float], top_k: int) -> List[str]:
+    # Fuerza bruta: sin índices, distancia exacta sobre el vector float32
+    with repo._get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL enable_indexscan = off")
+            cur.execute(
+                f"SELECT hash FROM {repo.table_name} WHERE client_id = %s ORDER BY embedding <=> %s::vector LIMIT %s",
+                (client_id, vector, top_k),
+            )
+            rows = [row[0] for row in cur.fetchall()]
+            conn.commit()
+            return rows
+
+
+async def bench_recall(ctx: BenchmarkContext) -> Dict[str, Any]:
+    queries = make_queries(ctx.spec, ctx.args.recall_queries, seed=ctx.spec.seed + 4)
+    top_k = ctx.args.top_k
+    vectors = [await ctx.embedder.embed_query(text) for _, text in queries]
+    truth = [
+        set(await call_repo(exact_top_k, ctx.sync_repo, client_id, vector, top_k))
+        for (client_id, _), vector in zip(queries, vectors)
+    ]
+
+    results = {}
+    for ef_search in ctx.args.ef_search:
+        hits = expected = 0
+        latencies = []
+        for (client_id, _), vector, exact in zip(queries, vectors, truth):
+            started = time.perf_counter()
+            rows = await call_repo(ctx.repo.search_similar, client_id, vector, top_k, None, ef_search=ef_search)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len({row["hash"] for row in rows} & exact)
+            expected += len(exact)
+        results[f"ef{ef_search}"] = {
+            f"recall_at_{top_k}": round(hits / expected, 4) if expected else None,
+            **latency_summary(latencies),
+        }
+    return results
+
+
+def git_info() -> Dict[str, Any]:
+    def run(*command: str) -> str:
+        return subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(RESULTS_DIR)).stdout.strip()
+
+    try:
+        return {"commit": run("git", "rev-parse", "--short", "HEAD") or None, "dirty": bool(run("git", "status", "--porcelain"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+async def run_suite(args) -> Dict[str, Any]:
+    ctx = BenchmarkContext(args)
+    report: Dict[str, Any] = {
+        "suite": "semantic-adapter",
+        "format": 1,
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_info(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            "corpus": asdict(ctx.spec),
+            "driver": args.driver,
+            "top_k": args.top_k,
+            "queries": args.queries,
+            "concurrency": args.concurrency,
+            "env": {name: os.environ[name] for name in RECORDED_ENV if name in os.environ},
+        },
+        "results": {},
+    }
+    await ctx.open()
+    try:
+        scenarios = {"ingest": bench_ingest, "search": bench_search, "mixed": bench_mixed, "recall": bench_recall}
+        for name in args.scenarios:
+            if name == "ingest" and args.skip_load:
+                continue
+            print(f"[bench] {name}...", file=sys.stderr)
+            report["results"][name] = await scenarios[name](ctx)
+        report["host"].update(ctx.server_info())
+    finally:
+        await ctx.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic adapter performance benchmark suite")
+    for field, value in asdict(CorpusSpec()).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(value), default=value)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--driver", choices=("psycopg2", "asyncpg"), default=os.getenv("DB_DRIVER", "psycopg2"))
+    parser.add_argument("--prefix", default="bench", help="prefijo de las tablas del benchmark")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--mixed-docs", type=int, default=500)
+    parser.add_argument("--recall-queries", type=int, default=200)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100, 200])
+    parser.add_argument("--skip-load", action="store_true", help="reutilizar el corpus ya cargado (con --keep)")
+    parser.add_argument("--keep", action="store_true", help="no borrar las tablas del benchmark al terminar")
+    parser.add_argument("--output", help="archivo JSON de resultados (por defecto benchmarks/results/)")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL is required")
+
+    report = asyncio.run(run_suite(args))
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['git']['commit'] or 'nogit'}.json")
+    text = json.dumps(report, indent=2)
+    with open(output, "w") as f:
+        f.write(text)
+    print(text)
+    print(f"[bench] results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
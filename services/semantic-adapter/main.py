@@ -1,7 +1,10 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 import logging
-from app.api import router
+from app.api import router, repo, job_workers, chunker, readiness
+from app.metrics import MetricsMiddleware, metrics_endpoint
+from app.async_vector_repo import call_repo
 
 # Configuración de logs según convenciones
 logging.basicConfig(level=logging.INFO)
@@ -11,9 +14,18 @@ logger = logging.getLogger("semantic_adapter")
 async def lifespan(app: FastAPI):
     # Lógica de encendido
     logger.info("🚀 Iniciando Semantic Adapter...")
+    # Warm-up en segundo plano: pool de conexiones (vive lo mismo que el proceso), esquema
+    # y cliente del embedder en paralelo. El proceso acepta tráfico de inmediato y /readyz
+    # da 503 hasta terminar; los workers de ingesta (JOB_WORKERS=0 los desactiva) arrancan
+    # cuando la base está lista.
+    await readiness.start()
     yield
     # Lógica de apagado
     logger.info("🛑 Apagando Semantic Adapter...")
+    await readiness.stop()
+    await job_workers.stop()
+    chunker.close()
+    await call_repo(repo.close)
 
 app = FastAPI(
     title="Semantic Adapter API",
@@ -24,10 +36,25 @@ app = FastAPI(
 # Inclusión de rutas con el prefijo oficial
 app.include_router(router, prefix="/api/v1")
 
+# Métricas Prometheus (latencia por endpoint y por etapa) + header Server-Timing
+app.add_middleware(MetricsMiddleware)
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "semantic-adapter"}
 
+# Liveness: el proceso y su event loop responden (sin dependencias externas)
+@app.get("/livez", include_in_schema=False)
+async def liveness():
+    return {"status": "alive"}
+
+# Readiness: pool de Postgres (SELECT 1) y embedder; 503 durante el warm-up o si la base no responde
+@app.get("/readyz", include_in_schema=False)
+async def readiness_check():
+    state = await readiness.check()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
\ No newline at end of file
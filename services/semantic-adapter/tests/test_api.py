@@ -1,7 +1,8 @@
 from fastapi.testclient import TestClient
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 import sys
 import os
+import json
 
 # Asegurar que el path incluya el directorio del servicio para importar main
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -30,10 +31,13 @@ def test_ingest_flow_success(mock_repo, mock_embedder):
     # Configurar Mocks
     # 1. Mock Embedder: Devolver vectores dummy
     # Asumimos que el chunker divide el texto en 1 solo chunk por ser corto
-    mock_embedder.embed_documents.return_value = [[0.1, 0.2, 0.3]] 
+    mock_embedder.embed_documents = AsyncMock(return_value=[[0.1, 0.2, 0.3]])
     
-    # 2. Mock Repo: No hacer nada (upsert exitoso)
-    mock_repo.upsert_document.return_value = None
+    # 2. Mock Repo: documento nuevo (sin manifiesto) y reemplazo exitoso
+    mock_repo.get_document_hashes.return_value = {}
+    mock_repo.replace_documents.return_value = [
+        {"client_id": "client-123", "content_id": "test-doc-001", "upserted": 1, "inserted": 1, "deleted": 0}
+    ]
 
     # Ejecutar Request
     response = client.post("/api/v1/ingest", json=sample_payload)
@@ -49,8 +53,58 @@ def test_ingest_flow_success(mock_repo, mock_embedder):
     # El chunker es real, así que 'split_text' se ejecutó.
     # El embedder debió ser llamado
     mock_embedder.embed_documents.assert_called_once()
-    # El repo debió ser llamado para persistir
-    mock_repo.upsert_document.assert_called_once()
+    # El repo debió ser llamado una sola vez con todos los chunks del documento
+    mock_repo.replace_documents.assert_called_once()
+    manifest, rows = mock_repo.replace_documents.call_args.args[0][0]
+    assert manifest == {"client_id": "client-123", "content_id": "test-doc-001", "hash": "dummy_hash_12345"}
+    assert len(rows) == 1
+    assert rows[0][0]["content_id"] == "test-doc-001"
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_ingest_unchanged_document_skips_embedding(mock_repo, mock_embedder):
+    mock_embedder.embed_documents = AsyncMock()
+    mock_repo.get_document_hashes.return_value = {("client-123", "test-doc-001"): "dummy_hash_12345"}
+
+    response = client.post("/api/v1/ingest", json=sample_payload)
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "unchanged"
+    mock_embedder.embed_documents.assert_not_called()
+    mock_repo.replace_documents.assert_not_called()
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_ingest_content_defined_reembeds_only_new_chunks(mock_repo, mock_embedder):
+    from app.chunker import Chunker
+    from app.models import CanonicalDocument
+    from app.pipeline import chunk_ids
+
+    chunker = Chunker(chunk_size=60, mode="cdc")
+    edited = dict(sample_payload, hash="new_hash", body_content=sample_payload["body_content"] + " Precio: 90 USD.")
+    old_chunks = chunker.split_text(sample_payload["body_content"])
+    stored = set(chunk_ids(CanonicalDocument(**sample_payload), old_chunks, content_defined=True))
+
+    mock_embedder.embed_documents = AsyncMock(side_effect=lambda texts: [[0.1, 0.2, 0.3]] * len(texts))
+    mock_repo.get_document_hashes.return_value = {("client-123", "test-doc-001"): "dummy_hash_12345"}
+    mock_repo.get_chunk_hashes.return_value = {("client-123", "test-doc-001"): stored}
+    mock_repo.replace_documents.return_value = [
+        {"client_id": "client-123", "content_id": "test-doc-001", "upserted": 1, "inserted": 1, "kept": 1, "refreshed": 0, "deleted": 1}
+    ]
+
+    with patch("app.api.chunker", chunker):
+        response = client.post("/api/v1/ingest", json=edited)
+
+    assert response.status_code == 200
+    data = response.json()
+    new_chunks = chunker.split_text(edited["body_content"])
+    embedded = mock_embedder.embed_documents.call_args.args[0]
+    assert embedded == [c for c in new_chunks if c not in old_chunks]
+    assert data["chunks_embedded"] == len(embedded) < len(new_chunks)
+    _, rows = mock_repo.replace_documents.call_args.args[0][0]
+    assert [vector is None for _, vector in rows] == [c in old_chunks for c in new_chunks]
 
 
 @patch("app.api.embedder")
@@ -60,3 +114,349 @@ def test_ingest_no_embedder_configured(mock_embedder):
         response = client.post("/api/v1/ingest", json=sample_payload)
         assert response.status_code == 503
         assert "Embedder service not configured" in response.json()["detail"]
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_ingest_batch_streams_status_lines(mock_repo, mock_embedder):
+    mock_embedder.embed_documents = AsyncMock(side_effect=lambda texts: [[0.1, 0.2, 0.3]] * len(texts))
+    mock_repo.get_document_hashes.return_value = {}
+    mock_repo.replace_documents.side_effect = lambda docs: [
+        {"client_id": m["client_id"], "content_id": m["content_id"], "upserted": len(r), "inserted": len(r), "deleted": 0}
+        for m, r in docs
+    ]
+
+    second = dict(sample_payload, content_id="test-doc-002", hash="dummy_hash_67890")
+    body = "\n".join(json.dumps(p) for p in (sample_payload, second)) + "\n"
+
+    response = client.post("/api/v1/ingest/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert {l["document_id"] for l in lines[:-1]} == {"test-doc-001", "test-doc-002"}
+    assert all(l["status"] == "success" for l in lines[:-1])
+    assert lines[-1]["summary"]["success"] == 2
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_ingest_batch_bulk_load_defers_index_and_queues_rebuild(mock_repo, mock_embedder):
+    mock_embedder.embed_documents = AsyncMock(side_effect=lambda texts: [[0.1, 0.2, 0.3]] * len(texts))
+    mock_repo.get_document_hashes.return_value = {}
+    mock_repo.replace_documents.side_effect = lambda docs: [
+        {"client_id": m["client_id"], "content_id": m["content_id"], "upserted": len(r), "inserted": len(r), "deleted": 0}
+        for m, r in docs
+    ]
+    mock_repo.enqueue_job.return_value = "00000000-0000-0000-0000-000000000001"
+
+    response = client.post(
+        "/api/v1/ingest/batch?bulk_load=true",
+        content=json.dumps(sample_payload) + "\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    summary = [json.loads(line) for line in response.text.splitlines()][-1]["summary"]
+    mock_repo.begin_bulk_load.assert_called_once()
+    assert mock_repo.enqueue_job.call_args.args[0] == "index_rebuild"
+    assert summary["index_rebuild"]["status_url"] == "/api/v1/jobs/00000000-0000-0000-0000-000000000001"
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_search_passes_filters_to_repository(mock_repo, mock_embedder):
+    mock_embedder.embed_query = AsyncMock(return_value=[0.1, 0.2, 0.3])
+    mock_repo.search_similar.return_value = [{
+        "content_id": "fin-1",
+        "title": "Tarjeta Oro",
+        "body_content": "Tasa preferencial",
+        "metadata": {"category": "financial_products"},
+        "similarity": 0.91,
+    }]
+
+    response = client.post("/api/v1/search", json={
+        "query_text": "tarjeta de crédito",
+        "client_id": "client-123",
+        "top_k": 3,
+        "filters": {"category": "financial_products"}
+    })
+
+    assert response.status_code == 200
+    assert response.json()["results"][0]["score"] == 0.91
+    args = mock_repo.search_similar.call_args.args
+    assert args[2] == 3
+    assert args[3] == {"category": "financial_products"}
+    assert mock_repo.search_similar.call_args.kwargs == {"ef_search": None, "with_embeddings": False}
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_search_forwards_ef_search_and_validates_range(mock_repo, mock_embedder):
+    mock_embedder.embed_query = AsyncMock(return_value=[0.1, 0.2, 0.3])
+    mock_repo.search_similar.return_value = []
+
+    response = client.post("/api/v1/search", json={
+        "query_text": "casa con alberca en la playa", "client_id": "client-123", "ef_search": 200
+    })
+    assert response.status_code == 200
+    assert mock_repo.search_similar.call_args.kwargs["ef_search"] == 200
+
+    response = client.post("/api/v1/search", json={"query_text": "casa", "client_id": "client-123", "ef_search": 5000})
+    assert response.status_code == 422
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_search_diversity_overfetches_and_merges_passages(mock_repo, mock_embedder):
+    mock_embedder.embed_query = AsyncMock(return_value=[1.0, 0.0])
+    overlap = "a cinco minutos de la playa"
+    mock_repo.search_similar.return_value = [
+        {"content_id": "pdf", "title": "Folleto", "body_content": "Casa en Tulum " + overlap, "hash": "h0",
+         "metadata": {"chunk_index": 0}, "similarity": 0.95, "embedding": [1.0, 0.0]},
+        {"content_id": "pdf", "title": "Folleto", "body_content": overlap + " con alberca", "hash": "h1",
+         "metadata": {"chunk_index": 1}, "similarity": 0.94, "embedding": [0.9, 0.1]},
+        {"content_id": "faq", "title": "FAQ", "body_content": "Cómo agendar una visita", "hash": "h2",
+         "metadata": {"chunk_index": 0}, "similarity": 0.60, "embedding": [0.0, 1.0]},
+    ]
+
+    response = client.post("/api/v1/search", json={
+        "query_text": "casa cerca de la playa en tulum", "client_id": "client-123", "top_k": 3,
+        "diversity": {"lambda_mult": 0.9, "fetch_factor": 3},
+    })
+
+    assert response.status_code == 200
+    args, kwargs = mock_repo.search_similar.call_args.args, mock_repo.search_similar.call_args.kwargs
+    assert args[2] == 9 and kwargs["with_embeddings"] is True
+    results = response.json()["results"]
+    assert [r["content_id"] for r in results] == ["pdf", "faq"]
+    assert results[0]["body_content"] == "Casa en Tulum a cinco minutos de la playa con alberca"
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_search_batch_embeds_once_and_keeps_input_order(mock_repo, mock_embedder):
+    mock_embedder.embed_queries = AsyncMock(return_value=[[0.1], [0.2]])
+    mock_repo.search_similar_batch.return_value = [
+        [{"content_id": "a", "title": None, "body_content": "A", "metadata": {}, "similarity": 0.9}],
+        [],
+    ]
+
+    response = client.post("/api/v1/search/batch", json={"queries": [
+        {"query_text": "casas en Tulum", "client_id": "client-123", "top_k": 2},
+        {"query_text": "tasas", "client_id": "client-456", "filters": {"category": "financial_products"}},
+    ]})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["query_text"] for r in results] == ["casas en Tulum", "tasas"]
+    assert results[0]["results"][0]["content_id"] == "a"
+    assert results[1]["results"] == []
+    mock_embedder.embed_queries.assert_awaited_once_with(["casas en Tulum", "tasas"])
+    items = mock_repo.search_similar_batch.call_args.args[0]
+    assert items[1]["filters"] == {"category": "financial_products"}
+    assert items[1]["query_vector"] == [0.2]
+
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_search_batch_rejects_options_it_cannot_apply(mock_repo, mock_embedder):
+    mock_embedder.embed_queries = AsyncMock()
+    base = {"query_text": "casas", "client_id": "client-123"}
+
+    for unsupported in ({"mode": "hybrid"}, {"diversity": {"lambda_mult": 0.3}}):
+        response = client.post("/api/v1/search/batch", json={"queries": [dict(base, **unsupported)]})
+        assert response.status_code == 422
+
+    mock_embedder.embed_queries.assert_not_awaited()
+    mock_repo.search_similar_batch.assert_not_called()
+
+def _row(content_id, title, body="", similarity=0.5):
+    return {
+        "content_id": content_id, "title": title, "body_content": body or title,
+        "metadata": {}, "hash": f"h-{content_id}", "similarity": similarity,
+    }
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_hybrid_identifier_query_skips_embedding(mock_repo, mock_embedder):
+    mock_embedder.embed_query = AsyncMock()
+    mock_repo.search_lexical.return_value = [_row("prop-1", "Casa en Tulum - TUL-123", similarity=0.6)]
+
+    response = client.post("/api/v1/search", json={
+        "query_text": "TUL-123", "client_id": "client-123", "mode": "hybrid"
+    })
+
+    assert response.status_code == 200
+    assert response.json()["mode"] == "lexical"
+    assert response.json()["results"][0]["content_id"] == "prop-1"
+    mock_embedder.embed_query.assert_not_awaited()
+    mock_repo.search_similar.assert_not_called()
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_hybrid_fuses_lexical_and_vector_rankings(mock_repo, mock_embedder):
+    mock_embedder.embed_query = AsyncMock(return_value=[0.1, 0.2])
+    mock_repo.search_similar.return_value = [_row("a", "Casa A"), _row("b", "Casa B")]
+    mock_repo.search_lexical.return_value = [_row("b", "Casa B"), _row("c", "Casa C")]
+
+    response = client.post("/api/v1/search", json={
+        "query_text": "casa con vista al mar cerca de la playa", "client_id": "client-123",
+        "top_k": 2, "mode": "hybrid"
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["mode"] == "hybrid"
+    # "b" aparece en ambos rankings y sube al primer lugar
+    assert [r["content_id"] for r in body["results"]] == ["b", "a"]
+    assert mock_repo.search_similar.call_args.args[2] == 8
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_background_ingest_enqueues_job_and_returns_202(mock_repo, mock_embedder):
+    mock_repo.enqueue_job.return_value = "6f9619ff-8b86-d011-b42d-00c04fc964ff"
+    payload = {
+        "content_id": "doc-1",
+        "source": "crm",
+        "title": "Casa",
+        "body_content": "Casa en Tulum",
+        "metadata": {"client_id": "client-123"},
+        "hash": "abc"
+    }
+
+    response = client.post("/api/v1/ingest?background=true", json=payload)
+
+    assert response.status_code == 202
+    assert response.json()["job_id"] == "6f9619ff-8b86-d011-b42d-00c04fc964ff"
+    kind, job_payload = mock_repo.enqueue_job.call_args.args[:2]
+    assert kind == "ingest" and job_payload["document"]["content_id"] == "doc-1"
+    mock_repo.replace_documents.assert_not_called()
+
+    mock_repo.get_job.return_value = None
+    assert client.get("/api/v1/jobs/not-a-uuid").status_code == 404
+    assert client.get("/api/v1/jobs/6f9619ff-8b86-d011-b42d-00c04fc964ff").status_code == 404
+
+
+@patch("app.api.repo")
+def test_client_delete_is_queued_as_batched_job(mock_repo):
+    mock_repo.enqueue_job.return_value = "6f9619ff-8b86-d011-b42d-00c04fc964ff"
+
+    response = client.delete("/api/v1/client/client-123")
+
+    assert response.status_code == 202
+    assert response.json()["status_url"] == "/api/v1/jobs/6f9619ff-8b86-d011-b42d-00c04fc964ff"
+    kind, job_payload = mock_repo.enqueue_job.call_args.args[:2]
+    assert kind == "delete" and job_payload == {"client_id": "client-123", "content_id": None}
+    mock_repo.delete_client_data.assert_not_called()
+
+    mock_repo.delete_client_data.return_value = 3
+    response = client.delete("/api/v1/client/client-123?background=false")
+    assert response.status_code == 200 and response.json()["records_deleted"] == 3
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_repeated_search_is_served_from_result_cache_until_ingest(mock_repo, mock_embedder):
+    mock_embedder.embed_query = AsyncMock(return_value=[0.1, 0.2, 0.3])
+    mock_embedder.embed_documents = AsyncMock(return_value=[[0.1, 0.2, 0.3]])
+    row = {"content_id": "doc-1", "title": "Casa", "body_content": "Casa con alberca", "metadata": {}, "hash": "h-1"}
+    mock_repo.search_similar.return_value = [{**row, "similarity": 0.87}]
+    mock_repo.get_chunks_by_hash.return_value = [row]
+    query = {"query_text": "Casa con alberca", "client_id": "client-cache", "top_k": 1}
+
+    first = client.post("/api/v1/search", json=query).json()
+    second = client.post("/api/v1/search", json={**query, "query_text": "casa con  alberca"}).json()
+
+    assert not first["cached"] and second["cached"]
+    assert second["results"] == first["results"]
+    mock_embedder.embed_query.assert_awaited_once()
+    assert mock_repo.get_chunks_by_hash.call_args.args[:2] == ("client-cache", ["h-1"])
+
+    # Una ingesta del tenant incrementa su generación: la siguiente búsqueda vuelve a la base
+    mock_repo.get_document_hashes.return_value = {}
+    mock_repo.replace_documents.return_value = [{"upserted": 1, "inserted": 1, "deleted": 0}]
+    client.post("/api/v1/ingest", json={**sample_payload, "metadata": {**sample_payload["metadata"], "client_id": "client-cache"}})
+    third = client.post("/api/v1/search", json=query).json()
+    assert not third["cached"] and mock_repo.search_similar.call_count == 2
+
+
+@patch("app.api.repo")
+def test_tenant_export_import_roundtrip_without_embedding(mock_repo):
+    import numpy as np
+
+    source = "5b3c3f4e-8d5a-4c1e-9f0e-2f4d8f0a1b2c"
+    target = "0f1e2d3c-4b5a-4968-8776-a5b4c3d2e1f0"
+    rows = [{
+        "content_id": "doc-1", "source": "pdf_upload", "title": "Contrato", "body_content": "Cláusula primera",
+        "metadata": {"client_id": source}, "hash": "h-1", "embedding": np.ones(768, dtype=np.float32),
+    }]
+
+    def iter_tenant_export(client_id, batch_size):
+        yield {"count": 1, "documents": [{"content_id": "doc-1", "doc_hash": "d-1", "chunk_count": 1}]}
+        yield rows
+
+    mock_repo.iter_tenant_export.side_effect = iter_tenant_export
+    mock_repo.import_tenant.return_value = {"chunks_imported": 1, "chunks_replaced": 0, "documents": 1}
+
+    exported = client.get(f"/api/v1/client/{source}/export?dtype=float32")
+    assert exported.status_code == 200
+    assert exported.headers["content-type"] == "application/octet-stream"
+
+    response = client.post(f"/api/v1/client/{target}/import?mode=replace", content=exported.content)
+    assert response.status_code == 200
+    assert response.json()["chunks_imported"] == 1
+    assert response.json()["source_client_id"] == source
+    client_id, _, documents, mode = mock_repo.import_tenant.call_args.args
+    assert (client_id, mode) == (target, "replace") and documents[0]["doc_hash"] == "d-1"
+
+    assert client.post(f"/api/v1/client/{target}/import", content=b"not an archive").status_code == 400
+
+
+@patch("app.api.repo")
+def test_tenant_export_releases_snapshot_when_client_disconnects(mock_repo):
+    import asyncio
+    import numpy as np
+    from app.api import export_client_data
+
+    source = "5b3c3f4e-8d5a-4c1e-9f0e-2f4d8f0a1b2c"
+    closed = []
+
+    def iter_tenant_export(client_id, batch_size):
+        try:
+            yield {"count": 4, "documents": []}
+            for i in range(4):
+                yield [{"content_id": f"doc-{i}", "source": "pdf", "title": None, "body_content": "x",
+                        "metadata": {}, "hash": f"h-{i}", "embedding": np.ones(768, dtype=np.float32)}]
+        finally:
+            # Equivale a liberar la conexión y hacer rollback del snapshot
+            closed.append(True)
+
+    mock_repo.iter_tenant_export.side_effect = iter_tenant_export
+
+    async def run():
+        response = await export_client_data(source, dtype="float32")
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+            if len(sent) == 3:
+                raise OSError("connection reset by peer")
+
+        async def receive():
+            return {"type": "http.request"}
+
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+        try:
+            await response(scope, receive, send)
+        except Exception:
+            pass
+        # Con la respuesta todavía referenciada: el cierre no depende del recolector de basura
+        return sent, list(closed)
+
+    sent, closed_on_disconnect = asyncio.run(run())
+    # Se cortó tras el header y el primer bloque de embeddings: el generador del repositorio quedó cerrado
+    assert len(sent) == 3 and closed_on_disconnect == [True]
@@ -0,0 +1,123 @@
+import sys
+import os
+import uuid
+import random
+import asyncio
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2.extras import Json
+from app.async_vector_repo import AsyncVectorRepository, call_repo, _to_asyncpg
+from app.vector_repo import VectorRepository
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+requires_db = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+
+def test_placeholders_are_translated_to_positional():
+    repo = AsyncVectorRepository()
+    query, params = _to_asyncpg(*repo._similarity_query("client", [0.1], 3, {"metadata": {"type": "sale"}}))
+
+    assert "%s" not in query
+    assert "$1::vector" in query and f"${len(params)}" in query
+    # Json de psycopg2 -> objeto plano para el codec jsonb de asyncpg
+    assert {"type": "sale"} in params and not any(isinstance(p, Json) for p in params)
+
+
+def test_call_repo_awaits_coroutines_and_offloads_sync_methods():
+    class SyncRepo:
+        def search_similar(self, client_id):
+            return f"sync:{client_id}"
+
+    class AsyncRepo:
+        async def search_similar(self, client_id):
+            return f"async:{client_id}"
+
+    async def run():
+        return await call_repo(SyncRepo().search_similar, "a"), await call_repo(AsyncRepo().search_similar, "b")
+
+    assert asyncio.run(run()) == ("sync:a", "async:b")
+
+
+def test_maintenance_operations_are_delegated_to_sync_repository():
+    repo = AsyncVectorRepository()
+
+    assert repo.table_name == "semantic_items"
+    assert repo.migrate_layout == repo.sync.migrate_layout
+    stats = repo.pool_stats()
+    assert stats["closed"] is True and stats["sync_pool"]["closed"] is True
+    # Cola de trabajos nativa; una operación sin variante asyncpg ni en SYNC_OPERATIONS no se delega
+    assert asyncio.iscoroutinefunction(repo.claim_job) and asyncio.iscoroutinefunction(repo.get_job)
+    repo.sync.count_tenants = lambda: 0
+    with pytest.raises(AttributeError, match="no asyncpg implementation"):
+        repo.count_tenants
+
+
+@requires_db
+def test_async_job_queue_fences_by_worker(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", TEST_DATABASE_URL)
+
+    async def run():
+        repo = AsyncVectorRepository()
+        await repo.open()
+        try:
+            job_id = await repo.enqueue_job("test", {"n": 1})
+            claimed = await repo.claim_job("w1")
+            progressed = await repo.update_job_progress(job_id, "w1", {"step": 1})
+            stale = await repo.complete_job(job_id, "w2", {"ok": False})
+            completed = await repo.complete_job(job_id, "w1", {"ok": True})
+            return claimed, progressed, stale, completed, await repo.get_job(job_id), repo.pool_stats()
+        finally:
+            await repo.close()
+
+    claimed, progressed, stale, completed, job, stats = asyncio.run(run())
+    assert claimed["payload"] == {"n": 1} and progressed and not stale and completed
+    assert job["status"] == "succeeded" and job["result"] == {"ok": True}
+    # La cola no abrió el pool síncrono
+    assert stats["sync_pool"]["closed"] is True
+
+
+@requires_db
+def test_async_search_matches_sync_repository(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", TEST_DATABASE_URL)
+    rng = random.Random(3)
+    client_id = str(uuid.uuid4())
+    rows = [({
+        "content_id": f"doc-{i}",
+        "client_id": client_id,
+        "source": "test",
+        "title": f"Doc {i}",
+        "body_content": f"texto {i}",
+        "metadata": {"client_id": client_id, "category": "faq" if i % 2 else "catalog"},
+        "hash": f"{client_id}-{i}",
+    }, [rng.uniform(-1, 1) for _ in range(768)]) for i in range(50)]
+    query = [rng.uniform(-1, 1) for _ in range(768)]
+    sync_repo = VectorRepository()
+
+    async def run():
+        repo = AsyncVectorRepository()
+        await repo.open()
+        try:
+            upserted = await repo.upsert_documents(rows)
+            results = await repo.search_similar(client_id, query, 5, {"category": "faq"})
+            batch = await repo.search_similar_batch([{"client_id": client_id, "query_vector": query, "top_k": 5}])
+            deleted = await repo.delete_client_data(client_id)
+            return upserted, results, batch, deleted
+        finally:
+            await repo.close()
+
+    sync_repo.open()
+    try:
+        sync_repo.upsert_documents(rows)
+        expected = sync_repo.search_similar(client_id, query, 5, {"category": "faq"})
+        expected_batch = sync_repo.search_similar(client_id, query, 5)
+    finally:
+        sync_repo.delete_client_data(client_id)
+        sync_repo.close()
+
+    upserted, results, batch, deleted = asyncio.run(run())
+    assert len(upserted) == 50 and deleted == 50
+    assert [r["content_id"] for r in results] == [r["content_id"] for r in expected]
+    assert all(r["metadata"]["category"] == "faq" for r in results)
+    assert [r["content_id"] for r in batch[0]] == [r["content_id"] for r in expected_batch]
@@ -0,0 +1,35 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import CorpusSpec, iter_documents, make_document, make_queries
+from benchmarks.compare import compare
+
+
+def test_corpus_is_reproducible_and_multi_tenant():
+    spec = CorpusSpec(tenants=4, docs_per_tenant=30, pdf_ratio=0.2, pdf_pages=2, tenant_skew=1.0)
+    documents = list(iter_documents(spec))
+
+    assert documents == list(iter_documents(spec))
+    assert len(documents) == spec.total_docs() == 30 + 15 + 10 + 7
+    assert {d["metadata"]["client_id"] for d in documents} == {spec.tenant_id(t) for t in range(4)}
+    assert {d["source"] for d in documents} == {"property_catalog", "pdf_upload"}
+
+    # Una revisión conserva el content_id y cambia el hash
+    revised = make_document(spec, 0, 3, revision=2)
+    assert revised["content_id"] == make_document(spec, 0, 3)["content_id"]
+    assert revised["hash"] != make_document(spec, 0, 3)["hash"]
+    assert make_queries(spec, 5) == make_queries(spec, 5)
+
+
+def test_compare_flags_regressions_by_direction():
+    base = {"results": {"search": {"c8": {"p99_ms": 10.0, "qps": 500.0, "count": 1000}}, "recall": {"ef40": {"recall_at_10": 0.95}}}}
+    candidate = {"results": {"search": {"c8": {"p99_ms": 13.0, "qps": 520.0, "count": 900}}, "recall": {"ef40": {"recall_at_10": 0.94}}}}
+
+    rows = {row["metric"]: row for row in compare(base, candidate, threshold=0.10)}
+
+    assert rows["search.c8.p99_ms"]["regression"] and rows["search.c8.p99_ms"]["change"] == -0.3
+    assert not rows["search.c8.qps"]["regression"]
+    assert not rows["recall.ef40.recall_at_10"]["regression"]
+    assert "search.c8.count" not in rows
@@ -0,0 +1,92 @@
+import sys
+import os
+import random
+import asyncio
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.chunker import Chunker, TextChunker, count_tokens
+
+WORDS = ["la", "casa", "tiene", "tres", "recámaras", "alberca", "jardín", "Tulum", "precio", "USD"]
+
+
+def _random_text(rng: random.Random, paragraphs: int) -> str:
+    out = []
+    for _ in range(paragraphs):
+        sentences = []
+        for _ in range(rng.randint(1, 6)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(3, 25))]
+            sentences.append(" ".join(words) + rng.choice([".", "?", "!", ";"]))
+        out.append(rng.choice([" ", "\n"]).join(sentences))
+    return "\n\n".join(out)
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(1000, 100), (200, 50), (60, 0), (40, 40)])
+def test_compat_mode_matches_langchain(chunk_size, chunk_overlap):
+    splitters = pytest.importorskip("langchain_text_splitters")
+    reference = splitters.RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunker = Chunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap, mode="compat")
+
+    rng = random.Random(chunk_size)
+    for _ in range(50):
+        text = _random_text(rng, rng.randint(1, 12))
+        assert chunker.split_text(text) == reference.split_text(text)
+
+
+def test_sentence_mode_prefers_sentence_boundaries():
+    text = "Casa en Tulum con alberca. Tres recámaras y jardín. Precio en USD negociable."
+    chunks = Chunker(chunk_size=40, chunk_overlap=0, mode="sentence").split_text(text)
+
+    assert chunks == ["Casa en Tulum con alberca.", "Tres recámaras y jardín.", "Precio en USD negociable."]
+
+
+def test_token_length_unit():
+    assert count_tokens("Casa, 3 recámaras.") == 5
+    engine = TextChunker(chunk_size=5, chunk_overlap=0, length_unit="tokens")
+    chunks = engine.split_text("uno dos tres cuatro cinco seis siete")
+
+    assert all(count_tokens(chunk) <= 5 for chunk in chunks)
+    assert " ".join(chunks) == "uno dos tres cuatro cinco seis siete"
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        TextChunker(chunk_size=10, chunk_overlap=20)
+    with pytest.raises(ValueError):
+        Chunker(mode="semantic")
+
+
+def test_async_split_uses_process_pool_for_large_texts():
+    text = _random_text(random.Random(7), 40)
+    chunker = Chunker(chunk_size=200, chunk_overlap=20, process_threshold=1000, process_workers=1)
+    chunker.inline_threshold = 100
+    try:
+        chunks = asyncio.run(chunker.asplit_text(text))
+        assert chunker._processes is not None
+        assert chunks == chunker.split_text(text)
+    finally:
+        chunker.close()
+    assert chunker._processes is None
+
+
+def test_cdc_edit_only_changes_local_chunks():
+    text = _random_text(random.Random(3), 300)
+    chunker = Chunker(chunk_size=400, mode="cdc")
+    before = chunker.split_text(text)
+
+    middle = len(text) // 2
+    edited = text[:middle] + " precio rebajado a 120000 USD " + text[middle:]
+    after = chunker.split_text(edited)
+
+    assert len(before) > 20
+    assert all(len(chunk) <= 400 for chunk in after)
+    # Una edición puntual cambia el chunk que la contiene (y a lo sumo su vecino)
+    assert len(set(after) - set(before)) <= 2
+    assert len(set(before) - set(after)) <= 2
+
+
+def test_cdc_requires_character_lengths():
+    with pytest.raises(ValueError):
+        Chunker(mode="cdc", length_unit="tokens")
@@ -0,0 +1,64 @@
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.coalescer import QueryEmbeddingCoalescer
+
+
+class FakeBatchEmbedder:
+    model = "fake-model"
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def embed_queries(self, texts):
+        self.batches.append(list(texts))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("429 Resource exhausted")
+        return [[float(len(t))] for t in texts]
+
+
+def test_concurrent_queries_share_one_provider_call():
+    inner = FakeBatchEmbedder()
+    coalescer = QueryEmbeddingCoalescer(inner, window_ms=20, max_batch=100)
+
+    async def burst():
+        return await asyncio.gather(*(coalescer.embed_query(q) for q in ["hola", "precio", "hola", "tulum"]))
+
+    vectors = asyncio.run(burst())
+
+    assert vectors == [[4.0], [6.0], [4.0], [5.0]]
+    # Una sola llamada, sin duplicados
+    assert inner.batches == [["hola", "precio", "tulum"]]
+    stats = coalescer.stats()
+    assert stats["batches"] == 1 and stats["queries"] == 4
+
+
+def test_max_batch_flushes_without_waiting_for_window():
+    inner = FakeBatchEmbedder()
+    coalescer = QueryEmbeddingCoalescer(inner, window_ms=10_000, max_batch=2)
+
+    async def burst():
+        return await asyncio.wait_for(
+            asyncio.gather(coalescer.embed_query("a"), coalescer.embed_query("bb")),
+            timeout=1,
+        )
+
+    assert asyncio.run(burst()) == [[1.0], [2.0]]
+
+
+def test_provider_errors_reach_every_waiter():
+    coalescer = QueryEmbeddingCoalescer(FakeBatchEmbedder(fail=True), window_ms=5)
+
+    async def burst():
+        return await asyncio.gather(
+            coalescer.embed_query("a"), coalescer.embed_query("b"), return_exceptions=True
+        )
+
+    results = asyncio.run(burst())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert coalescer.stats()["errors"] == 1
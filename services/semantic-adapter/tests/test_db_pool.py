@@ -0,0 +1,142 @@
+import sys
+import os
+import threading
+import time
+import pytest
+import psycopg2
+from psycopg2 import extensions
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db_pool
+from app.db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if self.conn.dead:
+            raise psycopg2.OperationalError("server closed the connection")
+
+
+class FakeInfo:
+    transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.dead = False
+        self.info = FakeInfo()
+        self.configured = 0
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def fake_connect(monkeypatch):
+    created = []
+
+    def connect(dsn):
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    monkeypatch.setattr(db_pool.psycopg2, "connect", connect)
+    return created
+
+
+def _configure(conn):
+    conn.configured += 1
+
+
+def test_pool_reuses_connections_and_configures_once(fake_connect):
+    pool = ConnectionPool("dsn", min_size=1, max_size=2, configure=_configure)
+    pool.open()
+
+    for _ in range(5):
+        with pool.connection() as conn:
+            assert conn.configured == 1
+
+    assert len(fake_connect) == 1
+    stats = pool.stats()
+    assert stats["requests"] == 5
+    assert stats["connections_created"] == 1
+    assert stats["idle"] == 1 and stats["in_use"] == 0
+
+
+def test_pool_is_bounded_and_times_out(fake_connect):
+    pool = ConnectionPool("dsn", min_size=0, max_size=1, timeout=0.05)
+    pool.open()
+
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+
+    assert pool.stats()["timeouts"] == 1
+    assert len(fake_connect) == 1
+
+
+def test_pool_waiter_gets_released_connection(fake_connect):
+    pool = ConnectionPool("dsn", min_size=0, max_size=1, timeout=2)
+    pool.open()
+    got = []
+
+    def worker():
+        with pool.connection() as conn:
+            got.append(conn)
+
+    with pool.connection() as first:
+        t = threading.Thread(target=worker)
+        t.start()
+        time.sleep(0.05)
+    t.join()
+
+    assert got == [first]
+    assert pool.stats()["requests_waiting"] == 1
+
+
+def test_pool_recycles_broken_and_unhealthy_connections(fake_connect):
+    pool = ConnectionPool("dsn", min_size=1, max_size=2, check_idle=0)
+    pool.open()
+
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.connection():
+            raise psycopg2.OperationalError("boom")
+    assert pool.stats()["connections_recycled"] == 1
+
+    with pool.connection() as conn:
+        pass
+    conn.dead = True
+
+    # El health-check detecta la conexión caída y abre una nueva
+    with pool.connection() as fresh:
+        assert fresh is not conn
+    assert pool.stats()["health_check_failures"] == 1
+
+
+def test_pool_recycles_after_max_lifetime(fake_connect):
+    pool = ConnectionPool("dsn", min_size=1, max_size=1, max_lifetime=0.01)
+    pool.open()
+    first = fake_connect[0]
+    time.sleep(0.02)
+
+    with pool.connection() as conn:
+        assert conn is not first
+    assert first.closed
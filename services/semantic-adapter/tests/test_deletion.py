@@ -0,0 +1,106 @@
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.deletion import BatchedDeleter
+
+
+class FakeDeleteRepo:
+    """Chunks en memoria con la interfaz de borrado por lotes de VectorRepository."""
+
+    def __init__(self, rows, layout="none", manifest=None):
+        self.rows = rows
+        self.layout = layout
+        self.manifest = manifest if manifest is not None else {}
+        self.manifest_deleted = []
+        self.batches = []
+        self.vacuumed = []
+
+    def delete_manifest(self, client_id, content_id=None):
+        self.manifest_deleted.append((client_id, content_id))
+        for key in [k for k in self.manifest if k[0] == client_id and (content_id is None or k[1] == content_id)]:
+            del self.manifest[key]
+        return 1
+
+    def _matches(self, row, client_id, content_id):
+        return row["client_id"] == client_id and (content_id is None or row["content_id"] == content_id)
+
+    def count_chunks(self, client_id, content_id=None):
+        return sum(self._matches(row, client_id, content_id) for row in self.rows)
+
+    def chunk_relation(self, client_id):
+        return "semantic_items_p3"
+
+    def delete_chunks_batch(self, client_id, content_id=None, batch_size=1000, with_manifest=False):
+        victims = [row for row in self.rows if self._matches(row, client_id, content_id)][:batch_size]
+        self.rows = [row for row in self.rows if row not in victims]
+        self.batches.append(len(victims))
+        if with_manifest and len(victims) < batch_size:
+            self.delete_manifest(client_id, content_id)
+        return len(victims)
+
+    def vacuum_items(self, relation=None):
+        self.vacuumed.append(relation)
+        return {"relation": relation, "seconds": 0.0}
+
+    def delete_client_data(self, client_id):
+        return 42
+
+
+def _rows():
+    return [{"client_id": "c1", "content_id": f"doc-{i % 3}", "n": i} for i in range(25)] + [
+        {"client_id": "c2", "content_id": "doc-0", "n": 99}
+    ]
+
+
+def test_client_is_deleted_in_bounded_batches_then_vacuumed():
+    repo = FakeDeleteRepo(_rows())
+    updates = []
+
+    async def progress(update):
+        updates.append(update)
+
+    result = asyncio.run(BatchedDeleter(repo, batch_size=10, pause=0).run({"client_id": "c1"}, progress))
+
+    assert result["records_deleted"] == 25
+    assert repo.batches == [10, 10, 5]
+    assert [row["client_id"] for row in repo.rows] == ["c2"]
+    # Al inicio y otra vez en la transacción del último lote
+    assert repo.manifest_deleted == [("c1", None), ("c1", None)]
+    assert repo.vacuumed == ["semantic_items_p3"]
+    assert updates[-1] == {"stage": "vacuum", "deleted": 25, "total": 25, "relation": "semantic_items_p3"}
+
+
+def test_document_delete_skips_vacuum_and_tenant_layout_drops_partition():
+    repo = FakeDeleteRepo(_rows())
+
+    async def progress(update):
+        pass
+
+    result = asyncio.run(
+        BatchedDeleter(repo, batch_size=10, pause=0).run({"client_id": "c1", "content_id": "doc-0"}, progress)
+    )
+    assert result["records_deleted"] == 9 and result["content_id"] == "doc-0"
+    assert repo.vacuumed == []
+
+    tenant = FakeDeleteRepo(_rows(), layout="tenant")
+    result = asyncio.run(BatchedDeleter(tenant, pause=0).run({"client_id": "c1"}, progress))
+    assert result["records_deleted"] == 42 and tenant.batches == []
+
+
+def test_reingest_between_batches_does_not_leave_manifest_without_chunks():
+    repo = FakeDeleteRepo(_rows(), manifest={("c1", "doc-0"): "old"})
+
+    async def progress(update):
+        # Entre el primer y el segundo lote se re-ingesta el documento (manifiesto + chunks nuevos)
+        if update.get("batches") == 1:
+            repo.manifest[("c1", "doc-0")] = "new"
+            repo.rows.append({"client_id": "c1", "content_id": "doc-0", "n": 100})
+
+    asyncio.run(BatchedDeleter(repo, batch_size=5, pause=0).run({"client_id": "c1", "content_id": "doc-0"}, progress))
+
+    # Los chunks de la re-ingesta se borraron: el manifiesto tampoco puede quedar (si no, 'unchanged' sin chunks)
+    assert repo.count_chunks("c1", "doc-0") == 0
+    assert ("c1", "doc-0") not in repo.manifest
@@ -0,0 +1,87 @@
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.diversify import as_matrix, mmr_select, merge_adjacent, diversify
+
+
+def _row(content_id, index, text, similarity, embedding):
+    return {
+        "content_id": content_id,
+        "title": content_id,
+        "body_content": text,
+        "metadata": {"chunk_index": index},
+        "hash": f"{content_id}-{index}",
+        "similarity": similarity,
+        "embedding": embedding,
+    }
+
+
+def test_mmr_prefers_diverse_candidates():
+    vectors = as_matrix([[1, 0, 0], [0.99, 0.01, 0], [0, 1, 0]])
+    relevance = np.array([0.95, 0.94, 0.80], dtype=np.float32)
+
+    assert mmr_select(relevance, vectors, 2, lambda_mult=1.0) == [0, 1]
+    # Con diversidad, el casi duplicado pierde contra un candidato distinto
+    assert mmr_select(relevance, vectors, 2, lambda_mult=0.5) == [0, 2]
+    assert mmr_select(relevance, vectors, 2, lambda_mult=1.0, groups=["a", "a", "b"], max_per_group=1) == [0, 2]
+
+
+def test_merge_adjacent_removes_overlap():
+    overlap = "con alberca y jardín privado"
+    rows = [
+        _row("pdf", 4, "Casa en Tulum " + overlap, 0.9, None),
+        _row("other", 0, "Departamento en Cancún", 0.8, None),
+        _row("pdf", 5, overlap + ", a cinco minutos de la playa", 0.7, None),
+    ]
+
+    merged = merge_adjacent(rows)
+
+    assert [r["content_id"] for r in merged] == ["pdf", "other"]
+    assert merged[0]["body_content"] == "Casa en Tulum con alberca y jardín privado, a cinco minutos de la playa"
+    assert merged[0]["merged_chunks"] == [4, 5]
+    assert merged[0]["similarity"] == 0.9
+
+
+def test_merge_adjacent_follows_prev_chunk_over_stale_positions():
+    # Chunks conservados tras una inserción: chunk_index quedó desplazado, prev_chunk no
+    first = dict(_row("pdf", 3, "Casa en Tulum", 0.9, None), hash="h-a")
+    inserted = dict(_row("pdf", 4, "con cenote", 0.6, None), hash="h-new")
+    kept = dict(_row("pdf", 4, "y jardín privado", 0.8, None), hash="h-b")
+    first["metadata"] = {"chunk_index": 3, "prev_chunk": None}
+    inserted["metadata"] = {"chunk_index": 4, "prev_chunk": "h-a"}
+    kept["metadata"] = {"chunk_index": 4, "prev_chunk": "h-new"}
+
+    merged = merge_adjacent([first, kept, inserted])
+
+    assert len(merged) == 1
+    assert merged[0]["body_content"] == "Casa en Tulum con cenote y jardín privado"
+    assert merge_adjacent([first, kept]) == [first, kept]
+
+
+def test_diversify_groups_cuts_and_strips_embeddings():
+    rows = [
+        _row("pdf", 0, "Tasa fija del 12% anual para la tarjeta Oro", 0.92, [1, 0, 0]),
+        _row("pdf", 1, "la tarjeta Oro no cobra anualidad el primer año", 0.91, [0.98, 0.2, 0]),
+        _row("pdf", 7, "Requisitos para la tarjeta Oro", 0.90, [0.97, 0, 0.2]),
+        _row("faq", 0, "Cómo solicitar un crédito hipotecario", 0.70, [0, 1, 0]),
+        _row("old", 0, "Promoción vencida", 0.20, [0, 0, 1]),
+    ]
+
+    result = diversify(rows, top_k=3, lambda_mult=0.7, max_per_document=2, min_score=0.5)
+
+    assert all("embedding" not in r for r in result)
+    assert sum(1 for r in result if r["content_id"] == "pdf") <= 2
+    assert "old" not in {r["content_id"] for r in result}
+    assert [r["content_id"] for r in result][-1] == "faq"
+
+
+def test_diversify_without_embeddings_only_limits_per_document():
+    rows = [_row("a", i, f"t{i}", 1 - i / 10, None) for i in range(0, 6, 2)] + [_row("b", 0, "x", 0.1, None)]
+
+    result = diversify(rows, top_k=3, max_per_document=1)
+
+    assert [r["content_id"] for r in result] == ["a", "b"]
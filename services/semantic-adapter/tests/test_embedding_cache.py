@@ -0,0 +1,135 @@
+import sys
+import os
+import time
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.embedding_cache import CachedEmbedder, QueryCachedEmbedder, normalize_text, text_hash
+from app.lru_cache import LRUCache
+
+
+class FakeEmbedder:
+    model = "fake-model"
+
+    def __init__(self):
+        self.calls = []
+
+    async def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+    async def embed_query(self, text):
+        self.calls.append(text)
+        return [float(len(text)), 0.5]
+
+
+class FakeCacheRepo:
+    def __init__(self, fail=False):
+        self.rows = {}
+        self.fail = fail
+
+    def get_cached_embeddings(self, model, hashes):
+        if self.fail:
+            raise RuntimeError("db down")
+        return {h: self.rows[(model, h)] for h in hashes if (model, h) in self.rows}
+
+    def put_cached_embeddings(self, model, items):
+        if self.fail:
+            raise RuntimeError("db down")
+        for h, vector in items:
+            self.rows.setdefault((model, h), vector)
+        return len(items)
+
+
+def test_normalization_ignores_whitespace_only_changes():
+    assert normalize_text("  Casa   en\nTulum ") == "Casa en Tulum"
+    assert text_hash("Casa en Tulum") == text_hash("Casa  en\tTulum")
+    assert text_hash("Casa en Tulum") != text_hash("casa en tulum")
+
+
+def test_only_cache_misses_reach_the_provider():
+    inner, repo = FakeEmbedder(), FakeCacheRepo()
+    embedder = CachedEmbedder(inner, repo)
+
+    first = asyncio.run(embedder.embed_documents(["uno", "dos", "uno"]))
+    second = asyncio.run(embedder.embed_documents(["dos", "tres"]))
+
+    # "uno" repetido se embebe una sola vez; "dos" sale del cache en la segunda llamada
+    assert inner.calls == [["uno", "dos"], ["tres"]]
+    assert first == [[3.0, 1.0], [3.0, 1.0], [3.0, 1.0]]
+    assert second == [[3.0, 1.0], [4.0, 1.0]]
+
+    stats = embedder.stats()
+    assert stats["texts"] == 5
+    assert stats["hits"] == 1
+    assert stats["hit_rate"] == 0.2
+
+
+def test_cache_failures_fall_back_to_provider():
+    inner = FakeEmbedder()
+    embedder = CachedEmbedder(inner, FakeCacheRepo(fail=True))
+
+    vectors = asyncio.run(embedder.embed_documents(["hola"]))
+
+    assert vectors == [[4.0, 1.0]]
+    assert embedder.stats()["cache_errors"] == 2
+
+
+def test_lru_cache_evicts_least_recently_used_and_expires():
+    cache = LRUCache(max_entries=2, ttl_seconds=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # "b" es el menos usado
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["expirations"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 2
+
+
+def test_query_cache_serves_repeated_queries_locally():
+    inner = FakeEmbedder()
+    embedder = QueryCachedEmbedder(inner, LRUCache(max_entries=10))
+
+    first = asyncio.run(embedder.embed_query("¿Tienen casas en Tulum?"))
+    second = asyncio.run(embedder.embed_query("  ¿tienen casas   en tulum? "))
+
+    assert first == second
+    assert inner.calls == ["¿Tienen casas en Tulum?"]
+    assert embedder.stats()["local"]["hits"] == 1
+
+
+def test_query_cache_uses_shared_tier_between_replicas():
+    repo = FakeCacheRepo()
+    replica_a = QueryCachedEmbedder(FakeEmbedder(), LRUCache(max_entries=10), repo=repo)
+    inner_b = FakeEmbedder()
+    replica_b = QueryCachedEmbedder(inner_b, LRUCache(max_entries=10), repo=repo)
+
+    asyncio.run(replica_a.embed_query("precio"))
+    vector = asyncio.run(replica_b.embed_query("precio"))
+
+    assert vector == [6.0, 0.5]
+    assert inner_b.calls == []
+    assert replica_b.stats()["shared_hits"] == 1
+
+
+def test_query_cache_batch_only_sends_misses():
+    class BatchEmbedder(FakeEmbedder):
+        async def embed_queries(self, texts):
+            self.calls.append(list(texts))
+            return [[float(len(t)), 0.5] for t in texts]
+
+    inner = BatchEmbedder()
+    embedder = QueryCachedEmbedder(inner, LRUCache(max_entries=10))
+    asyncio.run(embedder.embed_query("hola"))
+
+    vectors = asyncio.run(embedder.embed_queries(["Hola", "precio", "precio"]))
+
+    assert vectors == [[4.0, 0.5], [6.0, 0.5], [6.0, 0.5]]
+    assert inner.calls == ["hola", ["precio"]]
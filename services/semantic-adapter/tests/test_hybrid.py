@@ -0,0 +1,37 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.hybrid import extract_identifiers, is_keyword_query, is_confident_match, reciprocal_rank_fusion
+
+
+def test_identifier_detection():
+    assert extract_identifiers("Casa en Tulum - TUL-123") == ["TUL-123"]
+    assert extract_identifiers("escribir a ventas@inmo.mx") == ["ventas@inmo.mx"]
+    assert is_keyword_query("Banco Azteca")
+    assert not is_keyword_query("quiero una casa con alberca cerca de la playa")
+    # Precios, superficies y años en lenguaje natural no son identificadores
+    for query in ("departamento con alberca por menos de 200000", "casas construidas después de 2015"):
+        assert extract_identifiers(query) == []
+        assert not is_keyword_query(query)
+    assert extract_identifiers("ficha prop_001 y 2015") == ["prop_001"]
+
+
+def test_confident_match_requires_literal_hit():
+    rows = [{"title": "Casa en Tulum - TUL-123", "body_content": "3 recámaras"}]
+    assert is_confident_match("tul-123", rows)
+    assert not is_confident_match("TUL-999", rows)
+    assert is_confident_match("casa en tulum", rows)
+    assert not is_confident_match("casa", [{"title": "Departamento", "body_content": "una casa"}])
+    assert not is_confident_match("TUL-123", [])
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    vector = [{"hash": "a"}, {"hash": "b"}, {"hash": "c"}]
+    lexical = [{"hash": "b"}, {"hash": "c"}]
+
+    fused = reciprocal_rank_fusion([vector, lexical], top_k=2)
+
+    assert [r["hash"] for r in fused] == ["b", "c"]
+    assert 0 < fused[1]["similarity"] <= fused[0]["similarity"] <= 1
@@ -0,0 +1,197 @@
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.jobs import JobWorkerPool
+
+
+class FakeJobRepo:
+    """Cola en memoria con la misma interfaz que VectorRepository (semantic_jobs)."""
+
+    def __init__(self):
+        self.jobs = {}
+
+    def enqueue_job(self, kind, payload, client_id=None, max_attempts=3):
+        job_id = f"job-{len(self.jobs) + 1}"
+        self.jobs[job_id] = {
+            "id": job_id, "kind": kind, "payload": payload, "status": "queued",
+            "attempts": 0, "max_attempts": max_attempts, "progress": None, "retry_in": None,
+        }
+        return job_id
+
+    def claim_job(self, worker_id, lock_timeout=600):
+        for job in self.jobs.values():
+            if job["status"] == "queued":
+                job.update(status="running", attempts=job["attempts"] + 1, locked_by=worker_id)
+                return dict(job)
+        return None
+
+    def _owned(self, job_id, worker_id):
+        job = self.jobs[job_id]
+        return job["status"] == "running" and job["locked_by"] == worker_id
+
+    def update_job_progress(self, job_id, worker_id, progress):
+        if not self._owned(job_id, worker_id):
+            return False
+        self.jobs[job_id]["progress"] = progress
+        return True
+
+    def heartbeat_job(self, job_id, worker_id):
+        self.jobs[job_id]["heartbeats"] = self.jobs[job_id].get("heartbeats", 0) + 1
+        return self._owned(job_id, worker_id)
+
+    def complete_job(self, job_id, worker_id, result):
+        if not self._owned(job_id, worker_id):
+            return False
+        self.jobs[job_id].update(status="succeeded", result=result)
+        return True
+
+    def release_job(self, job_id, worker_id):
+        if not self._owned(job_id, worker_id):
+            return False
+        job = self.jobs[job_id]
+        job.update(status="queued", attempts=max(job["attempts"] - 1, 0), locked_by=None)
+        return True
+
+    def fail_job(self, job_id, worker_id, error, retry_in=None):
+        if not self._owned(job_id, worker_id):
+            return False
+        self.jobs[job_id].update(
+            status="queued" if retry_in is not None else "failed", last_error=error, retry_in=retry_in
+        )
+        return True
+
+
+def test_worker_runs_handler_and_records_progress():
+    repo = FakeJobRepo()
+    job_id = repo.enqueue_job("ingest", {"doc": "a"})
+
+    async def handler(payload, progress):
+        await progress({"stage": "embedding"})
+        return {"status": "success", "doc": payload["doc"]}
+
+    pool = JobWorkerPool(repo, {"ingest": handler}, concurrency=1)
+    assert asyncio.run(pool.run_once("w1")) is True
+    assert asyncio.run(pool.run_once("w1")) is False
+
+    job = repo.jobs[job_id]
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"status": "success", "doc": "a"}
+    assert job["progress"] == {"stage": "embedding"}
+
+
+def test_failed_jobs_are_retried_with_backoff_then_marked_failed():
+    repo = FakeJobRepo()
+    job_id = repo.enqueue_job("ingest", {}, max_attempts=2)
+
+    async def handler(payload, progress):
+        raise RuntimeError("429 Resource exhausted")
+
+    pool = JobWorkerPool(repo, {"ingest": handler}, concurrency=1, backoff_base=4, backoff_max=60)
+
+    asyncio.run(pool.run_once("w1"))
+    assert repo.jobs[job_id]["status"] == "queued"
+    assert 2 <= repo.jobs[job_id]["retry_in"] <= 4
+
+    asyncio.run(pool.run_once("w1"))
+    assert repo.jobs[job_id]["status"] == "failed"
+    assert repo.jobs[job_id]["last_error"] == "429 Resource exhausted"
+    assert pool.stats()["retried"] == 1 and pool.stats()["failed"] == 1
+
+
+def test_worker_pool_drains_queue_concurrently():
+    repo = FakeJobRepo()
+    for i in range(6):
+        repo.enqueue_job("ingest", {"n": i})
+
+    async def handler(payload, progress):
+        await asyncio.sleep(0.01)
+        return {"n": payload["n"]}
+
+    async def run():
+        pool = JobWorkerPool(repo, {"ingest": handler}, concurrency=3, poll_interval=0.01)
+        await pool.start()
+        for _ in range(100):
+            if all(j["status"] == "succeeded" for j in repo.jobs.values()):
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+        return pool.stats()
+
+    stats = asyncio.run(run())
+    assert stats["succeeded"] == 6
+    assert len({j["locked_by"] for j in repo.jobs.values()}) > 1
+
+
+def test_heartbeat_renews_lock_and_lost_lease_discards_outcome():
+    repo = FakeJobRepo()
+    kept = repo.enqueue_job("rebuild", {"steps": 5})
+    stolen = repo.enqueue_job("rebuild", {"steps": 50})
+    runs = []
+
+    async def handler(payload, progress):
+        runs.append(payload["steps"])
+        for _ in range(payload["steps"]):
+            await asyncio.sleep(0.01)
+        return {"done": True}
+
+    async def run():
+        pool = JobWorkerPool(repo, {"rebuild": handler}, concurrency=1, heartbeat_interval=0.005)
+        await pool.run_once("w1")
+
+        # El lock venció y otro worker reclamó el trabajo mientras w1 seguía corriendo
+        async def steal():
+            await asyncio.sleep(0.03)
+            repo.jobs[stolen]["locked_by"] = "w2"
+
+        await asyncio.gather(pool.run_once("w1"), steal())
+        return pool.stats()
+
+    stats = asyncio.run(run())
+    assert repo.jobs[kept]["status"] == "succeeded" and repo.jobs[kept]["heartbeats"] >= 1
+    # w1 dejó de ejecutar y no pisó el estado del nuevo dueño
+    assert repo.jobs[stolen]["status"] == "running" and "result" not in repo.jobs[stolen]
+    assert stats["lease_lost"] == 1 and stats["succeeded"] == 1 and runs == [5, 50]
+
+
+def test_progress_after_lost_lease_stops_the_handler():
+    repo = FakeJobRepo()
+    job_id = repo.enqueue_job("delete", {})
+    batches = []
+
+    async def handler(payload, progress):
+        for batch in range(3):
+            batches.append(batch)
+            repo.jobs[job_id]["locked_by"] = "w2"
+            await progress({"batch": batch})
+        return {"done": True}
+
+    pool = JobWorkerPool(repo, {"delete": handler}, concurrency=1)
+    assert asyncio.run(pool.run_once("w1")) is True
+    assert batches == [0] and repo.jobs[job_id]["status"] == "running"
+    assert pool.stats()["lease_lost"] == 1
+
+
+def test_shutdown_returns_running_job_without_spending_an_attempt():
+    repo = FakeJobRepo()
+    job_id = repo.enqueue_job("rebuild", {}, max_attempts=2)
+
+    async def handler(payload, progress):
+        await asyncio.sleep(10)
+
+    async def run():
+        pool = JobWorkerPool(repo, {"rebuild": handler}, concurrency=1, poll_interval=0.01)
+        await pool.start()
+        while repo.jobs[job_id]["status"] != "running":
+            await asyncio.sleep(0.01)
+        # Despliegue: el apagado no espera al trabajo y lo cancela
+        await pool.stop(timeout=0.01)
+
+    for _ in range(3):
+        asyncio.run(run())
+
+    job = repo.jobs[job_id]
+    # Tres despliegues con max_attempts=2: sigue en la cola y sin errores registrados
+    assert job["status"] == "queued" and job["attempts"] == 0 and "last_error" not in job
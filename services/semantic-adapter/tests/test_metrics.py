@@ -0,0 +1,70 @@
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+import sys
+import os
+import asyncio
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from app.metrics import TenantLabels, InstrumentedEmbedder
+from app.embedder import FakeEmbedder
+from app.scheduler import RateLimitError
+
+client = TestClient(app)
+
+
+@patch("app.api.embedder")
+@patch("app.api.repo")
+def test_search_reports_stage_timings_and_metrics(mock_repo, mock_embedder):
+    mock_embedder.embed_query = AsyncMock(return_value=[0.1, 0.2, 0.3])
+    mock_repo.search_similar.return_value = [{
+        "content_id": "fin-1", "title": "Tarjeta", "body_content": "Tasa", "metadata": {}, "similarity": 0.9,
+    }]
+
+    response = client.post("/api/v1/search", json={"query_text": "tarjeta de crédito", "client_id": "client-123"})
+
+    assert response.status_code == 200
+    stages = [entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")]
+    assert {"embedding", "db_search", "threadpool_wait", "serialization", "total"} <= set(stages)
+
+    exposition = client.get("/metrics").text
+    assert 'semantic_stage_seconds_count{endpoint="/api/v1/search",stage="embedding",tenant=""}' in exposition
+    assert 'semantic_request_seconds_count{endpoint="/api/v1/search",method="POST",status="200",tenant=""}' in exposition
+    assert 'semantic_requests_in_flight{endpoint="/api/v1/search"} 0.0' in exposition
+    assert 'semantic_component_stat{component="job_workers",stat="concurrency"}' in exposition
+
+
+def test_path_parameters_do_not_create_endpoint_series():
+    with patch("app.api.repo") as mock_repo:
+        mock_repo.delete_document.return_value = 1
+        client.delete("/api/v1/client/client-123/document/doc-9")
+
+    exposition = client.get("/metrics").text
+    assert 'endpoint="/api/v1/client/{client_id}/document/{content_id}"' in exposition
+    assert "doc-9" not in exposition
+
+
+def test_tenant_labels_are_capped():
+    labels = TenantLabels(enabled=True, max_tenants=2)
+    assert [labels.label(t) for t in ("a", "b", "c", "a")] == ["a", "b", "other", "a"]
+    assert TenantLabels(enabled=False).label("a") == ""
+
+
+def test_instrumented_embedder_counts_rate_limits():
+    from app.metrics import EMBEDDING_PROVIDER_ERRORS, EMBEDDING_BATCH_SIZE
+
+    embedder = InstrumentedEmbedder(FakeEmbedder(dimensions=8, rpm=1, window=60))
+    rate_limited = EMBEDDING_PROVIDER_ERRORS.labels("documents", "rate_limited")
+    before = rate_limited._value.get()
+    batches = EMBEDDING_BATCH_SIZE.labels("documents")._sum.get()
+
+    asyncio.run(embedder.embed_documents(["uno", "dos", "tres"]))
+    with pytest.raises(RateLimitError):
+        asyncio.run(embedder.embed_documents(["cuatro"]))
+
+    assert rate_limited._value.get() == before + 1
+    assert EMBEDDING_BATCH_SIZE.labels("documents")._sum.get() == batches + 4
+    assert embedder.model == "fake-embedding"
@@ -0,0 +1,193 @@
+import sys
+import os
+import io
+import json
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.pipeline import IngestPipeline, build_chunk_rows, chunk_ids
+from app.models import CanonicalDocument
+
+
+class FakeChunker:
+    def split_text(self, text):
+        return [part for part in text.split("|") if part]
+
+
+class FakeEmbedder:
+    def __init__(self, fail_on=None):
+        self.calls = []
+        self.fail_on = fail_on
+
+    async def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        if self.fail_on and any(self.fail_on in t for t in texts):
+            raise RuntimeError("quota exceeded")
+        return [[float(len(t))] for t in texts]
+
+
+class ContentChunker(FakeChunker):
+    content_defined = True
+
+
+class FakeRepo:
+    def __init__(self, known=None, stored=None):
+        self.batches = []
+        self.known = known or {}
+        self.stored = stored or {}
+
+    def get_document_hashes(self, keys):
+        return {key: self.known[key] for key in keys if key in self.known}
+
+    def get_chunk_hashes(self, keys):
+        return {key: self.stored[key] for key in keys if key in self.stored}
+
+    def replace_documents(self, documents):
+        keys = [(m["client_id"], m["content_id"]) for m, _ in documents]
+        if len(set(keys)) != len(keys):
+            # Como Postgres: ON CONFLICT DO UPDATE no puede afectar la misma fila dos veces
+            raise RuntimeError("ON CONFLICT DO UPDATE command cannot affect row a second time")
+        self.batches.append([row for _, rows in documents for row in rows])
+        return [
+            {"client_id": m["client_id"], "content_id": m["content_id"], "upserted": len(rows), "inserted": len(rows), "deleted": 0}
+            for m, rows in documents
+        ]
+
+
+def _doc(content_id, body):
+    return {
+        "content_id": content_id,
+        "source": "property_catalog",
+        "title": content_id,
+        "body_content": body,
+        "metadata": {"client_id": "c1"},
+        "hash": f"hash-{content_id}",
+    }
+
+
+def _run(pipeline, lines):
+    source = io.BytesIO("\n".join(lines).encode() + b"\n")
+
+    async def collect():
+        return [status async for status in pipeline.run(source)]
+
+    return asyncio.run(collect())
+
+
+def test_pipeline_batches_embeddings_and_writes():
+    embedder, repo = FakeEmbedder(), FakeRepo()
+    pipeline = IngestPipeline(FakeChunker(), embedder, repo, embed_batch_size=4, write_batch_rows=100)
+
+    lines = [json.dumps(_doc(f"doc-{i}", "a|bb|ccc")) for i in range(5)]
+    statuses = _run(pipeline, lines)
+
+    summary = statuses[-1]["summary"]
+    assert summary == {
+        "documents": 5, "success": 5, "unchanged": 0, "ignored": 0, "superseded": 0, "error": 0,
+        "db_records_upserted": 15, "db_records_deleted": 0,
+    }
+    # 15 chunks en lotes de como máximo 4 textos
+    assert all(len(call) <= 4 for call in embedder.calls)
+    assert sum(len(call) for call in embedder.calls) == 15
+    # Pocas transacciones para muchos documentos
+    assert sum(len(batch) for batch in repo.batches) == 15
+    assert len(repo.batches) < 5
+
+
+def test_pipeline_splits_large_document_across_batches():
+    embedder, repo = FakeEmbedder(), FakeRepo()
+    pipeline = IngestPipeline(FakeChunker(), embedder, repo, embed_batch_size=2)
+
+    body = "|".join(f"chunk{i}" for i in range(7))
+    statuses = _run(pipeline, [json.dumps(_doc("big", body))])
+
+    assert statuses[0]["status"] == "success"
+    assert statuses[0]["chunks_processed"] == 7
+    rows = [row for batch in repo.batches for row in batch]
+    assert [data["body_content"] for data, _ in rows] == [f"chunk{i}" for i in range(7)]
+    assert [vector for _, vector in rows] == [[6.0]] * 7
+
+
+def test_pipeline_reports_invalid_empty_and_failed_documents():
+    embedder, repo = FakeEmbedder(fail_on="boom"), FakeRepo()
+    pipeline = IngestPipeline(FakeChunker(), embedder, repo, embed_batch_size=1)
+
+    lines = [
+        "{not json",
+        json.dumps(_doc("empty", "")),
+        json.dumps(_doc("bad", "boom")),
+        json.dumps(_doc("ok", "fine")),
+    ]
+    statuses = _run(pipeline, lines)
+    by_line = {s["line"]: s for s in statuses if "line" in s}
+
+    assert by_line[1]["status"] == "error"
+    assert by_line[2]["status"] == "ignored"
+    assert by_line[3]["status"] == "error" and "quota exceeded" in by_line[3]["detail"]
+    assert by_line[4]["status"] == "success"
+    assert statuses[-1]["summary"]["error"] == 2
+
+
+def test_pipeline_skips_unchanged_documents():
+    embedder = FakeEmbedder()
+    repo = FakeRepo(known={("c1", "same"): "hash-same", ("c1", "changed"): "old-hash"})
+    pipeline = IngestPipeline(FakeChunker(), embedder, repo)
+
+    statuses = _run(pipeline, [json.dumps(_doc("same", "a|b")), json.dumps(_doc("changed", "c"))])
+    by_doc = {s["document_id"]: s["status"] for s in statuses if "document_id" in s}
+
+    assert by_doc == {"same": "unchanged", "changed": "success"}
+    assert embedder.calls == [["c"]]
+
+
+def test_pipeline_only_embeds_changed_chunks_with_content_ids():
+    previous = CanonicalDocument(**_doc("edited", "intro|precio 100|cierre"))
+    stored = set(chunk_ids(previous, ["intro", "precio 100", "cierre"], content_defined=True))
+    embedder = FakeEmbedder()
+    repo = FakeRepo(known={("c1", "edited"): "old-hash"}, stored={("c1", "edited"): stored})
+    pipeline = IngestPipeline(ContentChunker(), embedder, repo)
+
+    statuses = _run(pipeline, [json.dumps(_doc("edited", "intro|precio 90|cierre"))])
+
+    assert statuses[0]["status"] == "success"
+    assert statuses[0]["chunks_embedded"] == 1
+    assert embedder.calls == [["precio 90"]]
+    rows = repo.batches[0]
+    # Los chunks sin cambios viajan sin vector: el repositorio los conserva
+    assert [(data["body_content"], vector) for data, vector in rows] == [
+        ("intro", None), ("precio 90", [9.0]), ("cierre", None)
+    ]
+    assert [data["hash"] in stored for data, _ in rows] == [True, False, True]
+
+
+def test_insertion_only_changes_compared_metadata_next_to_the_edit():
+    doc = CanonicalDocument(**_doc("long", "x"))
+    before = ["c1", "c2", "c3", "c4"]
+    after = ["nuevo", "c1", "c2", "c3", "c4"]
+
+    def compared(chunks):
+        rows = build_chunk_rows(doc, chunks, [None] * len(chunks), chunk_ids(doc, chunks, content_defined=True))
+        # chunk_index no cuenta al conservar chunks (VectorRepository._refresh_chunks_query)
+        return {data["hash"]: {k: v for k, v in data["metadata"].items() if k != "chunk_index"} for data, _ in rows}
+
+    old, new = compared(before), compared(after)
+    changed = [h for h in old if old[h] != new[h]]
+    # Solo "c1" cambia de chunk anterior; c2..c4 no se reescriben aunque se desplazó su posición
+    assert len(changed) == 1 and new[changed[0]]["prev_chunk"] is not None
+
+
+def test_repeated_document_in_one_flush_keeps_the_last_line():
+    embedder, repo = FakeEmbedder(), FakeRepo()
+    # Intervalo largo: las tres líneas llegan a la misma escritura
+    pipeline = IngestPipeline(FakeChunker(), embedder, repo, write_batch_rows=100, flush_interval=0.5)
+
+    first, last = _doc("dup", "v1"), dict(_doc("dup", "v2|extra"), hash="hash-dup-v2")
+    statuses = _run(pipeline, [json.dumps(first), json.dumps(_doc("other", "x")), json.dumps(last)])
+    by_line = {s["line"]: s for s in statuses if "line" in s}
+
+    assert by_line[1]["status"] == "superseded" and by_line[1]["superseded_by"] == 3
+    assert by_line[2]["status"] == "success" and by_line[3]["status"] == "success"
+    assert statuses[-1]["summary"]["superseded"] == 1 and statuses[-1]["summary"]["error"] == 0
+    written = [data["body_content"] for batch in repo.batches for data, _ in batch if data["content_id"] == "dup"]
+    assert written == ["v2", "extra"]
@@ -0,0 +1,188 @@
+import sys
+import os
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import migrations
+from app.readiness import ReadinessProbe
+from app.scheduler import RateLimitError
+from app.vector_repo import VectorRepository
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self._result = None
+
+    def execute(self, sql, params=None):
+        self.db.statements.append(sql.strip())
+        if "to_regclass" in sql:
+            self._result = (self.db.has_versions,)
+        elif "max(version)" in sql:
+            self._result = (self.db.version,)
+        elif sql.lstrip().startswith("INSERT INTO semantic_schema_migrations"):
+            self.db.version = params[0]
+        elif "CREATE TABLE IF NOT EXISTS semantic_schema_migrations" in sql:
+            self.db.has_versions = True
+
+    def fetchone(self):
+        return self._result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    """Conexión psycopg2 mínima: registra el SQL y simula la tabla de versiones."""
+
+    def __init__(self, version=None):
+        self.has_versions = version is not None
+        self.version = version or 0
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def test_pending_migrations_are_applied_under_advisory_lock():
+    applied = []
+    repo = VectorRepository()
+    conn = FakeConnection()
+    original = migrations.MIGRATIONS
+    migrations.MIGRATIONS = [migrations.Migration(1, "baseline", lambda r, cur: applied.append(1))]
+    try:
+        result = migrations.migrate(repo, conn)
+        again = migrations.migrate(repo, conn)
+    finally:
+        migrations.MIGRATIONS = original
+
+    assert result["applied"] == ["baseline"] and result["version"] == 1
+    # La segunda corrida no reaplica (la versión quedó registrada)
+    assert again["applied"] == [] and applied == [1]
+    assert conn.statements[0].startswith("SELECT pg_advisory_lock")
+    assert conn.statements[-1].startswith("SELECT pg_advisory_unlock")
+
+
+def test_current_schema_opens_without_ddl(monkeypatch):
+    repo = VectorRepository()
+    conn = FakeConnection(version=migrations.LATEST_VERSION)
+    monkeypatch.setattr(repo, "_resolve_layout", lambda cur: "none")
+    monkeypatch.setattr(repo.pool, "connection", lambda: _context(conn))
+
+    repo._ensure_schema()
+    assert not any(s.startswith(("CREATE", "ALTER")) for s in conn.statements)
+
+    # Esquema atrasado sin migración al abrir: falla con un mensaje accionable
+    repo.migrate_on_start = False
+    conn.version = 0
+    with pytest.raises(migrations.SchemaOutdatedError, match="app.migrations upgrade"):
+        repo._ensure_schema()
+
+
+class _context:
+    def __init__(self, value):
+        self.value = value
+
+    def __enter__(self):
+        return self.value
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeRepo:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.opened = False
+
+    def open(self):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connection refused")
+        self.opened = True
+
+    def ping(self):
+        if not self.opened:
+            raise RuntimeError("repository is not open")
+
+    def pool_stats(self):
+        return {}
+
+
+class FakeProvider:
+    def __init__(self, error=None):
+        self.error = error
+        self.warmed = False
+        self.probes = 0
+
+    async def warmup(self):
+        self.warmed = True
+
+    async def embed_query(self, text):
+        self.probes += 1
+        if self.error:
+            raise self.error
+        return [0.0]
+
+
+def test_warmup_retries_database_and_gates_readiness():
+    started = []
+
+    async def on_ready():
+        started.append(True)
+
+    async def run():
+        provider = FakeProvider()
+        probe = ReadinessProbe(FakeRepo(failures=2), provider, on_db_ready=[on_ready], retry_max=0.01)
+        before = await probe.check()
+        await probe.start()
+        await probe.wait()
+        after = await probe.check()
+        await probe.check()
+        await probe.stop()
+        return before, after, provider
+
+    before, after, provider = asyncio.run(run())
+    assert not before["ready"] and before["checks"]["db"]["status"] == "starting"
+    assert after["ready"] and after["checks"]["db"]["status"] == "ok"
+    assert after["checks"]["embedder"]["status"] == "ok"
+    # Workers arrancados una vez con la base lista; el probe real del proveedor se cachea (TTL)
+    assert started == [True] and provider.warmed and provider.probes == 1
+
+
+def test_rate_limited_embedder_is_degraded_but_ready():
+    async def run(error):
+        probe = ReadinessProbe(FakeRepo(), FakeProvider(error), retry_max=0.01)
+        await probe.start()
+        await probe.wait()
+        return await probe.check()
+
+    throttled = asyncio.run(run(RateLimitError("429 Resource has been exhausted")))
+    assert throttled["ready"] and throttled["checks"]["embedder"]["status"] == "degraded"
+
+    invalid_key = asyncio.run(run(ValueError("400 API key not valid")))
+    assert not invalid_key["ready"] and invalid_key["checks"]["embedder"]["status"] == "error"
+
+
+def test_liveness_and_readiness_endpoints():
+    from main import app
+
+    client = TestClient(app)
+    assert client.get("/livez").status_code == 200
+    # Sin lifespan no hay warm-up: la réplica no está lista
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["checks"]["db"]["status"] == "starting"
@@ -0,0 +1,54 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.lru_cache import LRUCache
+from app.result_cache import SearchResultCache
+
+
+def _rows(*hashes):
+    return [{"hash": h, "similarity": 0.9 - i * 0.1, "content_id": h} for i, h in enumerate(hashes)]
+
+
+def test_key_normalizes_query_and_filters():
+    key = SearchResultCache.key
+    assert key("c1", "Casa  en Tulum ", "vector", 5, 5, {"category": "a", "source": "b"}, None) == key(
+        "c1", "casa en tulum", "vector", 5, 5, {"source": "b", "category": "a"}, None
+    )
+    assert key("c1", "casa", "vector", 5, 5, None, None) != key("c1", "casa", "vector", 10, 10, None, None)
+
+
+def test_generation_bump_invalidates_only_that_tenant():
+    cache = SearchResultCache(LRUCache(max_entries=10))
+    k1 = cache.key("c1", "casa", "vector", 2, 2, None, None)
+    k2 = cache.key("c2", "casa", "vector", 2, 2, None, None)
+    cache.set(k1, cache.generation("c1"), "vector", _rows("h1", "h2"))
+    cache.set(k2, cache.generation("c2"), "vector", _rows("h3"))
+
+    assert cache.get(k1) == ("vector", [("h1", 0.9), ("h2", 0.8)])
+    cache.invalidate("c1")
+    assert cache.get(k1) is None
+    assert cache.get(k2) == ("vector", [("h3", 0.9)])
+
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["stale"] == 1
+    assert stats["hit_rate"] == round(2 / 3, 4)
+
+
+def test_ranking_computed_during_a_write_is_not_served():
+    cache = SearchResultCache(LRUCache(max_entries=10))
+    key = cache.key("c1", "casa", "vector", 1, 1, None, None)
+    generation = cache.generation("c1")
+    # Una ingesta termina mientras la búsqueda estaba en curso
+    cache.invalidate("c1")
+    cache.set(key, generation, "vector", _rows("h1"))
+    assert cache.get(key) is None
+
+
+def test_memory_is_bounded_by_lru():
+    cache = SearchResultCache(LRUCache(max_entries=2))
+    keys = [cache.key("c1", f"q{i}", "vector", 1, 1, None, None) for i in range(3)]
+    for key in keys:
+        cache.set(key, 0, "vector", _rows("h"))
+    assert cache.get(keys[0]) is None and cache.stats()["evictions"] == 1
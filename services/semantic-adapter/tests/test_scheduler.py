@@ -0,0 +1,82 @@
+import sys
+import os
+import time
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.embedder import FakeEmbedder
+from app.scheduler import EmbeddingScheduler, TokenBucket
+
+
+class RecordingEmbedder(FakeEmbedder):
+    def __init__(self, **kwargs):
+        super().__init__(dimensions=4, **kwargs)
+        self.batches = []
+
+    async def _embed(self, texts):
+        vectors = await super()._embed(texts)
+        self.batches.append(list(texts))
+        return vectors
+
+
+def test_large_requests_are_split_to_provider_batch_limit():
+    fake = RecordingEmbedder(max_batch=10)
+    scheduler = EmbeddingScheduler(fake, rpm=0, tpm=0, max_batch=10)
+    texts = [f"chunk {i}" for i in range(35)]
+
+    vectors = asyncio.run(scheduler.embed_documents(texts))
+
+    assert vectors == [fake.vector(t) for t in texts]
+    assert max(len(b) for b in fake.batches) <= 10
+    assert scheduler.stats()["requests"] == 4
+
+
+def test_token_bucket_keeps_traffic_under_quota():
+    fake = RecordingEmbedder(rpm=5, window=0.4)
+    scheduler = EmbeddingScheduler(fake, rpm=4, tpm=0, max_batch=1, window=0.4, burst=0.25)
+
+    started = time.monotonic()
+    asyncio.run(scheduler.embed_documents([f"t{i}" for i in range(6)]))
+
+    # 1 de ráfaga + 5 al ritmo de recarga (0.1 s c/u), sin ningún 429
+    assert fake.stats["rate_limited"] == 0
+    assert fake.stats["requests"] == 6
+    assert time.monotonic() - started >= 0.45
+
+
+def test_rate_limits_shrink_batches_and_are_retried():
+    fake = RecordingEmbedder(rpm=2, window=0.3, max_batch=20)
+    # Sin presupuesto local: el scheduler solo aprende de los 429 del proveedor
+    scheduler = EmbeddingScheduler(fake, rpm=0, tpm=0, max_batch=20, backoff_base=0.05, max_retries=10)
+    texts = [f"doc {i}" for i in range(60)]
+
+    vectors = asyncio.run(scheduler.embed_documents(texts))
+
+    assert vectors == [fake.vector(t) for t in texts]
+    stats = scheduler.stats()
+    assert stats["rate_limited"] >= 1
+    assert stats["batch_size"] < 20
+
+
+def test_queries_preempt_queued_ingest_batches():
+    fake = RecordingEmbedder(latency_ms=20)
+    scheduler = EmbeddingScheduler(fake, rpm=0, tpm=0, max_batch=1, max_concurrency=1)
+
+    async def run():
+        ingest = asyncio.create_task(scheduler.embed_documents([f"doc {i}" for i in range(5)]))
+        await asyncio.sleep(0.005)
+        await scheduler.embed_query("precio casa tulum")
+        await ingest
+
+    asyncio.run(run())
+
+    order = [b[0] for b in fake.batches]
+    assert order.index("precio casa tulum") <= 1
+
+
+def test_token_bucket_refills_continuously():
+    bucket = TokenBucket(rate=60, window=60)
+    bucket.consume(60)
+    assert 0.9 <= bucket.delay(1) <= 1.0
+    assert TokenBucket(rate=0).delay(10 ** 6) == 0
@@ -0,0 +1,155 @@
+import sys
+import os
+import json
+import uuid
+import struct
+import pytest
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.transfer import (
+    COPY_HEADER, COPY_TRAILER, TenantArchive, encode_copy_rows, export_tenant, import_archive
+)
+
+CLIENT = str(uuid.uuid4())
+
+
+class FakeExportRepo:
+    """Chunks en memoria con la interfaz de lectura de VectorRepository.iter_tenant_export."""
+
+    def __init__(self, rows, documents):
+        self.rows = rows
+        self.documents = documents
+        self.closed = False
+
+    def iter_tenant_export(self, client_id, batch_size):
+        try:
+            yield {"count": len(self.rows), "documents": self.documents}
+            for start in range(0, len(self.rows), batch_size):
+                yield self.rows[start:start + batch_size]
+        finally:
+            self.closed = True
+
+
+class FakeImportRepo:
+    def __init__(self):
+        self.calls = []
+
+    def import_tenant(self, client_id, copy_source, documents, mode):
+        self.calls.append((client_id, copy_source.read(), documents, mode))
+        return {"chunks_imported": 0, "chunks_replaced": 0, "documents": len(documents)}
+
+
+def _rows(count, dim=768):
+    rng = np.random.default_rng(7)
+    return [
+        {
+            "content_id": f"doc-{i // 2}",
+            "source": "pdf_upload",
+            "title": None if i == 0 else f"Título {i}",
+            "body_content": f"Cláusula {i}: el depósito se reembolsa en treinta días",
+            "metadata": {"client_id": CLIENT, "chunk_index": i % 2},
+            "hash": f"h-{i}",
+            "embedding": rng.standard_normal(dim).astype(np.float32),
+        }
+        for i in range(count)
+    ]
+
+
+def _export(tmp_path, rows, dtype, documents=()):
+    path = tmp_path / f"tenant-{dtype}.semvec"
+    repo = FakeExportRepo(rows, list(documents))
+    with open(path, "wb") as out:
+        for chunk in export_tenant(repo, CLIENT, dtype, model="models/text-embedding-004", batch_size=2):
+            out.write(chunk)
+    assert repo.closed
+    return TenantArchive(str(path))
+
+
+@pytest.mark.parametrize("dtype,tolerance", [("float32", 0), ("float16", 1e-2)])
+def test_export_roundtrip_keeps_records_and_embeddings(tmp_path, dtype, tolerance):
+    rows = _rows(5)
+    documents = [{"content_id": "doc-0", "doc_hash": "d0", "chunk_count": 2}]
+    archive = _export(tmp_path, rows, dtype, documents)
+
+    assert archive.header["count"] == 5 and archive.header["dim"] == 768
+    assert archive.header["model"] == "models/text-embedding-004"
+    # Embeddings contiguos y memory-mapped (sin cargar el archivo)
+    assert isinstance(archive.embeddings, np.memmap) and archive.embeddings.shape == (5, 768)
+    np.testing.assert_allclose(archive.embeddings, np.stack([r["embedding"] for r in rows]), atol=tolerance)
+
+    batches = list(archive.iter_batches(batch_size=3))
+    assert [len(records) for records, _ in batches] == [3, 2]
+    assert batches[1][0][0] == {k: v for k, v in rows[3].items() if k != "embedding"}
+    assert archive.documents() == documents
+
+
+def test_float16_halves_the_embedding_section(tmp_path):
+    rows = _rows(4)
+    full, half = _export(tmp_path, rows, "float32"), _export(tmp_path, rows, "float16")
+    assert full.records_offset - full.embeddings_offset == 4 * 768 * 4
+    assert half.records_offset - half.embeddings_offset == 4 * 768 * 2
+    assert half.embeddings_offset % 64 == 0
+
+
+def test_empty_tenant_and_truncated_archive(tmp_path):
+    archive = _export(tmp_path, [], "float16")
+    assert archive.count == 0 and list(archive.iter_batches()) == []
+
+    path = tmp_path / "truncated.semvec"
+    data = open(archive.path, "rb").read()
+    path.write_bytes(data[:-10])
+    with pytest.raises(ValueError, match="Truncated"):
+        TenantArchive(str(path))
+
+
+def _decode_copy_row(data, offset):
+    (fields,) = struct.unpack_from(">h", data, offset)
+    offset += 2
+    values = []
+    for _ in range(fields):
+        (length,) = struct.unpack_from(">i", data, offset)
+        offset += 4
+        if length < 0:
+            values.append(None)
+            continue
+        values.append(data[offset:offset + length])
+        offset += length
+    return values, offset
+
+
+def test_copy_rows_use_postgres_binary_formats():
+    rows = _rows(2, dim=3)
+    data = encode_copy_rows(CLIENT, rows, np.stack([r["embedding"] for r in rows]))
+
+    first, offset = _decode_copy_row(data, 0)
+    second, end = _decode_copy_row(data, offset)
+    assert end == len(data)
+    assert uuid.UUID(bytes=first[0]) == uuid.UUID(CLIENT)
+    assert first[3] is None and second[3] == "Título 1".encode("utf-8")
+    # jsonb: byte de versión 1 + texto
+    assert first[5][0] == 1 and json.loads(first[5][1:]) == rows[0]["metadata"]
+    # vector de pgvector: dim int16, reservado int16, float4 big-endian
+    dim, unused = struct.unpack_from(">hh", first[7])
+    assert (dim, unused) == (3, 0)
+    np.testing.assert_array_equal(np.frombuffer(first[7][4:], dtype=">f4"), rows[0]["embedding"])
+
+
+def test_import_streams_copy_and_can_retarget_tenant(tmp_path):
+    archive = _export(tmp_path, _rows(3), "float16", [{"content_id": "doc-0", "doc_hash": "d0", "chunk_count": 2}])
+    repo = FakeImportRepo()
+    target = str(uuid.uuid4())
+
+    result = import_archive(repo, archive, target, mode="merge", batch_size=2)
+
+    client_id, stream, documents, mode = repo.calls[0]
+    assert (client_id, mode, result["source_client_id"]) == (target, "merge", CLIENT)
+    assert stream.startswith(COPY_HEADER) and stream.endswith(COPY_TRAILER)
+    row, _ = _decode_copy_row(stream, len(COPY_HEADER))
+    assert uuid.UUID(bytes=row[0]) == uuid.UUID(target)
+    assert json.loads(row[5][1:])["client_id"] == target
+    assert documents == [{"content_id": "doc-0", "doc_hash": "d0", "chunk_count": 2}]
+
+    with pytest.raises(ValueError, match="mode"):
+        import_archive(repo, archive, mode="upsert")
@@ -0,0 +1,370 @@
+import sys
+import os
+import uuid
+import random
+import contextlib
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.vector_repo import VectorRepository
+
+# Las pruebas de integración requieren un Postgres + pgvector dedicado
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+requires_db = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+
+def test_filter_clause_builds_parameterized_sql():
+    sql, params = VectorRepository._filter_clause(
+        {"category": "financial_products", "source": "bank_feed", "metadata": {"currency": "USD"}}
+    )
+    assert sql == " AND metadata->>'category' = %s AND source = %s AND metadata @> %s::jsonb"
+    assert params[:2] == ["financial_products", "bank_feed"]
+    assert VectorRepository._filter_clause(None) == ("", [])
+
+
+def test_similarity_query_orders_by_indexed_expression():
+    repo = VectorRepository()
+    query, params = repo._similarity_query("client", [0.1, 0.2], 3, {"category": "faq"})
+
+    # El ORDER BY interno debe ser la expresión del índice, no un alias calculado
+    assert "ORDER BY embedding <=> %s::vector" in query
+    assert "similarity DESC" not in query
+    assert params[-1] == 3
+    assert query.count("%s") == len(params)
+
+
+def test_compact_storage_reranks_index_candidates(monkeypatch):
+    monkeypatch.setenv("VECTOR_STORAGE_MODE", "binary")
+    monkeypatch.setenv("VECTOR_RERANK_FACTOR", "5")
+    repo = VectorRepository()
+
+    ddl = repo._items_ddl("none")
+    assert "semantic_items_embedding_binary_idx" in ddl
+    assert "binary_quantize(embedding)::bit(768)) bit_hamming_ops" in ddl
+
+    query, params = repo._similarity_query("client", [0.1, 0.2], 3, None)
+    # Candidatos por la expresión indexada, orden final por el vector completo
+    assert "ORDER BY binary_quantize(embedding)::bit(768) <~> binary_quantize(%s::vector)" in query
+    assert "ORDER BY embedding <=> %s::vector" in query
+    assert params[-3:-1] == [15, [0.1, 0.2]] and params[-1] == 3
+    assert query.count("%s") == len(params)
+
+
+def test_lexical_query_uses_spanish_tsvector():
+    repo = VectorRepository()
+    query, params = repo._lexical_query("client", "TUL-123", 4, {"source": "crm"})
+
+    assert "search_tsv @@ q.tsq" in query
+    assert "websearch_to_tsquery('spanish', %s)" in query
+    assert query.count("%s") == len(params)
+    assert "USING gin (search_tsv)" in repo._items_ddl("none")
+
+
+def test_partitioned_layouts_scope_unique_keys_to_tenant(monkeypatch):
+    monkeypatch.setenv("SEMANTIC_PARTITIONING", "tenant")
+    repo = VectorRepository()
+    ddl = repo._items_ddl("tenant")
+
+    assert "PARTITION BY LIST (client_id)" in ddl
+    assert "UNIQUE (client_id, hash)" in ddl
+    assert "_client_idx" not in ddl
+    assert repo._conflict_target == "(client_id, hash)"
+    assert "PARTITION BY HASH (client_id)" in repo._items_ddl("hash")
+
+    client_id = "6F9619FF-8B86-D011-B42D-00C04FC964FF"
+    assert repo._partition_name(client_id) == "semantic_items_t_6f9619ff8b86d011b42d00c04fc964ff"
+
+
+def test_refresh_of_kept_chunks_ignores_chunk_position():
+    query = VectorRepository()._refresh_chunks_query("VALUES %s")
+
+    assert "t.metadata - 'chunk_index' IS DISTINCT FROM v.metadata - 'chunk_index'" in query
+    assert "metadata = v.metadata" in query
+
+
+def test_replace_documents_rejects_repeated_documents():
+    repo = VectorRepository()
+    manifest = {"client_id": "c1", "content_id": "doc", "hash": "v1"}
+
+    # Se rechaza antes de abrir una conexión
+    with pytest.raises(ValueError, match="doc of client c1 appears more than once"):
+        repo.replace_documents([(manifest, []), (dict(manifest, hash="v2"), [])])
+
+
+def test_hnsw_build_parameters_and_bulk_load_ddl(monkeypatch):
+    monkeypatch.setenv("HNSW_M", "24")
+    monkeypatch.setenv("HNSW_EF_CONSTRUCTION", "128")
+    repo = VectorRepository()
+
+    assert "USING hnsw (embedding vector_cosine_ops) WITH (m = 24, ef_construction = 128)" in repo._items_ddl("none")
+    # En bulk load el índice se difiere; el resto del esquema (tsvector, índices auxiliares) no
+    deferred = repo._items_ddl("none", with_index=False)
+    assert "USING hnsw" not in deferred and "USING gin (search_tsv)" in deferred
+    assert "semantic_index_state" in repo._support_ddl()
+
+    # Nombres de índice dentro del límite de Postgres; el de rebuild no pisa al actual
+    partition = repo._partition_name(str(uuid.uuid4()))
+    for mode in ("full", "halfvec", "binary"):
+        current, rebuild = repo._index_name(mode, partition), repo._index_name(mode, partition, rebuild=True)
+        assert len(current) <= 63 and len(rebuild) <= 63 and current != rebuild
+    assert len({repo._index_name(mode, partition, rebuild=True) for mode in ("full", "halfvec", "binary")}) == 3
+    # Tablas largas con el mismo prefijo: nombres distintos (hash del nombre completo)
+    long_a, long_b = "semantic_items_" + "x" * 60 + "_a", "semantic_items_" + "x" * 60 + "_b"
+    assert repo._index_name("full", long_a) != repo._index_name("full", long_b)
+    assert repo._index_name("full", long_a).endswith("_embedding_idx")
+    # Los nombres que ya entraban en 63 bytes no cambian
+    assert repo._index_name("full") == "semantic_items_embedding_idx"
+
+    monkeypatch.setenv("HNSW_EF_CONSTRUCTION", "16")
+    with pytest.raises(ValueError):
+        VectorRepository()
+
+
+def test_ef_search_resolution(monkeypatch):
+    monkeypatch.setenv("HNSW_EF_SEARCH", "60")
+    monkeypatch.setenv("HNSW_TENANT_EF_SEARCH", '{"premium": 200}')
+    repo = VectorRepository()
+
+    assert repo.resolve_ef_search("basic") == 60
+    assert repo.resolve_ef_search("premium") == 200
+    assert repo.resolve_ef_search("premium", requested=20) == 20
+    # Nunca por debajo de los candidatos pedidos ni por encima del máximo del índice
+    assert repo._candidate_ef_search(50, 20) == 50
+    assert repo._candidate_ef_search(5, 5000) == 1000
+    assert repo._batch_ef_search([
+        {"client_id": "basic", "top_k": 3},
+        {"client_id": "premium", "top_k": 8, "ef_search": 90},
+    ]) == (8, 90)
+
+
+class _SearchCursor:
+    def __init__(self, rows, matching):
+        self.rows, self.matching, self.statements = rows, matching, []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql.strip())
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return {"matching": self.matching}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_short_results_are_retried_only_when_more_rows_match(monkeypatch):
+    repo = VectorRepository()
+
+    def search(matching):
+        cur = _SearchCursor([{"content_id": "a"}, {"content_id": "b"}], matching)
+        conn = type("Conn", (), {"cursor": lambda self, cursor_factory=None: cur})()
+        monkeypatch.setattr(repo, "_get_connection", lambda: contextlib.nullcontext(conn))
+        repo.search_similar("client", [0.1], top_k=5, filters={"category": "faq"})
+        return [sql for sql in cur.statements if sql.startswith("SET LOCAL hnsw.ef_search")]
+
+    # Tenant chico / filtro selectivo: solo existen las 2 filas devueltas, no se repite
+    assert search(matching=2) == []
+    # Hay más filas que cumplen los filtros: ef_search no alcanzó, se repite con el máximo
+    assert search(matching=5) == ["SET LOCAL hnsw.ef_search = %s"]
+
+    query, params = repo._matching_rows_query("client", {"category": "faq"}, 5)
+    assert "metadata->>'category' = %s" in query and params == ["client", "faq", 5]
+
+
+def test_invalid_partitioning_setting_is_rejected(monkeypatch):
+    monkeypatch.setenv("SEMANTIC_PARTITIONING", "per-row")
+    with pytest.raises(ValueError):
+        VectorRepository()
+
+
+@pytest.fixture
+def db_repo(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", TEST_DATABASE_URL)
+    repo = VectorRepository()
+    repo.open()
+    yield repo
+    repo.close()
+
+
+def _vector(rng):
+    return [rng.uniform(-1, 1) for _ in range(768)]
+
+
+@requires_db
+def test_search_uses_hnsw_index_and_applies_filters(db_repo):
+    rng = random.Random(7)
+    client_id = str(uuid.uuid4())
+    rows = []
+    for i in range(1000):
+        category = "financial_products" if i % 10 == 0 else "property_catalog"
+        rows.append(({
+            "content_id": f"doc-{i}",
+            "client_id": client_id,
+            "source": "test",
+            "title": f"Doc {i}",
+            "body_content": f"texto {i}",
+            "metadata": {"client_id": client_id, "category": category},
+            "hash": f"{client_id}-{i}",
+        }, _vector(rng)))
+    db_repo.upsert_documents(rows)
+
+    try:
+        with db_repo._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("ANALYZE semantic_items")
+                conn.commit()
+
+        plan = db_repo.explain_search(client_id, _vector(rng), 5, {"category": "financial_products"})
+        # Con layout particionado el índice de cada partición se llama <partición>_embedding_idx
+        assert "embedding_idx" in plan
+
+        results = db_repo.search_similar(client_id, _vector(rng), 5, {"category": "financial_products"})
+        assert len(results) == 5
+        assert all(r["metadata"]["category"] == "financial_products" for r in results)
+        scores = [r["similarity"] for r in results]
+        assert scores == sorted(scores, reverse=True)
+
+        # El batch devuelve lo mismo que las búsquedas individuales, en orden de entrada
+        q1, q2 = _vector(rng), _vector(rng)
+        batch = db_repo.search_similar_batch([
+            {"client_id": client_id, "query_vector": q1, "top_k": 3},
+            {"client_id": client_id, "query_vector": q2, "top_k": 4, "filters": {"category": "financial_products"}},
+        ])
+        assert [r["content_id"] for r in batch[0]] == [r["content_id"] for r in db_repo.search_similar(client_id, q1, 3)]
+        assert [r["content_id"] for r in batch[1]] == [
+            r["content_id"] for r in db_repo.search_similar(client_id, q2, 4, {"category": "financial_products"})
+        ]
+
+        lexical = db_repo.search_lexical(client_id, "Doc 7", 3)
+        assert [r["content_id"] for r in lexical] == ["doc-7"]
+    finally:
+        db_repo.delete_client_data(client_id)
+
+
+@requires_db
+def test_replace_documents_keeps_unchanged_chunks(db_repo):
+    rng = random.Random(11)
+    client_id = str(uuid.uuid4())
+    manifest = {"client_id": client_id, "content_id": "doc", "hash": "v1"}
+
+    def row(chunk_hash, body, title="Doc"):
+        return {
+            "content_id": "doc", "client_id": client_id, "source": "test", "title": title,
+            "body_content": body, "metadata": {"client_id": client_id}, "hash": chunk_hash,
+        }
+
+    db_repo.replace_documents([(manifest, [(row("a", "intro"), _vector(rng)), (row("b", "precio 100"), _vector(rng))])])
+    try:
+        # "a" se conserva (sin vector, título nuevo), "b" se reemplaza por "c"
+        result = db_repo.replace_documents([(
+            dict(manifest, hash="v2"),
+            [(row("a", "intro", title="Doc v2"), None), (row("c", "precio 90"), _vector(rng))],
+        )])[0]
+        assert (result["upserted"], result["inserted"], result["kept"], result["refreshed"], result["deleted"]) == (1, 1, 1, 1, 1)
+        assert db_repo.get_chunk_hashes([(client_id, "doc")]) == {(client_id, "doc"): {"a", "c"}}
+    finally:
+        db_repo.delete_client_data(client_id)
+
+
+@requires_db
+def test_bulk_load_defers_index_and_rebuild_restores_it(db_repo):
+    rng = random.Random(5)
+    client_id = str(uuid.uuid4())
+    try:
+        db_repo.begin_bulk_load()
+        report = db_repo.index_report()
+        assert report["state"]["bulk_load"] and report["indexes"] == []
+
+        db_repo.upsert_documents([({
+            "content_id": f"doc-{i}", "client_id": client_id, "source": "test", "title": None,
+            "body_content": f"texto {i}", "metadata": {}, "hash": f"{client_id}-{i}",
+        }, _vector(rng)) for i in range(50)])
+
+        result = db_repo.rebuild_vector_index()
+        assert result["status"] == "built" and not result["replaced_existing"]
+        # Un segundo rebuild (ej: nuevos parámetros) reemplaza al índice existente
+        assert db_repo.rebuild_vector_index()["replaced_existing"]
+
+        report = db_repo.index_report()
+        assert not report["state"]["bulk_load"]
+        assert report["indexes"] and all(index["valid"] for index in report["indexes"])
+        assert report["total_size_bytes"] > 0
+    finally:
+        db_repo.delete_client_data(client_id)
+
+
+@requires_db
+def test_delete_chunks_in_batches(db_repo):
+    rng = random.Random(9)
+    client_id = str(uuid.uuid4())
+    db_repo.upsert_documents([({
+        "content_id": f"doc-{i % 2}", "client_id": client_id, "source": "test", "title": None,
+        "body_content": f"texto {i}", "metadata": {}, "hash": f"{client_id}-{i}",
+    }, _vector(rng)) for i in range(12)])
+    try:
+        assert db_repo.delete_chunks_batch(client_id, "doc-0", batch_size=4) == 4
+        assert db_repo.count_chunks(client_id, "doc-0") == 2
+        assert db_repo.delete_chunks_batch(client_id, batch_size=100) == 8
+        assert db_repo.count_chunks(client_id) == 0
+    finally:
+        db_repo.delete_client_data(client_id)
+
+
+@requires_db
+def test_expired_job_lock_moves_ownership_to_new_worker(db_repo):
+    job_id = db_repo.enqueue_job("test", {})
+    assert db_repo.claim_job("w1")["id"] == job_id
+    assert db_repo.heartbeat_job(job_id, "w1")
+    assert db_repo.update_job_progress(job_id, "w1", {"batch": 1})
+
+    # lock_timeout=0: el lock de w1 ya venció y w2 reclama el trabajo
+    assert db_repo.claim_job("w2", lock_timeout=0)["id"] == job_id
+    assert not db_repo.heartbeat_job(job_id, "w1")
+    assert not db_repo.complete_job(job_id, "w1", {"stale": True})
+    assert not db_repo.fail_job(job_id, "w1", "stale", retry_in=0)
+    assert db_repo.complete_job(job_id, "w2", {"ok": True})
+    assert db_repo.get_job(job_id)["result"] == {"ok": True}
+
+
+@requires_db
+def test_open_records_schema_version(db_repo):
+    from app.migrations import LATEST_VERSION
+
+    assert db_repo.schema_status() == {"version": LATEST_VERSION, "latest": LATEST_VERSION, "pending": []}
+    db_repo.ping()
+
+
+@requires_db
+def test_tenant_export_import_roundtrip(db_repo, tmp_path):
+    from app.transfer import TenantArchive, export_tenant, import_archive
+
+    rng = random.Random(11)
+    source, target = str(uuid.uuid4()), str(uuid.uuid4())
+    rows = [
+        ({"content_id": f"doc-{i}", "client_id": source, "source": "test", "title": f"t{i}",
+          "body_content": f"chunk {i}", "metadata": {"client_id": source}, "hash": f"{source}-{i}"}, _vector(rng))
+        for i in range(10)
+    ]
+    try:
+        db_repo.upsert_documents(rows)
+        path = tmp_path / "tenant.semvec"
+        with open(path, "wb") as out:
+            for chunk in export_tenant(db_repo, source, "float32", batch_size=4):
+                out.write(chunk)
+        # Layout none: hash es único en toda la tabla, el tenant de origen se elimina antes de moverlo
+        db_repo.delete_client_data(source)
+
+        result = import_archive(db_repo, TenantArchive(str(path)), target)
+        assert result["chunks_imported"] == 10
+        assert db_repo.count_chunks(target) == 10
+        found = db_repo.search_similar(target, rows[3][1], top_k=1)
+        assert found[0]["content_id"] == "doc-3" and found[0]["metadata"]["client_id"] == target
+    finally:
+        db_repo.delete_client_data(source)
+        db_repo.delete_client_data(target)